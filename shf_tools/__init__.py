@@ -0,0 +1 @@
+"""SHF 圍棋死活題工具集"""
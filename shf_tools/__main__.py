@@ -0,0 +1,7 @@
+"""python -m shf_tools 的入口"""
+import sys
+
+from shf_tools.cli import main
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,630 @@
+"""SHF 工具命令行入口
+
+不依賴 Qt，可在無圖形界面的服務器、定時任務或容器中批量處理題庫：
+
+    python -m shf_tools convert <sgf文件或目錄> <輸出>
+    python -m shf_tools import <shf文件或目錄>... --db <數據庫> [--incremental]
+    python -m shf_tools export <數據庫> <輸出目錄> [--collection]
+    python -m shf_tools validate <shf文件或目錄>... [--strict] [--replay]
+    python -m shf_tools solve <shf文件或目錄>... [--nodes 10000] [-o 修正後的文件]
+    python -m shf_tools pack <shf文件或目錄>... <shfb文件>
+    python -m shf_tools unpack <shfb文件> <shf文件>
+    python -m shf_tools index <shf文件> [--find 級別:ID]
+    python -m shf_tools duplicates <數據庫> [--symmetry]
+    python -m shf_tools query <數據庫> [--level 30k-1k] [--size 19] [--stones 3-10] [-o 輸出]
+    python -m shf_tools patterns <數據庫> [--build] [--find 圖案]
+    python -m shf_tools tensors <shf文件、目錄或數據庫>... <輸出前綴> [--npz]
+    python -m shf_tools difficulty <數據庫或shf文件>... [-o 輸出] [--solver]
+    python -m shf_tools stats <shf文件、目錄或數據庫>...
+    python -m shf_tools gui <工具名>
+
+各子命令只在運行時才導入所需模組，只有 gui 子命令會加載 Qt。
+"""
+import os
+import sys
+import logging
+import argparse
+from collections import Counter
+
+from shf_tools.core.importer import DEFAULT_BATCH_SIZE
+
+logger = logging.getLogger(__name__)
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# gui 子命令可啟動的圖形界面工具
+GUI_TOOLS = ('sgf2shf', 'shf2sqlite', 'sqlite2shf', 'shf_viewer')
+
+def _tool_src(tool):
+    """返回工具的 src 目錄，並加入模組搜索路徑"""
+    src_dir = os.path.join(TOOLS_DIR, tool, 'src')
+    if src_dir not in sys.path:
+        sys.path.insert(0, src_dir)
+    return src_dir
+
+def _expand_inputs(paths, extension):
+    """展開輸入路徑，目錄會遞歸查找指定副檔名的文件"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            found = []
+            for root, _, names in os.walk(path):
+                for name in names:
+                    if name.lower().endswith(extension):
+                        found.append(os.path.join(root, name))
+            files.extend(sorted(found))
+        else:
+            files.append(path)
+    return files
+
+def cmd_convert(args):
+    """SGF 轉 SHF"""
+    _tool_src('sgf2shf')
+    from sgf2shf import convert_sgf_to_shf, find_sgf_files, convert_files_parallel
+
+    if os.path.isdir(args.input):
+        sgf_files = find_sgf_files(args.input)
+        if not sgf_files:
+            logger.error(f"未找到任何 SGF 文件: {args.input}")
+            return 1
+
+        success_count = 0
+        error_count = 0
+        results = convert_files_parallel(
+            sgf_files, args.input, args.output, args.workers)
+        for rel_path, output_file, error in results:
+            if error is None:
+                success_count += 1
+                logger.info(f"成功轉換: {rel_path} -> {output_file}")
+            else:
+                error_count += 1
+                logger.error(f"轉換失敗 {rel_path}: {error}")
+
+        print(f"轉換完成：成功 {success_count} 個文件，失敗 {error_count} 個文件")
+        return 1 if error_count else 0
+
+    with open(args.input, 'r', encoding='utf-8') as f:
+        sgf_content = f.read()
+    result = convert_sgf_to_shf(sgf_content, os.path.basename(args.input))
+
+    output_dir = os.path.dirname(args.output)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        f.write(result['shf_format'])
+    print(f"成功轉換文件: {args.input} -> {args.output}")
+    return 0
+
+def cmd_import(args):
+    """SHF 導入 SQLite 數據庫"""
+    from shf_tools.core.importer import import_shf_files
+
+    input_files = _expand_inputs(args.inputs, '.shf')
+    if not input_files:
+        logger.error("未找到任何 SHF 文件")
+        return 1
+
+    imported, error_count = import_shf_files(
+        input_files, args.db, args.batch_size,
+        incremental=args.incremental, prune=not args.keep_missing
+    )
+    print(f"導入完成：{imported} 道題目，{error_count} 處錯誤")
+    return 1 if error_count else 0
+
+def cmd_export(args):
+    """SQLite 數據庫導出 SHF"""
+    from shf_tools.core.exporter import export_database
+
+    exported = export_database(
+        args.db, args.output_dir,
+        collection=args.collection,
+        shard_size=args.shard_size
+    )
+    print(f"導出完成：{exported} 道題目")
+    return 0
+
+def cmd_validate(args):
+    """檢查 SHF 文件的格式，--replay 時同時重放答案檢查落子是否合法"""
+    input_files = _expand_inputs(args.inputs, '.shf')
+    if args.replay:
+        return _replay_validate(input_files, args)
+
+    from shf_tools.core.importer import iter_shf_records
+
+    valid_count = 0
+    error_count = 0
+    for file_path in input_files:
+        for line_no, game_data, error in iter_shf_records(file_path, args.strict):
+            if error is None:
+                valid_count += 1
+            else:
+                error_count += 1
+                print(f"{file_path}:{line_no}: {error}")
+
+    print(f"檢查完成：{valid_count} 道題目有效，{error_count} 處錯誤")
+    return 1 if error_count else 0
+
+def _replay_validate(input_files, args):
+    """並行重放所有答案並打印問題"""
+    from shf_tools.core.validator import validate_files
+
+    checked_count = 0
+    kinds = Counter()
+    batches = validate_files(input_files, args.strict, args.workers)
+    for file_path, checked, results in batches:
+        checked_count += checked
+        for line_no, kind, message in results:
+            kinds[kind] += 1
+            print(f"{file_path}:{line_no}: {message}")
+
+    print(f"檢查完成：重放 {checked_count} 道題目，{sum(kinds.values())} 處問題")
+    if kinds:
+        _print_counter("按問題類型:", kinds)
+    return 1 if kinds else 0
+
+def _write_fixed(input_files, fixes, output):
+    """把所有題目寫入 output，有問題的題目換成修正後的行"""
+    with open(output, 'w', encoding='utf-8') as out:
+        for file_path in input_files:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                for line_no, line in enumerate(f, 1):
+                    fixed = fixes.get((file_path, line_no))
+                    out.write(fixed + '\n' if fixed is not None else line)
+
+def cmd_solve(args):
+    """以死活求解器核對答案的正誤，並找出缺少的應手"""
+    from shf_tools.core.parser import Problem
+    from shf_tools.core.solver import format_issue, solve_files
+
+    input_files = _expand_inputs(args.inputs, '.shf')
+    if not input_files:
+        logger.error("未找到任何 SHF 文件")
+        return 1
+
+    options = {'max_nodes': args.nodes, 'margin': args.margin}
+    checked_count = 0
+    kinds = Counter()
+    fixes = {}
+    batches = solve_files(input_files, args.workers, **options)
+    for file_path, checked, results in batches:
+        checked_count += checked
+        for line_no, problem, issues in results:
+            answers = list(problem.answers)
+            for issue in issues:
+                kinds[issue[1]] += 1
+                answers[issue[0]] = issue[3]
+                print(f"{file_path}:{line_no}: {format_issue(problem.key, issue)}")
+            fixes[(file_path, line_no)] = Problem(
+                problem.level, problem.id, problem.size, problem.stones,
+                problem.initial_comment, tuple(answers)
+            ).to_line()
+
+    print(f"求解完成：{checked_count} 道題目，{sum(kinds.values())} 處問題")
+    if kinds:
+        _print_counter("按問題類型:", kinds)
+    if args.output:
+        _write_fixed(input_files, fixes, args.output)
+        print(f"已寫入修正後的題目：{args.output}")
+    return 1 if kinds else 0
+
+def cmd_pack(args):
+    """SHF 轉換為 SHFB 二進制文件"""
+    from shf_tools.core.shfb import shf_to_shfb
+
+    input_files = _expand_inputs(args.inputs, '.shf')
+    if not input_files:
+        logger.error("未找到任何 SHF 文件")
+        return 1
+
+    count, error_count = shf_to_shfb(input_files, args.output, args.strict)
+    print(f"打包完成：{count} 道題目，{error_count} 處錯誤")
+    return 1 if error_count else 0
+
+def cmd_unpack(args):
+    """SHFB 二進制文件轉換為 SHF"""
+    from shf_tools.core.shfb import shfb_to_shf
+
+    count = shfb_to_shf(args.input, args.output)
+    print(f"解包完成：{count} 道題目")
+    return 0
+
+def cmd_index(args):
+    """生成或更新 SHF 文件的偏移索引，並可按級別和 ID 查找題目"""
+    from shf_tools.core.line_index import LineIndex, build_index
+
+    if args.find:
+        level, _, problem_id = args.find.partition(':')
+        with LineIndex(args.input) as index:
+            line = index.find_line(level, problem_id, args.size)
+        if line is None:
+            print(f"未找到題目：{args.find}")
+            return 1
+        print(line)
+        return 0
+
+    count, added = build_index(args.input, incremental=not args.rebuild)
+    print(f"索引完成：{count} 道題目，新索引 {added} 道")
+    return 0
+
+def _symmetric_duplicates(conn):
+    """按對稱規範鍵分組，產出 (規範鍵, [(級別, ID), ...])"""
+    from shf_tools.core.compact import CompactProblem
+    from shf_tools.core.exporter import iter_game_records
+    from shf_tools.core.symmetry import canonical_keys
+
+    problems = [
+        CompactProblem.from_dict(game_data) for game_data in iter_game_records(conn)
+    ]
+    keys, _ = canonical_keys(problems)
+    groups = {}
+    for problem, key in zip(problems, keys):
+        groups.setdefault(int(key), []).append((problem.level, problem.id))
+    duplicates = [(key, members) for key, members in groups.items() if len(members) > 1]
+    duplicates.sort(key=lambda item: (-len(item[1]), item[0]))
+    return duplicates
+
+def cmd_duplicates(args):
+    """列出數據庫中初始局面相同的題目"""
+    import sqlite3
+    from shf_tools.core.schema import upgrade_schema
+    from shf_tools.core.zobrist import find_duplicate_positions
+
+    if not os.path.exists(args.db):
+        logger.error(f"找不到數據庫文件：{args.db}")
+        return 1
+
+    conn = sqlite3.connect(args.db)
+    try:
+        upgrade_schema(conn)
+        if args.symmetry:
+            groups = _symmetric_duplicates(conn)
+        else:
+            groups = find_duplicate_positions(conn)
+        group_count = 0
+        for key, members in groups:
+            group_count += 1
+            keys = ' '.join(f"{level}:{id_str}" for level, id_str in members)
+            print(f"{key & 0xFFFFFFFFFFFFFFFF:016x}\t{keys}")
+    finally:
+        conn.close()
+
+    print(f"共 {group_count} 組重複局面")
+    return 0
+
+def cmd_query(args):
+    """按條件查詢數據庫中的題目，輸出 SHF 行"""
+    import sqlite3
+    from shf_tools.core.query import ProblemQuery, parse_range
+    from shf_tools.core.schema import upgrade_schema
+
+    if not os.path.exists(args.db):
+        logger.error(f"找不到數據庫文件：{args.db}")
+        return 1
+
+    query = ProblemQuery()
+    if args.level:
+        query.levels(*parse_range(args.level, str))
+    if args.size:
+        query.sizes(*args.size)
+    if args.stones:
+        query.stones(*parse_range(args.stones))
+    if args.answers:
+        query.answers(*parse_range(args.answers))
+    if args.correct:
+        query.correct(*parse_range(args.correct))
+    if args.wrong:
+        query.wrong(*parse_range(args.wrong))
+    if args.comment:
+        query.comment(args.comment)
+
+    conn = sqlite3.connect(args.db)
+    try:
+        upgrade_schema(conn)
+        if args.count:
+            print(query.count(conn))
+            return 0
+
+        output = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+        try:
+            count = 0
+            for line in query.iter_lines(conn, args.limit):
+                output.write(line + '\n')
+                count += 1
+        finally:
+            if args.output:
+                output.close()
+    finally:
+        conn.close()
+
+    logger.info(f"查詢到 {count} 道題目")
+    return 0
+
+def cmd_patterns(args):
+    """生成圖案索引，或查找包含指定棋形的題目"""
+    import sqlite3
+    from shf_tools.core.pattern_index import build_pattern_index, find_pattern
+    from shf_tools.core.schema import upgrade_schema
+
+    if not os.path.exists(args.db):
+        logger.error(f"找不到數據庫文件：{args.db}")
+        return 1
+    if not args.build and not args.find:
+        logger.error("請指定 --build 或 --find")
+        return 1
+
+    conn = sqlite3.connect(args.db)
+    try:
+        upgrade_schema(conn)
+        if args.build:
+            count = build_pattern_index(conn)
+            print(f"索引完成：{count} 道題目")
+        if args.find:
+            pattern = args.find
+            if os.path.isfile(pattern):
+                with open(pattern, 'r', encoding='utf-8') as f:
+                    pattern = f.read()
+            results = find_pattern(conn, pattern, symmetric=not args.exact,
+                                   swap_colors=args.swap_colors, sizes=args.size)
+            for level, id_str in results:
+                print(f"{level}:{id_str}")
+            print(f"共 {len(results)} 道題目")
+    finally:
+        conn.close()
+    return 0
+
+def cmd_tensors(args):
+    """導出 NumPy 張量供機器學習訓練使用"""
+    from shf_tools.core.tensor_export import export_tensors
+
+    inputs = []
+    for path in args.inputs:
+        if path.lower().endswith('.db'):
+            inputs.append(path)
+        else:
+            inputs.extend(_expand_inputs([path], '.shf'))
+    if not inputs:
+        logger.error("未找到任何 SHF 文件或數據庫")
+        return 1
+
+    count = export_tensors(
+        inputs, args.output, chunk_size=args.chunk_size, npz=args.npz)
+    print(f"導出完成：{count} 道題目")
+    return 0
+
+def cmd_difficulty(args):
+    """按題目特徵擬合難度模型，為級別為 00 的題目估計級別"""
+    import sqlite3
+    from shf_tools.core.difficulty import estimate_database, estimate_files
+    from shf_tools.core.schema import upgrade_schema
+
+    if len(args.inputs) == 1 and args.inputs[0].lower().endswith('.db'):
+        if not os.path.exists(args.inputs[0]):
+            logger.error(f"找不到數據庫文件：{args.inputs[0]}")
+            return 1
+        conn = sqlite3.connect(args.inputs[0])
+        try:
+            upgrade_schema(conn)
+            estimates, error = estimate_database(
+                conn, args.output, args.solver, args.workers)
+        finally:
+            conn.close()
+        estimated = len(estimates)
+    else:
+        input_files = _expand_inputs(args.inputs, '.shf')
+        if not input_files:
+            logger.error("未找到任何 SHF 文件")
+            return 1
+        if not args.output:
+            logger.error("輸入 SHF 文件時請以 -o 指定輸出文件")
+            return 1
+        estimated, error = estimate_files(
+            input_files, args.output, args.solver, args.workers)
+
+    print(f"估計完成：{estimated} 道題目，"
+          f"已標記題目上的訓練誤差（樣本內平均絕對誤差）{error:.2f} 級")
+    return 0
+
+def _print_counter(title, counter):
+    """按數量從多到少打印統計結果"""
+    print(title)
+    items = sorted(counter.items(), key=lambda item: (-item[1], str(item[0])))
+    for key, count in items:
+        print(f"  {key}\t{count}")
+
+def cmd_stats(args):
+    """統計題目數量"""
+    levels = Counter()
+    sizes = Counter()
+    total_answers = 0
+    error_count = 0
+
+    for path in args.inputs:
+        if path.lower().endswith('.db'):
+            if not os.path.exists(path):
+                logger.error(f"找不到數據庫文件：{path}")
+                return 1
+            import sqlite3
+            conn = sqlite3.connect(path)
+            try:
+                rows = conn.execute("SELECT level, COUNT(*) FROM games GROUP BY level")
+                for level, count in rows:
+                    levels[level] += count
+                rows = conn.execute("SELECT size, COUNT(*) FROM games GROUP BY size")
+                for size, count in rows:
+                    sizes[f"{size}路"] += count
+                answers = conn.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+                total_answers += answers
+            finally:
+                conn.close()
+            continue
+
+        from shf_tools.core.importer import iter_shf_records
+        for file_path in _expand_inputs([path], '.shf'):
+            for line_no, game_data, error in iter_shf_records(file_path):
+                if error is not None:
+                    error_count += 1
+                    continue
+                levels[game_data['level']] += 1
+                sizes[f"{game_data['size']}路"] += 1
+                total_answers += len(game_data['answers'])
+
+    print(f"題目總數: {sum(levels.values())}")
+    print(f"答案總數: {total_answers}")
+    if error_count:
+        print(f"無法解析的行: {error_count}")
+    _print_counter("按級別:", levels)
+    _print_counter("按棋盤大小:", sizes)
+    return 0
+
+def cmd_gui(args):
+    """啟動圖形界面工具"""
+    import runpy
+
+    src_dir = _tool_src(args.tool)
+    sys.argv = [os.path.join(src_dir, 'main.py')]
+    runpy.run_path(sys.argv[0], run_name='__main__')
+    return 0
+
+def build_parser():
+    """創建命令行參數解析器"""
+    parser = argparse.ArgumentParser(
+        prog='python -m shf_tools',
+        description='SHF 圍棋死活題工具（命令行版本）'
+    )
+    parser.add_argument('-v', '--verbose', action='store_true', help='顯示詳細日誌')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    convert = subparsers.add_parser('convert', help='將 SGF 文件或目錄轉換為 SHF')
+    convert.add_argument('input', help='SGF 文件或包含 SGF 文件的目錄')
+    convert.add_argument('output', help='輸出 SHF 文件或目錄')
+    convert.add_argument('--workers', type=int, default=None, help='並行進程數，默認為 CPU 核心數')
+    convert.set_defaults(func=cmd_convert)
+
+    import_ = subparsers.add_parser('import', help='將 SHF 文件導入 SQLite 數據庫')
+    import_.add_argument('inputs', nargs='+', help='SHF 文件或目錄')
+    import_.add_argument('--db', required=True, help='輸出數據庫文件')
+    import_.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                         help='每批寫入的題目數')
+    import_.add_argument('--incremental', action='store_true',
+                         help='在已有數據庫上只導入有變化的文件，並刪除已移除文件的題目')
+    import_.add_argument('--keep-missing', action='store_true',
+                         help='增量導入時保留不在本次輸入中的文件的題目')
+    import_.set_defaults(func=cmd_import)
+
+    export = subparsers.add_parser('export', help='將 SQLite 數據庫導出為 SHF')
+    export.add_argument('db', help='數據庫文件')
+    export.add_argument('output_dir', help='輸出目錄')
+    export.add_argument('--collection', action='store_true', help='寫入按棋盤大小分區的合集文件')
+    export.add_argument('--shard-size', type=int, default=0, help='合集模式下每個文件的題數，0 為不分片')
+    export.set_defaults(func=cmd_export)
+
+    validate = subparsers.add_parser('validate', help='檢查 SHF 文件格式')
+    validate.add_argument('inputs', nargs='+', help='SHF 文件或目錄')
+    validate.add_argument('--strict', action='store_true', help='只接受規範格式，不兼容舊文件的寫法')
+    validate.add_argument('--replay', action='store_true',
+                          help='在棋盤上重放答案，檢查重疊、自殺、打劫和黑白交替')
+    validate.add_argument('--workers', type=int, default=None,
+                          help='重放時的並行進程數，默認為 CPU 核心數')
+    validate.set_defaults(func=cmd_validate)
+
+    solve = subparsers.add_parser('solve', help='以死活求解器核對答案的正誤並找出缺少的應手')
+    solve.add_argument('inputs', nargs='+', help='SHF 文件或目錄')
+    solve.add_argument('--nodes', type=int, default=10000, help='每個答案的搜索節點數上限')
+    solve.add_argument('--margin', type=int, default=1, help='搜索區域向守方棋子外擴展的路數')
+    solve.add_argument('--workers', type=int, default=None, help='並行進程數，默認為 CPU 核心數')
+    solve.add_argument('-o', '--output', help='把所有題目寫入此文件，有問題的答案改為求解結果')
+    solve.set_defaults(func=cmd_solve)
+
+    pack = subparsers.add_parser('pack', help='將 SHF 文件打包為可隨機訪問的 SHFB 二進制文件')
+    pack.add_argument('inputs', nargs='+', help='SHF 文件或目錄')
+    pack.add_argument('output', help='輸出 SHFB 文件')
+    pack.add_argument('--strict', action='store_true', help='只接受規範格式，不兼容舊文件的寫法')
+    pack.set_defaults(func=cmd_pack)
+
+    unpack = subparsers.add_parser('unpack', help='將 SHFB 二進制文件還原為 SHF')
+    unpack.add_argument('input', help='SHFB 文件')
+    unpack.add_argument('output', help='輸出 SHF 文件')
+    unpack.set_defaults(func=cmd_unpack)
+
+    index = subparsers.add_parser('index', help='為 SHF 合集文件生成字節偏移索引')
+    index.add_argument('input', help='SHF 文件')
+    index.add_argument('--find', metavar='LEVEL:ID', help='通過索引查找並打印題目，例如 3d:00002')
+    index.add_argument('--size', type=int, choices=(9, 13, 19), help='查找時限定棋盤大小')
+    index.add_argument('--rebuild', action='store_true', help='重新生成整個索引')
+    index.set_defaults(func=cmd_index)
+
+    duplicates = subparsers.add_parser('duplicates', help='列出數據庫中初始局面相同的題目')
+    duplicates.add_argument('db', help='數據庫文件')
+    duplicates.add_argument('--symmetry', action='store_true',
+                            help='旋轉、鏡像或黑白互換後相同的局面也視為重複')
+    duplicates.set_defaults(func=cmd_duplicates)
+
+    query = subparsers.add_parser('query', help='按條件查詢數據庫中的題目，輸出 SHF 行')
+    query.add_argument('db', help='數據庫文件')
+    query.add_argument('--level', metavar='LOW-HIGH', help='級別範圍，例如 30k-1k、1d-9d 或 5k')
+    query.add_argument('--size', type=int, nargs='+', choices=(9, 13, 19), help='棋盤大小')
+    query.add_argument('--stones', metavar='MIN-MAX', help='初始棋子數範圍，例如 3-10 或 20-')
+    query.add_argument('--answers', metavar='MIN-MAX', help='答案數範圍')
+    query.add_argument('--correct', metavar='MIN-MAX', help='正確答案數範圍')
+    query.add_argument('--wrong', metavar='MIN-MAX', help='錯誤答案數範圍')
+    query.add_argument('--comment', help='注釋中包含的文字')
+    query.add_argument('--limit', type=int, default=None, help='最多輸出的題目數')
+    query.add_argument('--count', action='store_true', help='只打印符合條件的題目數')
+    query.add_argument('-o', '--output', help='輸出 SHF 文件，默認輸出到標準輸出')
+    query.set_defaults(func=cmd_query)
+
+    patterns = subparsers.add_parser('patterns', help='按局部棋形查找數據庫中的題目')
+    patterns.add_argument('db', help='數據庫文件')
+    patterns.add_argument('--build', action='store_true', help='重新生成圖案索引')
+    patterns.add_argument('--find', metavar='PATTERN',
+                          help='圖案文字或文件，各排以 / 分隔：X 黑 O 白 . 空 # 棋盤外 ? 任意，例如 ##/#.X/#XO')
+    patterns.add_argument('--exact', action='store_true', help='只匹配原方向，不考慮旋轉和鏡像')
+    patterns.add_argument('--swap-colors', action='store_true', help='黑白互換的圖案也算匹配')
+    patterns.add_argument('--size', type=int, nargs='+', choices=(9, 13, 19),
+                          help='限定棋盤大小')
+    patterns.set_defaults(func=cmd_patterns)
+
+    tensors = subparsers.add_parser('tensors', help='將題目導出為 NumPy 張量（需要 numpy）')
+    tensors.add_argument('inputs', nargs='+', help='SHF 文件、目錄或 .db 數據庫')
+    tensors.add_argument('output', help='輸出文件前綴，生成 <前綴>_planes.npy 等文件')
+    tensors.add_argument('--npz', action='store_true', help='同時把所有數組打包為壓縮的 <前綴>.npz')
+    tensors.add_argument('--chunk-size', type=int, default=65536, help='每次轉換的題目數')
+    tensors.set_defaults(func=cmd_tensors)
+
+    difficulty = subparsers.add_parser('difficulty', help='估計級別為 00 的題目的難度')
+    difficulty.add_argument('inputs', nargs='+', help='一個 .db 數據庫，或 SHF 文件和目錄')
+    difficulty.add_argument('-o', '--output',
+                            help='輸出 SHF 文件，00 級別換成估計的級別；輸入 SHF 時必須指定')
+    difficulty.add_argument('--solver', action='store_true',
+                            help='以死活求解器的節點數作為額外特徵（較慢）')
+    difficulty.add_argument('--workers', type=int, default=None,
+                            help='求解時的並行進程數，默認為 CPU 核心數')
+    difficulty.set_defaults(func=cmd_difficulty)
+
+    stats = subparsers.add_parser('stats', help='統計 SHF 文件或數據庫中的題目')
+    stats.add_argument('inputs', nargs='+', help='SHF 文件、目錄或 .db 數據庫')
+    stats.set_defaults(func=cmd_stats)
+
+    gui = subparsers.add_parser('gui', help='啟動圖形界面工具（需要 PyQt6）')
+    gui.add_argument('tool', choices=GUI_TOOLS, help='工具名稱')
+    gui.set_defaults(func=cmd_gui)
+
+    return parser
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(
+        level=logging.INFO if args.verbose else logging.WARNING,
+        format='%(asctime)s [%(levelname)s] %(message)s',
+        stream=sys.stderr
+    )
+
+    try:
+        return args.func(args)
+    except Exception as e:
+        logger.error(f"{args.command} 失敗: {str(e)}")
+        if args.verbose:
+            logger.exception("錯誤詳情")
+        return 1
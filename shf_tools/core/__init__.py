@@ -0,0 +1 @@
+"""SHF 工具共用的核心模組（不依賴 Qt）"""
@@ -0,0 +1,153 @@
+"""答案前綴樹
+
+SHF 把每個變化寫成從第一手開始的完整著手序列，+Ba4,Wb5,Bc6 和 +Ba4,Wb5,Bc7
+會重複記錄共同的前兩手。AnswerTree 以前綴樹保存答案：每個節點是一手棋，
+共同的前綴只保存一次，答案記錄在它最後一手的節點上。答案的序號保留原來的
+順序，to_answers 可以還原出與解析結果完全相同的扁平答案，包括重複的答案和
+作為其他答案前綴的答案。
+
+    tree = problem.answer_tree()
+    node = tree.find(('Bba', 'Wbb'))
+    for child in node.iter_children():
+        print(child.move, child.answer_types())
+"""
+from shf_tools.core.parser import Answer
+
+class AnswerNode:
+    """前綴樹中的一手棋，根節點的 move 為 None"""
+    __slots__ = ('move', 'parent', 'children', 'ends')
+
+    def __init__(self, move=None, parent=None):
+        self.move = move
+        self.parent = parent
+        # 著手 -> AnswerNode，按第一次出現的順序；沒有子節點時為 None
+        self.children = None
+        # 在此結束的答案 [(序號, 類型, 注釋), ...]；沒有時為 None
+        self.ends = None
+
+    def child(self, move):
+        """返回下一手為 move 的子節點，不存在時返回 None"""
+        if self.children is None:
+            return None
+        return self.children.get(move)
+
+    def iter_children(self):
+        """按第一次出現的順序產出子節點"""
+        if self.children is not None:
+            yield from self.children.values()
+
+    @property
+    def is_leaf(self):
+        return self.children is None
+
+    @property
+    def depth(self):
+        """從根節點到此節點的手數"""
+        depth = 0
+        node = self
+        while node.parent is not None:
+            depth += 1
+            node = node.parent
+        return depth
+
+    def path(self):
+        """從根節點到此節點的著手序列"""
+        moves = []
+        node = self
+        while node.parent is not None:
+            moves.append(node.move)
+            node = node.parent
+        moves.reverse()
+        return tuple(moves)
+
+    def answer_types(self):
+        """經過此節點的所有答案的類型集合"""
+        types = set()
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            if node.ends is not None:
+                types.update(answer_type for _, answer_type, _ in node.ends)
+            if node.children is not None:
+                stack.extend(node.children.values())
+        return types
+
+    def __repr__(self):
+        return (f"AnswerNode({self.move!r}, children={len(self.children or ())}, "
+                f"ends={len(self.ends or ())})")
+
+class AnswerTree:
+    """以前綴樹保存的一道題目的全部答案"""
+    __slots__ = ('root', 'count')
+
+    def __init__(self):
+        self.root = AnswerNode()
+        self.count = 0
+
+    @classmethod
+    def from_answers(cls, answers):
+        """從 Answer 序列創建"""
+        tree = cls()
+        for answer in answers:
+            tree.add(answer.type, answer.moves, answer.comment)
+        return tree
+
+    def add(self, answer_type, moves, comment=''):
+        """加入一個答案，返回其最後一手的節點（空答案為根節點）"""
+        node = self.root
+        for move in moves:
+            if node.children is None:
+                node.children = {}
+            child = node.children.get(move)
+            if child is None:
+                child = node.children[move] = AnswerNode(move, node)
+            node = child
+        if node.ends is None:
+            node.ends = []
+        node.ends.append((self.count, answer_type, comment))
+        self.count += 1
+        return node
+
+    def find(self, moves):
+        """返回著手序列對應的節點，序列不在樹中時返回 None"""
+        node = self.root
+        for move in moves:
+            node = node.child(move)
+            if node is None:
+                return None
+        return node
+
+    def iter_nodes(self):
+        """以深度優先順序產出除根節點外的所有節點"""
+        stack = list(reversed(list(self.root.iter_children())))
+        while stack:
+            node = stack.pop()
+            yield node
+            if node.children is not None:
+                stack.extend(reversed(list(node.children.values())))
+
+    def node_count(self):
+        """節點數，即去除共同前綴後需要保存的著手數"""
+        return sum(1 for _ in self.iter_nodes())
+
+    def to_answers(self):
+        """還原為扁平的 Answer 元組，順序與加入時相同"""
+        answers = []
+        # 深度優先遍歷，同時維護從根節點到當前節點的著手序列
+        stack = [(self.root, ())]
+        while stack:
+            node, moves = stack.pop()
+            if node.ends is not None:
+                answers.extend((index, Answer(answer_type, moves, comment))
+                               for index, answer_type, comment in node.ends)
+            if node.children is not None:
+                stack.extend(
+                    (child, moves + (child.move,)) for child in node.children.values())
+        answers.sort(key=lambda item: item[0])
+        return tuple(answer for _, answer in answers)
+
+    def __len__(self):
+        return self.count
+
+    def __repr__(self):
+        return f"AnswerTree(answers={self.count}, nodes={self.node_count()})"
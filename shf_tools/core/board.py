@@ -0,0 +1,289 @@
+"""不依賴 Qt 的圍棋盤面引擎
+
+棋盤上的點以 x * size + y 編號，顏色、棋串和氣都保存在按點索引的扁平列表中。
+棋串以並查集維護，每個棋串的根記錄偽氣數（棋子與相鄰空點的鄰接次數），
+偽氣數為 0 時棋串即被提走，因此落子、合併和判斷提子都不需要搜索整個棋串。
+同一棋串的棋子以循環鏈表串起，只有提子時才遍歷被提的棋子。
+盤面的 Zobrist 哈希隨落子和提子增量更新。
+"""
+from shf_tools.core.zobrist import SIZE_KEYS, WHITE_TO_MOVE_KEY, point_keys, to_signed64
+
+EMPTY = 0
+BLACK = 1
+WHITE = 2
+
+COLOR_CHARS = {'B': BLACK, 'W': WHITE}
+COLOR_NAMES = {BLACK: 'B', WHITE: 'W'}
+
+_NEIGHBORS = {}
+
+# 不合法落子的原因
+OUTSIDE = 'outside'
+OCCUPIED = 'occupied'
+KO = 'ko'
+SUICIDE = 'suicide'
+INVALID = 'invalid'
+
+class IllegalMove(ValueError):
+    """不合法的落子，reason 為上面定義的原因之一"""
+
+    def __init__(self, message, reason=INVALID):
+        super().__init__(message)
+        self.reason = reason
+
+def opponent(color):
+    """返回對方的顏色"""
+    return BLACK + WHITE - color
+
+def _neighbor_table(size):
+    """返回每個點的相鄰點列表，按棋盤大小緩存"""
+    table = _NEIGHBORS.get(size)
+    if table is None:
+        table = []
+        for x in range(size):
+            for y in range(size):
+                neighbors = []
+                if x > 0:
+                    neighbors.append((x - 1) * size + y)
+                if x < size - 1:
+                    neighbors.append((x + 1) * size + y)
+                if y > 0:
+                    neighbors.append(x * size + y - 1)
+                if y < size - 1:
+                    neighbors.append(x * size + y + 1)
+                table.append(tuple(neighbors))
+        table = _NEIGHBORS[size] = tuple(table)
+    return table
+
+class BoardState:
+    """圍棋盤面，支持落子、提子、禁止自殺和單劫判斷"""
+
+    def __init__(self, size=19):
+        self.size = size
+        area = size * size
+        self.neighbors = _neighbor_table(size)
+        self.colors = [EMPTY] * area
+        # 並查集的父節點、棋串的偽氣數和棋子數（只在根上有效）
+        self.parent = list(range(area))
+        self.pseudo_liberties = [0] * area
+        self.group_sizes = [0] * area
+        # 同一棋串中下一顆棋子，構成循環鏈表
+        self.next_stone = list(range(area))
+        # 禁止下一手落子的劫爭點
+        self.ko = -1
+        # 按顏色索引的 Zobrist 鍵表（下標 0 不使用）和當前盤面的哈希
+        black_keys, white_keys = point_keys(size)
+        self.zobrist_keys = (None, black_keys, white_keys)
+        self.hash = SIZE_KEYS.get(size, 0)
+
+    def copy(self):
+        """複製盤面"""
+        board = BoardState.__new__(BoardState)
+        board.size = self.size
+        board.neighbors = self.neighbors
+        board.colors = self.colors[:]
+        board.parent = self.parent[:]
+        board.pseudo_liberties = self.pseudo_liberties[:]
+        board.group_sizes = self.group_sizes[:]
+        board.next_stone = self.next_stone[:]
+        board.ko = self.ko
+        board.zobrist_keys = self.zobrist_keys
+        board.hash = self.hash
+        return board
+
+    def point(self, x, y):
+        """將座標轉換為點的編號"""
+        if not (0 <= x < self.size and 0 <= y < self.size):
+            raise IllegalMove(f"座標超出棋盤範圍：{x}, {y}", OUTSIDE)
+        return x * self.size + y
+
+    def coords(self, point):
+        """將點的編號轉換為座標"""
+        return divmod(point, self.size)
+
+    def find(self, point):
+        """返回點所在棋串的根"""
+        parent = self.parent
+        while parent[point] != point:
+            parent[point] = parent[parent[point]]
+            point = parent[point]
+        return point
+
+    def get(self, x, y):
+        """返回座標上的顏色"""
+        return self.colors[self.point(x, y)]
+
+    @property
+    def ko_point(self):
+        """劫爭點的座標，沒有劫時為 None"""
+        return self.coords(self.ko) if self.ko >= 0 else None
+
+    def _check_point(self, point, color):
+        """檢查落子是否合法，不合法時拋出 IllegalMove"""
+        colors = self.colors
+        if colors[point] != EMPTY:
+            raise IllegalMove(f"該位置已有棋子：{self.coords(point)}", OCCUPIED)
+        if point == self.ko:
+            raise IllegalMove(f"劫爭中不能立即提回：{self.coords(point)}", KO)
+
+        # 統計相鄰棋串與此點的鄰接次數，偽氣數減去鄰接次數即為落子後剩下的氣
+        adjacent = {}
+        for neighbor in self.neighbors[point]:
+            if colors[neighbor] == EMPTY:
+                return
+            root = self.find(neighbor)
+            adjacent[root] = adjacent.get(root, 0) + 1
+
+        for root, count in adjacent.items():
+            remaining = self.pseudo_liberties[root] - count
+            if colors[root] == color:
+                if remaining > 0:
+                    return
+            elif remaining == 0:
+                # 可以提子
+                return
+        raise IllegalMove(f"不能自殺：{self.coords(point)}", SUICIDE)
+
+    def is_legal(self, x, y, color):
+        """判斷落子是否合法"""
+        try:
+            self._check_point(self.point(x, y), color)
+        except IllegalMove:
+            return False
+        return True
+
+    def play_point(self, point, color):
+        """在點上落子，返回被提走的點列表；不合法時拋出 IllegalMove"""
+        self._check_point(point, color)
+
+        colors = self.colors
+        parent = self.parent
+        pseudo_liberties = self.pseudo_liberties
+        neighbors = self.neighbors[point]
+
+        colors[point] = color
+        self.hash ^= self.zobrist_keys[color][point]
+        parent[point] = point
+        self.next_stone[point] = point
+        self.group_sizes[point] = 1
+        liberties = 0
+        for neighbor in neighbors:
+            if colors[neighbor] == EMPTY:
+                liberties += 1
+            else:
+                pseudo_liberties[self.find(neighbor)] -= 1
+        pseudo_liberties[point] = liberties
+
+        root = point
+        captured = []
+        enemy = opponent(color)
+        for neighbor in neighbors:
+            neighbor_color = colors[neighbor]
+            if neighbor_color == color:
+                root = self._union(root, self.find(neighbor))
+            elif neighbor_color == enemy:
+                enemy_root = self.find(neighbor)
+                if pseudo_liberties[enemy_root] == 0:
+                    captured.extend(self._remove_group(enemy_root))
+
+        # 單劫：只提一子，且落下的棋子孤立並只剩被提的那一口氣
+        if (len(captured) == 1 and self.group_sizes[root] == 1
+                and pseudo_liberties[root] == 1):
+            self.ko = captured[0]
+        else:
+            self.ko = -1
+        return captured
+
+    def play(self, x, y, color):
+        """在座標上落子，返回被提走的座標列表"""
+        captured = self.play_point(self.point(x, y), color)
+        return [self.coords(point) for point in captured]
+
+    def play_move(self, move):
+        """執行 'Bcd' 形式的著手，返回被提走的座標列表"""
+        color = COLOR_CHARS.get(move[:1])
+        if color is None or len(move) != 3:
+            raise IllegalMove(f"無效的著手：{move}")
+        return self.play(ord(move[1]) - 97, ord(move[2]) - 97, color)
+
+    def add_stones(self, stones):
+        """擺放 'Bcd' 形式的初始棋子，擺放後不保留劫爭狀態"""
+        for stone in stones:
+            self.play_move(stone)
+        self.ko = -1
+
+    def _union(self, a, b):
+        """合併兩個棋串，返回新的根"""
+        if a == b:
+            return a
+        if self.group_sizes[a] < self.group_sizes[b]:
+            a, b = b, a
+        self.parent[b] = a
+        self.group_sizes[a] += self.group_sizes[b]
+        self.pseudo_liberties[a] += self.pseudo_liberties[b]
+        # 交換後繼即可拼接兩個循環鏈表
+        next_stone = self.next_stone
+        next_stone[a], next_stone[b] = next_stone[b], next_stone[a]
+        return a
+
+    def _group_points(self, root):
+        points = [root]
+        next_stone = self.next_stone
+        point = next_stone[root]
+        while point != root:
+            points.append(point)
+            point = next_stone[point]
+        return points
+
+    def _remove_group(self, root):
+        """提走整個棋串，並把騰出的氣加回相鄰棋串"""
+        points = self._group_points(root)
+        colors = self.colors
+        keys = self.zobrist_keys[colors[root]]
+        for point in points:
+            colors[point] = EMPTY
+            self.hash ^= keys[point]
+        for point in points:
+            self.parent[point] = point
+            self.next_stone[point] = point
+            self.group_sizes[point] = 0
+            self.pseudo_liberties[point] = 0
+            for neighbor in self.neighbors[point]:
+                if colors[neighbor] != EMPTY:
+                    self.pseudo_liberties[self.find(neighbor)] += 1
+        return points
+
+    def position_key(self, to_move='B'):
+        """返回當前盤面的局面鍵，與 zobrist.position_key 對同一局面的結果相同"""
+        value = self.hash
+        if to_move == 'W':
+            value ^= WHITE_TO_MOVE_KEY
+        return to_signed64(value)
+
+    def group(self, x, y):
+        """返回座標所在棋串的所有座標"""
+        point = self.point(x, y)
+        if self.colors[point] == EMPTY:
+            return []
+        return [self.coords(p) for p in self._group_points(self.find(point))]
+
+    def liberties(self, x, y):
+        """返回座標所在棋串的氣（座標集合）"""
+        point = self.point(x, y)
+        if self.colors[point] == EMPTY:
+            return set()
+        colors = self.colors
+        liberties = set()
+        for stone in self._group_points(self.find(point)):
+            for neighbor in self.neighbors[stone]:
+                if colors[neighbor] == EMPTY:
+                    liberties.add(neighbor)
+        return {self.coords(p) for p in liberties}
+
+    def stones(self):
+        """返回 {(x, y): 顏色} 形式的所有棋子"""
+        size = self.size
+        return {
+            divmod(point, size): color
+            for point, color in enumerate(self.colors) if color != EMPTY
+        }
@@ -0,0 +1,178 @@
+"""注釋全文檢索
+
+題目的初始注釋和答案注釋寫入 FTS5 虛擬表 comments_fts，每條注釋一行，
+並以 game_id 關聯回 games 表。行號為 game_id 左移 COMMENT_ROWID_BITS 位加上注釋序號，
+刪除或替換一道題目時可以按行號範圍刪除它的注釋，不需要掃描整個表。FTS5 自帶的 unicode61 分詞器把連續的漢字
+當作一個詞，無法查找「黑先活」中的「先活」，因此寫入前在每個中日韓字符
+兩側加上空格，使每個字成為一個詞；查詢時同樣拆分，並以短語查詢要求各字相鄰。
+
+SQLite 未編譯 FTS5 時不創建此表，查詢退回 LIKE 全表掃描。
+"""
+import re
+import logging
+import sqlite3
+
+logger = logging.getLogger(__name__)
+
+COMMENT_TABLE = 'comments_fts'
+
+# 注釋來源
+INITIAL_COMMENT = 0
+ANSWER_COMMENT = 1
+
+# 行號中注釋序號所佔的位數，每道題目最多 2 ** COMMENT_ROWID_BITS 條注釋
+COMMENT_ROWID_BITS = 16
+
+# 中日韓部首、標點、假名、漢字、諺文以及全形字符
+_CJK_RE = re.compile(
+    '([\u2e80-\u2fdf\u3000-\u30ff\u3100-\u312f\u3190-\u31ff\u3400-\u4dbf'
+    '\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff\uff00-\uffef])'
+)
+
+# unicode61 分詞器保留的字符，標點和空白都是分隔符
+_TOKEN_RE = re.compile(r'\w+')
+
+def segment_text(text):
+    """在每個中日韓字符兩側加上空格，使 unicode61 分詞器逐字切分"""
+    return _CJK_RE.sub(r' \1 ', text)
+
+def match_expression(word):
+    """將一個查詢詞轉換為 FTS5 的短語查詢
+
+    詞中的各字必須相鄰出現；字母和數字按單詞匹配，最後一個單詞按前綴匹配。
+    詞中只有標點時返回 None。
+    """
+    tokens = _TOKEN_RE.findall(segment_text(word))
+    if not tokens:
+        return None
+    return '"' + ' '.join(tokens) + '" *'
+
+def create_comment_table(cursor):
+    """創建注釋全文索引表，SQLite 不支持 FTS5 時返回 False"""
+    try:
+        cursor.execute(f"""
+            CREATE VIRTUAL TABLE IF NOT EXISTS {COMMENT_TABLE} USING fts5(
+                content,
+                game_id UNINDEXED,
+                source UNINDEXED,
+                tokenize = 'unicode61'
+            )
+        """)
+    except sqlite3.OperationalError as e:
+        logger.warning(f"SQLite 不支持 FTS5，注釋搜索將使用全表掃描: {str(e)}")
+        return False
+    return True
+
+def has_comment_index(conn):
+    """數據庫中是否有注釋全文索引表"""
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+        (COMMENT_TABLE,)
+    ).fetchone() is not None
+
+def comment_rowid(game_id, index):
+    """返回題目第 index 條注釋在全文索引中的行號"""
+    return (game_id << COMMENT_ROWID_BITS) | index
+
+def comment_rows(game_id, game_data):
+    """返回一道題目寫入全文索引的 (行號, 內容, game_id, 來源) 行，空注釋不寫入"""
+    comments = [(game_data.get('initial_comment'), INITIAL_COMMENT)]
+    comments.extend(
+        (answer.get('comment'), ANSWER_COMMENT) for answer in game_data['answers'])
+    rows = []
+    for comment, source in comments:
+        if comment:
+            rowid = comment_rowid(game_id, len(rows))
+            rows.append((rowid, segment_text(comment), game_id, source))
+    return rows
+
+def insert_comment_rows(cursor, rows):
+    """批量寫入全文索引"""
+    cursor.executemany(
+        f"INSERT INTO {COMMENT_TABLE} (rowid, content, game_id, source) "
+        "VALUES (?, ?, ?, ?)",
+        rows
+    )
+
+def delete_comment_rows(cursor, game_ids):
+    """刪除指定題目在全文索引中的所有行"""
+    cursor.executemany(
+        f"DELETE FROM {COMMENT_TABLE} WHERE rowid BETWEEN ? AND ?",
+        ((comment_rowid(game_id, 0), comment_rowid(game_id + 1, 0) - 1)
+         for game_id in game_ids)
+    )
+
+def optimize_comment_index(cursor):
+    """合併全文索引的分段，應在批量寫入完成後調用"""
+    cursor.execute(f"INSERT INTO {COMMENT_TABLE} ({COMMENT_TABLE}) VALUES ('optimize')")
+
+def _iter_stored_comments(conn):
+    """按 game_id 順序產出數據庫中每道題目的 (game_id, 初始注釋, [答案注釋, ...])"""
+    answers = conn.execute(
+        "SELECT game_id, comment FROM answers WHERE comment <> '' "
+        "ORDER BY game_id, rowid")
+    pending = next(answers, None)
+    for game_id, initial_comment in conn.execute(
+            "SELECT game_id, initial_comment FROM games ORDER BY game_id"):
+        comments = []
+        # 跳過已不存在的題目的答案
+        while pending is not None and pending[0] < game_id:
+            pending = next(answers, None)
+        while pending is not None and pending[0] == game_id:
+            comments.append(pending[1])
+            pending = next(answers, None)
+        if initial_comment or comments:
+            yield game_id, initial_comment, comments
+
+def rebuild_comment_index(cursor):
+    """清空並根據 games 和 answers 表重新生成全文索引"""
+    cursor.execute(f"DELETE FROM {COMMENT_TABLE}")
+    conn = cursor.connection
+    insert_comment_rows(cursor, (
+        row
+        for game_id, initial_comment, comments in _iter_stored_comments(conn)
+        for row in comment_rows(game_id, {
+            'initial_comment': initial_comment,
+            'answers': [{'comment': comment} for comment in comments],
+        })
+    ))
+    optimize_comment_index(cursor)
+
+def escape_like(text):
+    """轉義 LIKE 模式中的通配符，配合 ESCAPE '\\' 使用"""
+    return text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+def comment_condition(conn, text):
+    """返回篩選注釋包含 text 的題目的 (條件, 參數)，條件作用於 games 表（別名 g）
+
+    text 以空白分隔的各詞都要出現在題目的注釋中，但不必在同一條注釋中。
+    """
+    conditions = []
+    params = []
+    if has_comment_index(conn):
+        for word in text.split():
+            expression = match_expression(word)
+            if expression is not None:
+                conditions.append(f"g.game_id IN (SELECT game_id FROM {COMMENT_TABLE} "
+                                  f"WHERE {COMMENT_TABLE} MATCH ?)")
+                params.append(expression)
+    else:
+        for word in text.split():
+            pattern = f"%{escape_like(word)}%"
+            conditions.append(
+                "(g.initial_comment LIKE ? ESCAPE '\\' OR EXISTS ("
+                "SELECT 1 FROM answers c WHERE c.game_id = g.game_id "
+                "AND c.comment LIKE ? ESCAPE '\\'))"
+            )
+            params.extend((pattern, pattern))
+    if not conditions:
+        raise ValueError("查詢文字不能為空")
+    return ' AND '.join(conditions), tuple(params)
+
+def search_comments(conn, text, limit=None):
+    """查找注釋包含 text 的題目，返回按 game_id 排序的 [(級別, ID), ...]"""
+    condition, params = comment_condition(conn, text)
+    sql = f"SELECT g.level, g.id FROM games g WHERE {condition} ORDER BY g.game_id"
+    if limit is not None:
+        sql += f" LIMIT {int(limit)}"
+    return conn.execute(sql, params).fetchall()
@@ -0,0 +1,226 @@
+"""緊湊的題目內存表示
+
+大型題庫以 parse_shf_line 的字典格式常駐內存時，每顆棋子和每個答案都是一個字典，
+佔用數 KB。CompactProblem 使用 __slots__，將棋子和著手打包在一個 array 中，
+答案序列以扁平數組記錄，注釋以 UTF-8 字節保存並在訪問時才解碼。
+
+每個點以 (x * 19 + y) << 1 | color 編碼為一個 16 位整數：19 路盤有 361 個點，
+無法放入單個字節，因此多用一位同時記錄顏色（黑 0、白 1）。
+"""
+import sys
+from array import array
+
+from shf_tools.core.parser import (Answer, Problem, format_line, parse_line,
+                                   iter_problems)
+
+# 級別代碼：00 為 0，30k 到 1k 為 1 到 30，1d 到 9d 為 31 到 39，數值越大越強
+LEVEL_CODES = {'00': 0}
+LEVEL_CODES.update({f"{k}k": 31 - k for k in range(30, 0, -1)})
+LEVEL_CODES.update({f"{d}d": 30 + d for d in range(1, 10)})
+CODE_TO_LEVEL = {code: level for level, code in LEVEL_CODES.items()}
+
+ANSWER_TYPE_CODES = {'+': 0, '-': 1, '/': 2}
+CODE_TO_ANSWER_TYPE = {
+    code: answer_type for answer_type, code in ANSWER_TYPE_CODES.items()
+}
+
+COLOR_BITS = {'B': 0, 'W': 1}
+BIT_TO_COLOR = ('B', 'W')
+
+# 注釋之間的分隔符
+_COMMENT_SEP = '\0'
+
+def level_to_code(level):
+    """將級別字符串轉換為代碼，兼容 05k 這類寫法"""
+    code = LEVEL_CODES.get(level)
+    if code is None:
+        try:
+            code = LEVEL_CODES[f"{int(level[:-1])}{level[-1:].lower()}"]
+        except (ValueError, KeyError):
+            raise ValueError(f"無效的級別格式：{level}")
+    return code
+
+def code_to_level(code):
+    """將級別代碼轉換為級別字符串"""
+    try:
+        return CODE_TO_LEVEL[code]
+    except KeyError:
+        raise ValueError(f"無效的級別代碼：{code}")
+
+def encode_point(stone):
+    """將 'Bcd' 形式的棋子編碼為整數"""
+    x = ord(stone[1]) - 97
+    y = ord(stone[2]) - 97
+    return (x * 19 + y) << 1 | COLOR_BITS[stone[0]]
+
+def decode_point(value):
+    """將整數還原為 'Bcd' 形式的棋子"""
+    x, y = divmod(value >> 1, 19)
+    return f"{BIT_TO_COLOR[value & 1]}{chr(97 + x)}{chr(97 + y)}"
+
+def unpack_point(value):
+    """將整數拆分為 (x, y, color)"""
+    x, y = divmod(value >> 1, 19)
+    return x, y, BIT_TO_COLOR[value & 1]
+
+class CompactProblem:
+    """以數組保存的題目
+
+    points 依次保存初始棋子和所有答案的著手；answer_ends 中每一項為
+    (答案結束位置 << 2) | 答案類型代碼，答案 i 的著手為
+    points[前一答案結束位置:本答案結束位置]。
+    """
+    __slots__ = ('level_code', 'number', 'size', 'stone_count', 'points', 'answer_ends',
+                 '_comments')
+
+    def __init__(self, level_code, number, size, stone_count, points, answer_ends,
+                 comments=None):
+        self.level_code = level_code
+        self.number = number
+        self.size = size
+        self.stone_count = stone_count
+        self.points = points
+        self.answer_ends = answer_ends
+        # 所有注釋以 \0 連接後的 UTF-8 字節，全部為空時為 None
+        self._comments = comments
+
+    @classmethod
+    def from_problem(cls, problem):
+        """從 Problem 創建"""
+        points = array('H', map(encode_point, problem.stones))
+        stone_count = len(points)
+        answer_ends = array('I')
+        comments = [problem.initial_comment]
+        for answer in problem.answers:
+            points.extend(map(encode_point, answer.moves))
+            answer_ends.append(len(points) << 2 | ANSWER_TYPE_CODES[answer.type])
+            comments.append(answer.comment)
+
+        if any(comments):
+            text = _COMMENT_SEP.join(comments)
+            if text.count(_COMMENT_SEP) != len(comments) - 1:
+                raise ValueError("注釋中不能包含空字符")
+            packed_comments = text.encode('utf-8')
+        else:
+            packed_comments = None
+
+        return cls(level_to_code(problem.level), int(problem.id), problem.size,
+                   stone_count, points, answer_ends, packed_comments)
+
+    @classmethod
+    def from_line(cls, line, strict=False):
+        """從 SHF 行創建"""
+        return cls.from_problem(parse_line(line, strict))
+
+    @classmethod
+    def from_dict(cls, game_data):
+        """從 parse_shf_line 的字典格式創建"""
+        return cls.from_problem(Problem.from_dict(game_data))
+
+    @property
+    def level(self):
+        return CODE_TO_LEVEL[self.level_code]
+
+    @property
+    def id(self):
+        return f"{self.number:05d}"
+
+    @property
+    def key(self):
+        """題目在題庫中的唯一標識"""
+        return f"{self.level}:{self.id}"
+
+    def _comment_list(self):
+        if self._comments is None:
+            return [''] * (len(self.answer_ends) + 1)
+        return self._comments.decode('utf-8').split(_COMMENT_SEP)
+
+    @property
+    def initial_comment(self):
+        if self._comments is None:
+            return ''
+        return self._comments.decode('utf-8').split(_COMMENT_SEP, 1)[0]
+
+    @property
+    def stones(self):
+        """初始棋子，'Bcd' 形式的元組"""
+        return tuple(map(decode_point, self.points[:self.stone_count]))
+
+    def answer_count(self):
+        return len(self.answer_ends)
+
+    def answer_type(self, index):
+        return CODE_TO_ANSWER_TYPE[self.answer_ends[index] & 3]
+
+    def answer_points(self, index):
+        """返回答案 index 的著手編碼數組"""
+        start = self.answer_ends[index - 1] >> 2 if index else self.stone_count
+        return self.points[start:self.answer_ends[index] >> 2]
+
+    def answer_comment(self, index):
+        if self._comments is None:
+            return ''
+        return self._comment_list()[index + 1]
+
+    @property
+    def answers(self):
+        """解碼後的答案元組"""
+        comments = self._comment_list()
+        answers = []
+        start = self.stone_count
+        for index, packed in enumerate(self.answer_ends):
+            end = packed >> 2
+            answers.append(Answer(
+                CODE_TO_ANSWER_TYPE[packed & 3],
+                tuple(map(decode_point, self.points[start:end])),
+                comments[index + 1]
+            ))
+            start = end
+        return tuple(answers)
+
+    def to_problem(self):
+        """還原為 Problem"""
+        return Problem(self.level, self.id, self.size, self.stones,
+                       self.initial_comment, self.answers)
+
+    def to_dict(self):
+        """還原為 format_shf_line 使用的字典格式"""
+        return self.to_problem().to_dict()
+
+    def to_line(self):
+        """格式化為 SHF 行"""
+        return format_line(self.to_problem())
+
+    def __eq__(self, other):
+        return isinstance(other, CompactProblem) and all(
+            getattr(self, name) == getattr(other, name) for name in self.__slots__
+        )
+
+    def __repr__(self):
+        return (f"CompactProblem({self.key}, size={self.size}, "
+                f"stones={self.stone_count}, answers={len(self.answer_ends)})")
+
+    def nbytes(self):
+        """估算佔用的內存字節數"""
+        total = (sys.getsizeof(self) + sys.getsizeof(self.points)
+                 + sys.getsizeof(self.answer_ends))
+        if self._comments is not None:
+            total += sys.getsizeof(self._comments)
+        return total
+
+def load_compact(file_path, strict=False):
+    """讀取 SHF 文件中的所有題目，返回 (題目列表, 錯誤列表)
+
+    錯誤列表中每項為 (行號, 異常)。
+    """
+    problems = []
+    errors = []
+    for line_no, problem, error in iter_problems(file_path, strict):
+        if error is None:
+            try:
+                problems.append(CompactProblem.from_problem(problem))
+                continue
+            except ValueError as e:
+                error = e
+        errors.append((line_no, error))
+    return problems, errors
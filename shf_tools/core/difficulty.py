@@ -0,0 +1,325 @@
+"""按題目特徵估計難度，為級別為 00 的題目補上級別
+
+每道題目取以下特徵：棋盤大小、初始棋子數、答案數、正確和錯誤答案數、
+答案的最大和平均手數、第一手的不同選擇數（分支數），以及可選的求解器節點數。
+在已標記級別的題目上以最小二乘擬合線性模型（計數特徵取 log1p），
+預測值四捨五入為級別代碼後寫入 games.estimated_level_code，或在輸出的
+SHF 文件中替換 00 級別。
+
+數據庫的特徵以一條分組查詢讀出；安裝了 numpy 時擬合和預測都是整列的矩陣運算，
+一次處理上百萬道題目，沒有 numpy 時以正規方程逐行累加。
+"""
+import math
+import logging
+
+from shf_tools.core.compact import code_to_level, level_to_code
+from shf_tools.core.parallel import imap_ordered
+from shf_tools.core.parser import iter_problems, parse_line
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+logger = logging.getLogger(__name__)
+
+# 原始特徵，順序與特徵行一致；啟用求解器時最後再加一列節點數
+FEATURES = ('size', 'stone_count', 'answer_count', 'correct_count', 'wrong_count',
+            'max_depth', 'mean_depth', 'branching')
+
+# 可預測的級別代碼範圍：30k 到 9d
+MIN_LEVEL_CODE = 1
+MAX_LEVEL_CODE = 39
+
+# 每批交給子進程求解的題目數
+DEFAULT_BATCH_LINES = 200
+
+def problem_features(problem):
+    """返回 Problem 的原始特徵，順序同 FEATURES"""
+    answers = problem.answers
+    depths = [len(answer.moves) for answer in answers]
+    types = [answer.type for answer in answers]
+    first_moves = {answer.moves[0] for answer in answers if answer.moves}
+    return (
+        problem.size, len(problem.stones), len(answers),
+        types.count('+'), types.count('-'),
+        max(depths, default=0), sum(depths) / len(depths) if depths else 0.0,
+        len(first_moves),
+    )
+
+# 答案的手數：以逗號分隔的著手數，空答案為 0
+_DEPTH_SQL = ("CASE WHEN a.moves = '' THEN 0 "
+              "ELSE length(a.moves) - length(replace(a.moves, ',', '')) + 1 END")
+
+def database_features(conn):
+    """一次分組查詢讀出所有題目的特徵
+
+    返回 (game_id 列表, 級別代碼列表, 特徵行)，按 game_id 排序；安裝了 numpy 時
+    特徵行為二維數組。
+    """
+    cursor = conn.execute(f"""
+        SELECT g.game_id, COALESCE(g.level_code, 0), g.size, g.stone_count,
+               g.answer_count, g.correct_count, g.wrong_count,
+               COALESCE(d.max_depth, 0), COALESCE(d.mean_depth, 0),
+               COALESCE(d.branching, 0)
+        FROM games g LEFT JOIN (
+            SELECT a.game_id,
+                   MAX({_DEPTH_SQL}) AS max_depth,
+                   AVG({_DEPTH_SQL}) AS mean_depth,
+                   COUNT(DISTINCT CASE WHEN a.moves = '' THEN NULL
+                                       ELSE substr(a.moves, 1, 3) END) AS branching
+            FROM answers a
+            GROUP BY a.game_id
+        ) d ON d.game_id = g.game_id
+        ORDER BY g.game_id
+    """)
+    if np is not None:
+        # 直接從游標填入結構化數組，不為每行保留 Python 元組
+        dtype = np.dtype([('game_id', np.int64), ('level_code', np.int64)]
+                         + [(name, np.float64) for name in FEATURES])
+        table = np.fromiter(cursor, dtype=dtype)
+        if len(table):
+            features = np.column_stack([table[name] for name in FEATURES])
+        else:
+            features = np.zeros((0, len(FEATURES)))
+        return table['game_id'].tolist(), table['level_code'].tolist(), features
+
+    game_ids = []
+    level_codes = []
+    features = []
+    for row in cursor:
+        game_ids.append(row[0])
+        level_codes.append(row[1])
+        features.append(row[2:])
+    return game_ids, level_codes, features
+
+def _solve_lines(task):
+    """求解一批題目的初始局面，返回各題使用的節點數"""
+    from shf_tools.core.solver import Solver
+
+    options, lines = task
+    counts = []
+    for line in lines:
+        try:
+            solver = Solver(parse_line(line, strict=False), **options)
+        except Exception:
+            counts.append(0)
+            continue
+        solver.solve()
+        counts.append(solver.nodes)
+    return counts
+
+def solver_node_counts(lines, workers=None, batch_lines=DEFAULT_BATCH_LINES, **options):
+    """並行求解每道題目的初始局面，按順序返回節點數列表
+
+    lines 為 SHF 行的可迭代對象；無法求解的題目節點數為 0，未分勝負的為上限。
+    options 傳給 Solver。
+    """
+    def batches():
+        batch = []
+        for line in lines:
+            batch.append(line)
+            if len(batch) >= batch_lines:
+                yield options, batch
+                batch = []
+        if batch:
+            yield options, batch
+
+    counts = []
+    for batch_counts in imap_ordered(_solve_lines, batches(), workers):
+        counts.extend(batch_counts)
+    return counts
+
+def _design_row(row):
+    """原始特徵轉換為回歸用的特徵行：常數項、棋盤大小比例、其餘特徵取 log1p"""
+    return (1.0, row[0] / 19.0) + tuple(math.log1p(value) for value in row[1:])
+
+def _design_matrix(features):
+    features = np.asarray(features, dtype=np.float64)
+    return np.column_stack((
+        np.ones(len(features)), features[:, 0] / 19.0, np.log1p(features[:, 1:])
+    ))
+
+def _solve_normal_equations(matrix, vector):
+    """以部分主元的高斯消去法解線性方程組，奇異的主元對應的係數為 0"""
+    n = len(vector)
+    rows = [list(matrix[i]) + [vector[i]] for i in range(n)]
+    for column in range(n):
+        pivot = max(range(column, n), key=lambda r: abs(rows[r][column]))
+        rows[column], rows[pivot] = rows[pivot], rows[column]
+        if abs(rows[column][column]) < 1e-12:
+            continue
+        for r in range(n):
+            if r != column and rows[r][column]:
+                factor = rows[r][column] / rows[column][column]
+                rows[r] = [a - factor * b for a, b in zip(rows[r], rows[column])]
+    return [
+        rows[i][n] / rows[i][i] if abs(rows[i][i]) >= 1e-12 else 0.0
+        for i in range(n)
+    ]
+
+def fit_difficulty(features, level_codes):
+    """在已標記級別（代碼大於 0）的題目上擬合模型，返回係數列表
+
+    沒有已標記的題目時拋出 ValueError。
+    """
+    if np is not None:
+        codes = np.asarray(level_codes, dtype=np.float64)
+        labeled = codes > 0
+        if not labeled.any():
+            raise ValueError("沒有已標記級別的題目，無法擬合難度模型")
+        matrix = _design_matrix(features)[labeled]
+        coefficients = np.linalg.lstsq(matrix, codes[labeled], rcond=None)[0]
+        return coefficients.tolist()
+
+    normal = None
+    target = None
+    labeled = 0
+    for row, code in zip(features, level_codes):
+        if not code:
+            continue
+        x = _design_row(row)
+        if normal is None:
+            normal = [[0.0] * len(x) for _ in x]
+            target = [0.0] * len(x)
+        for i, xi in enumerate(x):
+            target[i] += xi * code
+            normal_row = normal[i]
+            for j, xj in enumerate(x):
+                normal_row[j] += xi * xj
+        labeled += 1
+    if not labeled:
+        raise ValueError("沒有已標記級別的題目，無法擬合難度模型")
+    return _solve_normal_equations(normal, target)
+
+def predict_levels(features, coefficients):
+    """預測級別代碼，四捨五入並限制在 MIN_LEVEL_CODE 到 MAX_LEVEL_CODE 之間"""
+    if not len(features):
+        return []
+    if np is not None:
+        coefficients = np.asarray(coefficients, dtype=np.float64)
+        predicted = np.rint(_design_matrix(features) @ coefficients)
+        predicted = np.clip(predicted, MIN_LEVEL_CODE, MAX_LEVEL_CODE)
+        return predicted.astype(np.int64).tolist()
+    return [
+        min(MAX_LEVEL_CODE, max(MIN_LEVEL_CODE, int(round(
+            sum(c * x for c, x in zip(coefficients, _design_row(row)))))))
+        for row in features
+    ]
+
+def mean_absolute_error(predicted, level_codes):
+    """已標記題目上預測與實際級別代碼的平均絕對誤差
+
+    這些題目也用於擬合，結果是訓練（樣本內）誤差，對新題目的誤差通常更大。
+    """
+    errors = [abs(p - code) for p, code in zip(predicted, level_codes) if code]
+    return sum(errors) / len(errors) if errors else 0.0
+
+def _add_solver_feature(features, counts):
+    if np is not None:
+        return np.column_stack((np.asarray(features, dtype=np.float64), counts))
+    return [tuple(row) + (count,) for row, count in zip(features, counts)]
+
+def estimate_database(conn, output=None, use_solver=False, workers=None, log=None):
+    """為數據庫中級別為 00 的題目估計級別，寫入 games.estimated_level_code
+
+    games.level 保持不變，以免改變增量導入所用的 (level, id)。指定 output 時
+    另把所有題目寫入 SHF 文件，級別為 00 的題目換成估計的級別。
+    返回 ({game_id: 級別代碼}, 已標記題目上的訓練誤差)。
+    """
+    from shf_tools.core.exporter import format_shf_line, iter_game_records
+
+    game_ids, level_codes, features = database_features(conn)
+    if use_solver:
+        # 進程池在另一個線程中讀取任務，不能直接交給它讀數據庫游標的生成器
+        lines = [format_shf_line(game_data) for game_data in iter_game_records(conn)]
+        counts = solver_node_counts(lines, workers)
+        lines = None
+        features = _add_solver_feature(features, counts)
+
+    coefficients = fit_difficulty(features, level_codes)
+    predicted = predict_levels(features, coefficients)
+    error = mean_absolute_error(predicted, level_codes)
+    estimates = {
+        game_id: code
+        for game_id, level_code, code in zip(game_ids, level_codes, predicted)
+        if not level_code
+    }
+
+    cursor = conn.cursor()
+    cursor.execute("UPDATE games SET estimated_level_code = NULL "
+                   "WHERE estimated_level_code IS NOT NULL")
+    cursor.executemany(
+        "UPDATE games SET estimated_level_code = ? WHERE game_id = ?",
+        ((code, game_id) for game_id, code in estimates.items())
+    )
+    conn.commit()
+
+    if output is not None:
+        with open(output, 'w', encoding='utf-8') as out:
+            # 兩者都按 game_id 排序
+            for game_id, game_data in zip(game_ids, iter_game_records(conn)):
+                if game_id in estimates:
+                    game_data['level'] = code_to_level(estimates[game_id])
+                out.write(format_shf_line(game_data) + '\n')
+
+    message = (f"已估計 {len(estimates)} 道題目的級別，"
+               f"已標記題目上的訓練誤差（樣本內平均絕對誤差）{error:.2f} 級")
+    logger.info(message)
+    if log is not None:
+        log(message)
+    return estimates, error
+
+def _iter_file_problems(input_files, warn=False):
+    """產出所有能解析的題目，無法解析的行被略過"""
+    for file_path in input_files:
+        for line_no, problem, error in iter_problems(file_path, strict=False):
+            if error is None:
+                yield problem
+            elif warn:
+                logger.warning(f"{file_path} 第 {line_no} 行無法解析: {str(error)}")
+
+def _problem_level_code(problem):
+    try:
+        return level_to_code(problem.level)
+    except ValueError:
+        return 0
+
+def estimate_files(input_files, output, use_solver=False, workers=None, log=None):
+    """讀取 SHF 文件，把所有題目寫入 output，級別為 00 的題目換成估計的級別
+
+    特徵和輸出各讀一遍文件，不把題目全部保存在內存中；use_solver 為 True 時
+    讀取特徵的同時保存題目行交給求解器。無法解析的行不寫入 output。
+    返回 (估計級別的題目數, 已標記題目上的訓練誤差)。
+    """
+    features = []
+    level_codes = []
+    lines = [] if use_solver else None
+    for problem in _iter_file_problems(input_files, warn=True):
+        features.append(problem_features(problem))
+        level_codes.append(_problem_level_code(problem))
+        if lines is not None:
+            lines.append(problem.to_line())
+    if use_solver:
+        counts = solver_node_counts(lines, workers)
+        lines = None
+        features = _add_solver_feature(features, counts)
+
+    coefficients = fit_difficulty(features, level_codes)
+    predicted = predict_levels(features, coefficients)
+    error = mean_absolute_error(predicted, level_codes)
+
+    estimated = 0
+    with open(output, 'w', encoding='utf-8') as out:
+        for index, problem in enumerate(_iter_file_problems(input_files)):
+            if not level_codes[index]:
+                problem.level = code_to_level(predicted[index])
+                estimated += 1
+            out.write(problem.to_line() + '\n')
+
+    message = (f"已估計 {estimated} 道題目的級別，"
+               f"已標記題目上的訓練誤差（樣本內平均絕對誤差）{error:.2f} 級")
+    logger.info(message)
+    if log is not None:
+        log(message)
+    return estimated, error
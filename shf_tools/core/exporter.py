@@ -0,0 +1,271 @@
+"""SQLite 數據庫導出 SHF 文件
+
+流式讀取數據庫中的題目並格式化為 SHF 行，供 sqlite2shf 界面和命令行共用。
+"""
+import os
+import logging
+import sqlite3
+import itertools
+
+from shf_tools.core.parser import Problem, format_line
+from shf_tools.core.schema import SCHEMA_VERSION, upgrade_schema
+
+logger = logging.getLogger(__name__)
+
+# 合集文件的寫入緩衝區大小
+COLLECTION_BUFFER_SIZE = 1024 * 1024
+
+# 合集文件中各棋盤大小分區的標題
+SECTION_TITLES = {
+    9: "9路盤題目集合",
+    13: "13路盤題目集合",
+    19: "19路盤題目集合",
+}
+
+# 合集模式的題目順序：按棋盤大小分區，分區內按級別代碼從易到難排列。
+# 級別文字按字典序會把 10k 排在 1k 和 2k 之間，只用來區分寫法不同的同一級別
+COLLECTION_ORDER = "g.size, g.level_code, g.level, g.game_id"
+
+def format_shf_line(game_data):
+    """將遊戲數據格式化為 SHF 格式行"""
+    try:
+        # 驗證必要字段
+        required_fields = ['id', 'level', 'size', 'initial_positions', 'answers']
+        for field in required_fields:
+            if field not in game_data:
+                raise ValueError(f"缺少必要字段：{field}")
+
+        return format_line(Problem.from_dict(game_data))
+
+    except Exception as e:
+        logger.error(f"格式化 SHF 行時出錯: {str(e)}")
+        raise
+
+def _group_rows_by_game(cursor):
+    """將按題目排序的查詢結果按第一列的 game_id 分組"""
+    for game_id, rows in itertools.groupby(cursor, key=lambda row: row[0]):
+        yield game_id, [row[1:] for row in rows]
+
+def count_games(conn):
+    """統計數據庫中的題目數"""
+    return conn.execute("SELECT COUNT(*) FROM games").fetchone()[0]
+
+def iter_game_records(conn, order_by="g.game_id", where=None, params=(), limit=None):
+    """流式讀取所有題目，產出可直接交給 format_shf_line 的數據
+
+    games、initial_positions 和 answers 各用一個游標，按相同的題目順序
+    掃描，然後按 game_id 合併，不需要為每道題目單獨查詢。
+    order_by 是作用於 games 表（別名 g）的排序表達式，必須唯一確定題目順序。
+    where 是作用於 games 表的篩選條件，params 為其參數；limit 限制題目數。
+    """
+    where_clause = f"WHERE {where}" if where else ""
+    params = tuple(params)
+    limit_clause = f"LIMIT {int(limit)}" if limit is not None else ""
+    games = conn.cursor().execute(f"""
+        SELECT g.game_id, g.id, g.level, g.size, g.initial_comment
+        FROM games g
+        {where_clause}
+        ORDER BY {order_by}
+        {limit_clause}
+    """, params)
+    positions = _group_rows_by_game(conn.cursor().execute(f"""
+        SELECT p.game_id, p.color, p.position
+        FROM games g JOIN initial_positions p ON p.game_id = g.game_id
+        {where_clause}
+        ORDER BY {order_by}, p.rowid
+    """, params))
+    answers = _group_rows_by_game(conn.cursor().execute(f"""
+        SELECT a.game_id, a.answer_type, a.moves, a.comment
+        FROM games g JOIN answers a ON a.game_id = g.game_id
+        {where_clause}
+        ORDER BY {order_by}, a.rowid
+    """, params))
+
+    next_positions = next(positions, None)
+    next_answers = next(answers, None)
+
+    for game_id, id_str, level, size, initial_comment in games:
+        # 三個游標的題目順序相同，子表中沒有行的題目會被直接跳過
+        initial_positions = []
+        if next_positions is not None and next_positions[0] == game_id:
+            initial_positions = [
+                {'color': color, 'position': position}
+                for color, position in next_positions[1]
+            ]
+            next_positions = next(positions, None)
+
+        game_answers = []
+        if next_answers is not None and next_answers[0] == game_id:
+            for type, moves, comment in next_answers[1]:
+                game_answers.append({
+                    'type': type,
+                    'moves': moves.strip(','),  # 移除可能的尾隨逗號
+                    'comment': comment.strip(',') if comment else ''  # 移除注釋中的尾隨逗號
+                })
+            next_answers = next(answers, None)
+
+        yield {
+            'id': id_str,
+            'level': level,
+            'size': size,
+            # 移除初始注釋中的尾隨逗號
+            'initial_comment': initial_comment.strip(',') if initial_comment else '',
+            'initial_positions': initial_positions,
+            'answers': game_answers
+        }
+
+class CollectionWriter:
+    """將題目寫入一個或多個合集文件
+
+    題目按棋盤大小分區並寫入分區標題，格式與 examples/collection.shf 相同。
+    shard_size 大於 0 時，每個文件最多寫入 shard_size 道題目。
+    """
+
+    def __init__(self, output_dir, shard_size=0, prefix="collection"):
+        self.output_dir = output_dir
+        self.shard_size = max(0, int(shard_size))
+        self.prefix = prefix
+        self.file = None
+        self.file_path = None
+        self.shard_index = 0
+        self.shard_count = 0
+        self.current_size = None
+        self.files = []
+
+    def _open_next_shard(self):
+        """關閉當前文件並打開下一個分片"""
+        self.close()
+        self.shard_index += 1
+        if self.shard_size:
+            name = f"{self.prefix}_{self.shard_index:04d}.shf"
+        else:
+            name = f"{self.prefix}.shf"
+        self.file_path = os.path.join(self.output_dir, name)
+        self.file = open(self.file_path, 'w', encoding='utf-8',
+                         buffering=COLLECTION_BUFFER_SIZE)
+        self.files.append(self.file_path)
+        self.shard_count = 0
+        self.current_size = None
+
+    def write(self, game_data, shf_line):
+        """寫入一道題目，返回所在的文件路徑"""
+        if self.file is None or (
+                self.shard_size and self.shard_count >= self.shard_size):
+            self._open_next_shard()
+
+        size = game_data['size']
+        if size != self.current_size:
+            # 新分區之間空一行
+            if self.current_size is not None:
+                self.file.write('\n')
+            title = SECTION_TITLES.get(size, f"{size}路盤題目集合")
+            self.file.write(f"# {title}\n")
+            self.current_size = size
+
+        self.file.write(shf_line)
+        self.file.write('\n')
+        self.shard_count += 1
+        return self.file_path
+
+    def close(self):
+        """關閉當前文件"""
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+def _report(log, message, level=logging.INFO):
+    """記錄日誌並轉發給調用方的回調"""
+    logger.log(level, message)
+    if log is not None:
+        log(message)
+
+def export_files(conn, output_dir, total_games, log=None, progress=None):
+    """每道題目寫入一個單獨的 SHF 文件，返回導出的題目數"""
+    processed_games = 0
+    
+    for game_data in iter_game_records(conn):
+        try:
+            game_id = game_data['id']
+            level = game_data['level']
+            
+            # 格式化為 SHF 格式
+            shf_content = format_shf_line(game_data)
+            
+            # 寫入文件（使用不帶冒號的文件名）
+            output_file = os.path.join(output_dir, f"{level.lower()}{game_id}.shf")
+            with open(output_file, 'w', encoding='utf-8') as f:
+                f.write(shf_content)
+            
+            processed_games += 1
+            if progress is not None:
+                progress(int((processed_games / total_games) * 100))
+            _report(log, f"已處理: {output_file}", logging.DEBUG)
+            
+        except Exception as e:
+            _report(log, f"處理遊戲 {game_id} 時出錯: {str(e)}", logging.ERROR)
+            continue
+
+    return processed_games
+
+def export_collection(conn, output_dir, total_games, shard_size=0, log=None,
+                      progress=None):
+    """將所有題目寫入按棋盤大小分區的合集文件，返回導出的題目數"""
+    processed_games = 0
+    last_progress = -1
+
+    with CollectionWriter(output_dir, shard_size) as writer:
+        for game_data in iter_game_records(conn, order_by=COLLECTION_ORDER):
+            try:
+                shf_content = format_shf_line(game_data)
+                file_count = len(writer.files)
+                writer.write(game_data, shf_content)
+                if len(writer.files) != file_count:
+                    _report(log, f"寫入合集文件: {writer.file_path}")
+
+                processed_games += 1
+                current_progress = int((processed_games / total_games) * 100)
+                if progress is not None and current_progress != last_progress:
+                    progress(current_progress)
+                    last_progress = current_progress
+
+            except Exception as e:
+                game_key = f"{game_data['level']}:{game_data['id']}"
+                _report(log, f"處理遊戲 {game_key} 時出錯: {str(e)}", logging.ERROR)
+                continue
+
+    _report(log, f"已導出 {processed_games} 道題目到 {len(writer.files)} 個合集文件")
+    return processed_games
+
+def export_database(db_path, output_dir, collection=False, shard_size=0, log=None,
+                    progress=None):
+    """將數據庫中的題目導出為 SHF 文件
+
+    collection 為 True 時寫入合集文件，否則每題一個文件。
+    log(message) 和 progress(percent) 是可選的回調。返回導出的題目數。
+    """
+    if not os.path.exists(db_path):
+        raise FileNotFoundError(f"找不到數據庫文件：{db_path}")
+    os.makedirs(output_dir, exist_ok=True)
+    
+    # 連接數據庫
+    conn = sqlite3.connect(db_path)
+    try:
+        # 舊版本數據庫就地升級並補齊索引
+        old_version = upgrade_schema(conn)
+        if old_version < SCHEMA_VERSION:
+            _report(log, f"數據庫結構已從版本 {old_version} 升級到 {SCHEMA_VERSION}")
+        
+        total_games = count_games(conn)
+
+        if collection:
+            return export_collection(
+                conn, output_dir, total_games, shard_size, log, progress)
+        return export_files(conn, output_dir, total_games, log, progress)
+    finally:
+        conn.close()
@@ -0,0 +1,421 @@
+"""SHF 文件導入 SQLite 數據庫
+
+解析 SHF 題目行並批量寫入數據庫，供 shf2sqlite 界面和命令行共用。
+
+每個導入的文件都記錄在 sources 表中（路徑、修改時間、大小和內容哈希）。
+增量導入時不重建數據庫：修改時間和大小未變的文件直接跳過，內容哈希未變的
+文件只更新修改時間；有變化的文件按 (level, id) 覆蓋已有題目，並刪除文件中
+已不存在的題目；不在本次輸入中的來源文件的題目一併刪除。有變化的文件不能
+覆蓋屬於未變化文件的題目，這種情況與重建數據庫時一樣報告為重複的題目。
+"""
+import os
+import hashlib
+import logging
+import sqlite3
+
+from shf_tools.core.comment_search import (comment_rows, delete_comment_rows,
+                                           has_comment_index, insert_comment_rows,
+                                           optimize_comment_index)
+from shf_tools.core.compact import level_to_code
+from shf_tools.core.parser import parse_line, validate_position
+from shf_tools.core.schema import create_tables, create_indexes, upgrade_schema
+from shf_tools.core.zobrist import first_mover, position_key
+
+logger = logging.getLogger(__name__)
+
+# 批量寫入時每批緩衝的題目數
+DEFAULT_BATCH_SIZE = 1000
+
+# 導入期間使用的頁緩存大小（MB）
+DEFAULT_CACHE_SIZE_MB = 64
+
+# 按 game_id 刪除題目時每條語句的參數個數，不超過 SQLite 的限制
+_DELETE_BATCH = 500
+
+def setup_database(db_path):
+    """設置數據庫結構"""
+    try:
+        # 如果數據庫文件已存在，先刪除它
+        if os.path.exists(db_path):
+            os.remove(db_path)
+            
+        # 創建新的數據庫連接
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+        
+        # 創建表（二級索引在導入完成後再創建）
+        create_tables(cursor)
+        
+        conn.commit()
+        return conn, cursor
+    except Exception as e:
+        logger.error(f"設置數據庫時出錯: {str(e)}")
+        raise
+
+def apply_import_pragmas(conn, cache_size_mb=DEFAULT_CACHE_SIZE_MB):
+    """設置批量導入使用的 PRAGMA，返回原來的日誌模式"""
+    journal_mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+    conn.execute("PRAGMA journal_mode=WAL")
+    # 導入期間不等待磁盤同步；只對當前連接有效，關閉連接後即恢復
+    conn.execute("PRAGMA synchronous=OFF")
+    # 負數表示以 KB 為單位
+    conn.execute(f"PRAGMA cache_size=-{int(cache_size_mb) * 1024}")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    return journal_mode
+
+def finish_import_pragmas(conn, journal_mode='delete'):
+    """導入提交後恢復原來的日誌模式
+
+    WAL 模式會寫入數據庫文件並保留下來，離開 WAL 模式時 SQLite 寫回檢查點並
+    刪除 -wal 和 -shm 文件。原來就是 WAL 模式的數據庫只寫回檢查點。
+    """
+    if journal_mode.lower() == 'wal':
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    else:
+        conn.execute(f"PRAGMA journal_mode={journal_mode}")
+
+def parse_shf_line(line, strict=False):
+    """解析 SHF 格式行，返回題目數據字典
+
+    默認使用寬鬆模式以兼容舊文件，strict 為 True 時只接受規範格式。
+    """
+    return parse_line(line, strict).to_dict()
+
+def iter_shf_records(file_path, strict=False):
+    """逐行讀取 SHF 文件，每解析一題產出一次
+
+    以 (行號, 題目數據, 錯誤) 的形式產出；解析失敗時題目數據為 None，
+    錯誤為對應的異常。空行和以 # 開頭的分區標題行會被跳過。
+    文件按行流式讀取，內存佔用與文件大小無關。
+    """
+    with open(file_path, 'r', encoding='utf-8') as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            try:
+                yield line_no, parse_shf_line(line, strict), None
+            except Exception as e:
+                yield line_no, None, e
+
+def file_hash(file_path):
+    """計算文件內容的 SHA-1 哈希"""
+    digest = hashlib.sha1()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def load_sources(conn):
+    """讀取來源文件清單，返回 {路徑: (source_id, 修改時間, 大小, 內容哈希)}"""
+    return {
+        row[0]: row[1:]
+        for row in conn.execute(
+            "SELECT path, source_id, mtime_ns, file_size, content_hash FROM sources")
+    }
+
+def delete_games(cursor, game_ids):
+    """刪除題目及其棋子、答案和注釋索引"""
+    game_ids = list(game_ids)
+    index_comments = has_comment_index(cursor.connection)
+    for start in range(0, len(game_ids), _DELETE_BATCH):
+        batch = game_ids[start:start + _DELETE_BATCH]
+        placeholders = ', '.join('?' * len(batch))
+        cursor.execute(
+            f"DELETE FROM initial_positions WHERE game_id IN ({placeholders})", batch)
+        cursor.execute(f"DELETE FROM answers WHERE game_id IN ({placeholders})", batch)
+        cursor.execute(f"DELETE FROM games WHERE game_id IN ({placeholders})", batch)
+        if index_comments:
+            delete_comment_rows(cursor, batch)
+
+class BulkInserter:
+    """緩衝 games、initial_positions 和 answers 的行，按批次以 executemany 寫入
+
+    upsert 為 True 時數據庫中已有的同 (level, id) 題目被覆蓋，保留原來的 game_id；
+    寫入的 game_id 記錄在 changed_ids 中。source_id 為之後加入的題目的來源文件。
+    已有題目屬於其他來源文件時，只有該文件在 replaceable_sources 中（本次重新
+    導入或將被刪除）才能覆蓋，否則與重建數據庫時一樣報告重複。
+    """
+
+    def __init__(self, conn, batch_size=DEFAULT_BATCH_SIZE, upsert=False):
+        self.conn = conn
+        self.batch_size = max(1, int(batch_size))
+        self.upsert = upsert
+        self.source_id = None
+        self.replaceable_sources = set()
+        self.replaced_ids = []
+        self.changed_ids = []
+        self.game_rows = []
+        self.position_rows = []
+        self.answer_rows = []
+        self.comment_rows = []
+        # SQLite 不支持 FTS5 時沒有注釋全文索引
+        self.index_comments = has_comment_index(conn)
+        # 題目以 (level, id) 唯一，提前在內存中檢查重複，避免整批寫入失敗
+        self.seen_keys = set()
+        self.total_games = 0
+        # game_id 由程序分配，子表的行才能與題目一起批量寫入
+        self.next_game_id = conn.execute(
+            "SELECT COALESCE(MAX(game_id), 0) + 1 FROM games"
+        ).fetchone()[0]
+
+    def add(self, game_data):
+        """加入一道題目並返回其 game_id，緩衝區滿時自動寫入"""
+        # 驗證所有位置
+        for pos in game_data['initial_positions']:
+            if not validate_position(pos['position']):
+                raise ValueError(f"無效的棋子位置：{pos['position']}")
+
+        key = (game_data['level'], game_data['id'])
+        if key in self.seen_keys:
+            raise ValueError(f"重複的題目：{game_data['level']}:{game_data['id']}")
+
+        existing = None
+        if self.upsert:
+            existing = self.conn.execute(
+                "SELECT game_id, source_id FROM games WHERE level = ? AND id = ?", key
+            ).fetchone()
+        if existing is not None:
+            owner = existing[1]
+            if owner is not None and owner != self.source_id \
+                    and owner not in self.replaceable_sources:
+                # 題目屬於未變化的文件，覆蓋它會在該文件不變時丟失題目
+                raise ValueError(
+                    f"重複的題目：{game_data['level']}:{game_data['id']}")
+        self.seen_keys.add(key)
+
+        if existing is not None:
+            game_id = existing[0]
+            self.replaced_ids.append(game_id)
+        else:
+            game_id = self.next_game_id
+            self.next_game_id += 1
+        if self.upsert:
+            self.changed_ids.append(game_id)
+
+        stones = [
+            pos['color'] + pos['position'] for pos in game_data['initial_positions']
+        ]
+        answers = game_data['answers']
+        to_move = first_mover(answers[0]['moves']) if answers else 'B'
+        answer_types = [answer['type'] for answer in answers]
+        self.game_rows.append(
+            (game_id, game_data['id'], game_data['level'], game_data['size'],
+             game_data['initial_comment'],
+             position_key(stones, game_data['size'], to_move),
+             level_to_code(game_data['level']), len(stones), len(answers),
+             answer_types.count('+'), answer_types.count('-'), self.source_id)
+        )
+        self.position_rows.extend(
+            (game_id, pos['color'], pos['position'])
+            for pos in game_data['initial_positions']
+        )
+        self.answer_rows.extend(
+            (game_id, answer['type'], answer['moves'], answer.get('comment', ''))
+            for answer in game_data['answers']
+        )
+        if self.index_comments:
+            self.comment_rows.extend(comment_rows(game_id, game_data))
+        self.total_games += 1
+
+        if len(self.game_rows) >= self.batch_size:
+            self.flush()
+        return game_id
+
+    def flush(self):
+        """將緩衝區中的行寫入數據庫"""
+        if not self.game_rows:
+            return
+
+        cursor = self.conn.cursor()
+        if self.replaced_ids:
+            # 被覆蓋的題目先整道刪除，再以原來的 game_id 寫入
+            delete_games(cursor, self.replaced_ids)
+            self.replaced_ids.clear()
+        cursor.executemany("""
+            INSERT INTO games (game_id, id, level, size, initial_comment, position_key,
+                               level_code, stone_count, answer_count, correct_count,
+                               wrong_count, source_id)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, self.game_rows)
+        cursor.executemany("""
+            INSERT INTO initial_positions (game_id, color, position)
+            VALUES (?, ?, ?)
+        """, self.position_rows)
+        cursor.executemany("""
+            INSERT INTO answers (game_id, answer_type, moves, comment)
+            VALUES (?, ?, ?, ?)
+        """, self.answer_rows)
+        if self.comment_rows:
+            insert_comment_rows(cursor, self.comment_rows)
+
+        self.game_rows.clear()
+        self.position_rows.clear()
+        self.answer_rows.clear()
+        self.comment_rows.clear()
+
+    def finish(self):
+        """寫入剩餘的行並整理全文索引，應在所有題目加入後調用"""
+        self.flush()
+        if self.index_comments and self.total_games:
+            optimize_comment_index(self.conn.cursor())
+
+def _report(log, message, level=logging.INFO):
+    """記錄日誌並轉發給調用方的回調"""
+    logger.log(level, message)
+    if log is not None:
+        log(message)
+
+def _import_file(inserter, file_path, log):
+    """將一個文件的題目加入 inserter，返回 (加入的 game_id 集合, 出錯的行數)"""
+    game_ids = set()
+    error_count = 0
+    # 逐行解析 SHF 文件，一個文件可以包含多道題目
+    for line_no, game_data, error in iter_shf_records(file_path):
+        if error is None:
+            try:
+                game_ids.add(inserter.add(game_data))
+                continue
+            except Exception as e:
+                error = e
+
+        error_count += 1
+        _report(log, f"處理文件 {file_path} 第 {line_no} 行時出錯: {str(error)}", logging.ERROR)
+    return game_ids, error_count
+
+def _source_game_ids(conn, source_id):
+    rows = conn.execute("SELECT game_id FROM games WHERE source_id = ?", (source_id,))
+    return {row[0] for row in rows}
+
+def import_shf_files(input_files, db_path, batch_size=DEFAULT_BATCH_SIZE, log=None,
+                     progress=None, incremental=False, prune=True):
+    """將 SHF 文件導入數據庫
+
+    默認重建數據庫；incremental 為 True 且數據庫已存在時只導入有變化的文件，
+    prune 為 True 時還會刪除不在 input_files 中的來源文件的題目。
+    log(message) 和 progress(percent) 是可選的回調，用於向界面報告進度。
+    返回 (成功導入的題目數, 出錯的行數)。
+    """
+    # 初始化數據庫
+    if incremental and os.path.exists(db_path):
+        conn = sqlite3.connect(db_path)
+        upgrade_schema(conn)
+        cursor = conn.cursor()
+    else:
+        conn, cursor = setup_database(db_path)
+        incremental = False
+    journal_mode = apply_import_pragmas(conn)
+
+    # 所有文件在同一個事務中批量寫入
+    inserter = BulkInserter(conn, batch_size, upsert=incremental)
+    sources = load_sources(conn)
+    deleted_ids = []
+
+    # 同一個文件只導入一次
+    input_files = list(
+        {os.path.abspath(file_path): file_path for file_path in input_files}.items())
+    total_files = len(input_files)
+    processed_files = 0
+    skipped_files = 0
+    error_count = 0
+    last_percent = -1
+
+    try:
+        # 先確定哪些文件需要重新導入：題目只能從這些文件或將被刪除的來源文件移到
+        # 另一個文件，屬於未變化文件的題目仍按重複處理
+        plans = []
+        for path, file_path in input_files:
+            known = sources.pop(path, None)
+            try:
+                stat = os.stat(file_path)
+                content_hash = None
+                if known is None or known[1:3] != (stat.st_mtime_ns, stat.st_size):
+                    content_hash = file_hash(file_path)
+                    if known is not None and known[3] != content_hash:
+                        inserter.replaceable_sources.add(known[0])
+                plans.append((path, file_path, known, stat, content_hash, None))
+            except Exception as e:
+                plans.append((path, file_path, known, None, None, e))
+        if prune:
+            inserter.replaceable_sources.update(source[0] for source in sources.values())
+
+        for path, file_path, known, stat, content_hash, error in plans:
+            try:
+                if error is not None:
+                    raise error
+                if content_hash is not None:
+                    if known is not None and known[3] == content_hash:
+                        # 只是修改時間變了
+                        cursor.execute(
+                            "UPDATE sources SET mtime_ns = ?, file_size = ? "
+                            "WHERE source_id = ?",
+                            (stat.st_mtime_ns, stat.st_size, known[0])
+                        )
+                        skipped_files += 1
+                    else:
+                        if known is not None:
+                            source_id = known[0]
+                        else:
+                            # 文件信息在導入完成後才寫入，中途出錯時下次會重新導入
+                            source_id = cursor.execute(
+                                "INSERT INTO sources "
+                                "(path, mtime_ns, file_size, content_hash) "
+                                "VALUES (?, -1, -1, '')", (path,)
+                            ).lastrowid
+                        inserter.source_id = source_id
+                        game_ids, file_errors = _import_file(inserter, file_path, log)
+                        error_count += file_errors
+
+                        if known is not None:
+                            # 刪除文件中已不存在的題目
+                            inserter.flush()
+                            stale = _source_game_ids(conn, source_id) - game_ids
+                            delete_games(cursor, stale)
+                            deleted_ids.extend(stale)
+                        cursor.execute(
+                            "UPDATE sources SET mtime_ns = ?, file_size = ?, "
+                            "content_hash = ? WHERE source_id = ?",
+                            (stat.st_mtime_ns, stat.st_size, content_hash, source_id)
+                        )
+                        _report(log, f"已處理: {file_path}（{len(game_ids)} 題）")
+                else:
+                    skipped_files += 1
+
+            except Exception as e:
+                error_count += 1
+                _report(log, f"處理文件 {file_path} 時出錯: {str(e)}", logging.ERROR)
+
+            processed_files += 1
+            percent = int((processed_files / total_files) * 100)
+            if progress is not None and percent != last_percent:
+                progress(percent)
+                last_percent = percent
+
+        inserter.flush()
+        if incremental and prune and sources:
+            removed = 0
+            for source_id, _, _, _ in sources.values():
+                stale = _source_game_ids(conn, source_id)
+                delete_games(cursor, stale)
+                deleted_ids.extend(stale)
+                removed += len(stale)
+                cursor.execute("DELETE FROM sources WHERE source_id = ?", (source_id,))
+            _report(log, f"已移除 {len(sources)} 個來源文件的 {removed} 道題目")
+        if incremental and skipped_files:
+            _report(log, f"跳過 {skipped_files} 個未變化的文件")
+
+        inserter.finish()
+        changed_ids = inserter.changed_ids + deleted_ids
+        if changed_ids:
+            # 圖案索引模組會加載 numpy，只在需要更新時導入
+            from shf_tools.core.pattern_index import (has_pattern_index,
+                                                      update_pattern_keys)
+            if has_pattern_index(conn):
+                update_pattern_keys(cursor, changed_ids)
+        create_indexes(cursor)
+        conn.commit()
+        finish_import_pragmas(conn, journal_mode)
+    finally:
+        conn.close()
+
+    return inserter.total_games, error_count
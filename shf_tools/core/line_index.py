@@ -0,0 +1,333 @@
+"""SHF 合集文件的字節偏移索引
+
+為 .shf 文件生成同名的 .shfx 索引文件，記錄每道題目所在行的字節偏移、級別、ID 和
+棋盤大小，並按 (棋盤大小, 級別, ID) 排序。查找題目只需二分查找索引再定位一次，
+遍歷某個級別或棋盤大小的題目時只讀取對應的行。
+
+索引記錄已索引的文件長度、末尾一段內容的 CRC 和文件的修改時間。文件只是在
+末尾追加了內容時，只需掃描新增的行並與原有記錄合併；文件被改寫，或長度未增加
+而修改時間變了時，重新生成整個索引。CRC 只覆蓋末尾一段，查找時還會核對讀到的
+行是否就是要找的題目，不一致時重新生成索引。
+沒有換行符的最後一行同樣加入索引，但已索引長度只記到該行開頭，
+之後文件變長時從該行重新掃描，不沿用原來的記錄。
+"""
+import os
+import mmap
+import zlib
+import heapq
+import struct
+import logging
+from bisect import bisect_left
+
+from shf_tools.core.compact import level_to_code, code_to_level
+from shf_tools.core.parser import SIZE_CODES, parse_line
+
+logger = logging.getLogger(__name__)
+
+INDEX_EXTENSION = '.shfx'
+
+MAGIC = b'SHFX'
+FORMAT_VERSION = 3
+
+# 魔數、版本、保留、記錄數、已索引的文件長度（不含沒有換行符的最後一行）、
+# 其末尾內容的 CRC、生成索引時的文件長度和修改時間（納秒）
+HEADER = struct.Struct('<4sHHIQI4xQq')
+
+# 行的字節偏移、題號、級別代碼、棋盤大小，共 16 字節
+RECORD = struct.Struct('<QIBB2x')
+
+# 計算 CRC 時使用的末尾長度
+TAIL_CHECK_SIZE = 4096
+
+def index_path_for(shf_path):
+    """返回 SHF 文件對應的索引文件路徑"""
+    return os.path.splitext(shf_path)[0] + INDEX_EXTENSION
+
+def _sort_key(size, level_code, number):
+    return size << 40 | level_code << 32 | number
+
+def _tail_crc(f, end):
+    start = max(0, end - TAIL_CHECK_SIZE)
+    f.seek(start)
+    return zlib.crc32(f.read(end - start))
+
+def _line_key(line):
+    """返回題目行（bytes）的排序鍵，無法識別時拋出 ValueError、KeyError 等"""
+    level, number, size_code = line.split(b':', 3)[:3]
+    level_code = level_to_code(level.decode('ascii').strip())
+    size = SIZE_CODES[size_code.decode('ascii').strip()]
+    return _sort_key(size, level_code, int(number))
+
+def _scan_lines(f, start):
+    """從 start 開始掃描到文件末尾
+
+    返回 (記錄列表, 最後一個換行符之後的位置, 無法識別的行數)。只讀取每行的
+    前三個欄位；沒有換行符的最後一行也加入記錄。
+    """
+    records = []
+    skipped = 0
+    f.seek(start)
+    offset = start
+    complete = start
+    for line in f:
+        line_offset = offset
+        offset += len(line)
+        if line.endswith(b'\n'):
+            complete = offset
+
+        line = line.strip()
+        if not line or line.startswith(b'#'):
+            continue
+        try:
+            key = _line_key(line)
+        except (ValueError, KeyError, UnicodeDecodeError):
+            skipped += 1
+            continue
+        records.append((key, line_offset))
+
+    records.sort()
+    return records, complete, skipped
+
+def _read_index(index_path):
+    """讀取索引文件，返回 (記錄數, 已索引長度, CRC, 文件長度, 修改時間)
+
+    文件無效時返回 None。
+    """
+    try:
+        with open(index_path, 'rb') as f:
+            header = f.read(HEADER.size)
+    except OSError:
+        return None
+    if len(header) < HEADER.size:
+        return None
+    (magic, version, _, count, indexed_size, tail_crc, file_size,
+     mtime_ns) = HEADER.unpack(header)
+    if magic != MAGIC or version != FORMAT_VERSION:
+        return None
+    if os.path.getsize(index_path) != HEADER.size + RECORD.size * count:
+        return None
+    return count, indexed_size, tail_crc, file_size, mtime_ns
+
+def _iter_index_records(index_path, count):
+    with open(index_path, 'rb') as f:
+        f.seek(HEADER.size)
+        for _ in range(count):
+            offset, number, level_code, size = RECORD.unpack(f.read(RECORD.size))
+            yield _sort_key(size, level_code, number), offset
+
+def _write_index(index_path, records, indexed_size, tail_crc, file_size, mtime_ns):
+    """寫入索引，返回記錄數"""
+    temp_path = index_path + '.tmp'
+    count = 0
+    with open(temp_path, 'wb') as f:
+        # 記錄數在寫完記錄後才知道，先寫入佔位的文件頭
+        f.write(bytes(HEADER.size))
+        buffer = []
+        for key, offset in records:
+            buffer.append(RECORD.pack(
+                offset, key & 0xFFFFFFFF, (key >> 32) & 0xFF, key >> 40))
+            if len(buffer) >= 65536:
+                f.write(b''.join(buffer))
+                count += len(buffer)
+                buffer = []
+        f.write(b''.join(buffer))
+        count += len(buffer)
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, FORMAT_VERSION, 0, count, indexed_size, tail_crc,
+                            file_size, mtime_ns))
+    # 寫完後再替換，避免中斷時留下不完整的索引
+    os.replace(temp_path, index_path)
+    return count
+
+def build_index(shf_path, index_path=None, incremental=True):
+    """生成或更新 SHF 文件的索引，返回 (記錄數, 新索引的行數)"""
+    if index_path is None:
+        index_path = index_path_for(shf_path)
+
+    stat = os.stat(shf_path)
+    file_size = stat.st_size
+    existing = _read_index(index_path) if incremental else None
+
+    with open(shf_path, 'rb') as f:
+        if existing is not None:
+            count, indexed_size, tail_crc, scanned_size, mtime_ns = existing
+            if indexed_size > file_size or _tail_crc(f, indexed_size) != tail_crc:
+                existing = None
+            elif file_size <= scanned_size:
+                if mtime_ns == stat.st_mtime_ns and file_size == scanned_size:
+                    return count, 0
+                # 長度沒有增加但內容可能在 CRC 範圍之前被改寫
+                existing = None
+
+        start = existing[1] if existing is not None else 0
+        new_records, indexed_size, skipped = _scan_lines(f, start)
+        tail_crc = _tail_crc(f, indexed_size)
+
+    if skipped:
+        logger.warning(f"{shf_path} 中有 {skipped} 行無法識別，未加入索引")
+
+    if existing is None:
+        records = new_records
+    else:
+        # 從 start 開始的記錄只可能是原來沒有換行符的最後一行，已重新掃描
+        old_records = (
+            record for record in _iter_index_records(index_path, existing[0])
+            if record[1] < start
+        )
+        records = heapq.merge(old_records, new_records)
+
+    count = _write_index(index_path, records, indexed_size, tail_crc, file_size,
+                         stat.st_mtime_ns)
+    if existing is None:
+        logger.info(f"生成索引: {index_path}，{count} 道題目")
+    else:
+        logger.info(f"更新索引: {index_path}，新增 {len(new_records)} 道題目")
+    return count, len(new_records)
+
+class _KeyView:
+    """讓 bisect 直接在映射的索引記錄上比較排序鍵"""
+
+    def __init__(self, index):
+        self.index = index
+
+    def __len__(self):
+        return self.index.count
+
+    def __getitem__(self, position):
+        return self.index._key_at(position)
+
+class LineIndex:
+    """通過索引直接讀取 SHF 文件中的題目行
+
+    打開時會先按需更新索引。題目行以 str 返回，可交給 parse_line 解析。
+    """
+
+    def __init__(self, shf_path, index_path=None, update=True):
+        self.shf_path = shf_path
+        self.index_path = index_path or index_path_for(shf_path)
+        self._keys = _KeyView(self)
+        self._open(update, incremental=True)
+
+    def _open(self, update, incremental):
+        if update:
+            build_index(self.shf_path, self.index_path, incremental)
+
+        header = _read_index(self.index_path)
+        if header is None:
+            raise ValueError(f"無效的索引文件：{self.index_path}")
+        self.count = header[0]
+        self._index_map = self._map(self.index_path)
+        self._data_map = self._map(self.shf_path)
+
+    @staticmethod
+    def _map(path):
+        if os.path.getsize(path) == 0:
+            return b''
+        with open(path, 'rb') as f:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def close(self):
+        """關閉文件映射"""
+        for mapped in (self._index_map, self._data_map):
+            if isinstance(mapped, mmap.mmap):
+                mapped.close()
+        self._index_map = self._data_map = b''
+        self.count = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self):
+        return self.count
+
+    def _record(self, position):
+        return RECORD.unpack_from(self._index_map, HEADER.size + RECORD.size * position)
+
+    def _key_at(self, position):
+        _, number, level_code, size = self._record(position)
+        return _sort_key(size, level_code, number)
+
+    def _raw_line_at(self, offset):
+        end = self._data_map.find(b'\n', offset)
+        if end < 0:
+            end = len(self._data_map)
+        return self._data_map[offset:end].strip()
+
+    def _line_at(self, offset):
+        return self._raw_line_at(offset).decode('utf-8')
+
+    def _position_of(self, level, problem_id, size):
+        level_code = level_to_code(level)
+        number = int(problem_id)
+        for board_size in ((size,) if size else sorted(SIZE_CODES.values())):
+            key = _sort_key(board_size, level_code, number)
+            position = bisect_left(self._keys, key)
+            if position < self.count and self._key_at(position) == key:
+                return position
+        return -1
+
+    def _matches(self, position):
+        """記錄指向的行是否仍是索引中的題目"""
+        try:
+            line = self._raw_line_at(self._record(position)[0])
+            return _line_key(line) == self._key_at(position)
+        except (ValueError, KeyError, UnicodeDecodeError):
+            return False
+
+    def offset_of(self, level, problem_id, size=None):
+        """返回題目所在行的字節偏移，找不到時返回 -1
+
+        不指定棋盤大小時依次在 9、13、19 路中查找。
+        """
+        position = self._position_of(level, problem_id, size)
+        return self._record(position)[0] if position >= 0 else -1
+
+    def find_line(self, level, problem_id, size=None):
+        """返回題目所在的行，找不到時返回 None
+
+        讀到的行與索引記錄不一致時說明文件在生成索引後被改寫，重新生成索引後
+        再查找，不會返回其他題目。
+        """
+        position = self._position_of(level, problem_id, size)
+        if position >= 0 and not self._matches(position):
+            logger.warning(f"{self.shf_path} 與索引不一致，重新生成索引")
+            self.close()
+            self._open(update=True, incremental=False)
+            position = self._position_of(level, problem_id, size)
+        if position < 0:
+            return None
+        return self._line_at(self._record(position)[0])
+
+    def find(self, level, problem_id, size=None, strict=False):
+        """返回解析後的題目，找不到時返回 None"""
+        line = self.find_line(level, problem_id, size)
+        return parse_line(line, strict) if line is not None else None
+
+    def _range(self, size, level):
+        if size is None:
+            if level is not None:
+                raise ValueError("按級別遍歷時必須指定棋盤大小")
+            return 0, self.count
+        if level is None:
+            low = _sort_key(size, 0, 0)
+            high = _sort_key(size + 1, 0, 0)
+        else:
+            level_code = level_to_code(level)
+            low = _sort_key(size, level_code, 0)
+            high = _sort_key(size, level_code + 1, 0)
+        return bisect_left(self._keys, low), bisect_left(self._keys, high)
+
+    def iter_lines(self, size=None, level=None):
+        """按 (棋盤大小, 級別, ID) 順序產出題目行，可只遍歷某個棋盤大小或級別"""
+        start, end = self._range(size, level)
+        for position in range(start, end):
+            yield self._line_at(self._record(position)[0])
+
+    def iter_keys(self):
+        """按索引順序產出 (棋盤大小, 級別, ID)"""
+        for position in range(self.count):
+            _, number, level_code, size = self._record(position)
+            yield size, code_to_level(level_code), f"{number:05d}"
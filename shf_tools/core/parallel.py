@@ -0,0 +1,55 @@
+"""以進程池並行處理任務的輔助函數"""
+import os
+import multiprocessing
+
+# 自動計算分塊大小時每塊最多的任務數
+MAX_CHUNK_SIZE = 64
+
+def default_workers():
+    """默認的進程數：CPU 核心數"""
+    return os.cpu_count() or 1
+
+def imap_ordered(func, tasks, workers=None, chunksize=None):
+    """使用進程池對每個任務調用 func，按任務順序逐個產出結果
+
+    func 必須是模組級函數，以便傳給子進程。workers 默認為 CPU 核心數，
+    為 1 時在當前進程中順序執行。tasks 可以是生成器，此時每個任務單獨分發，
+    應由調用方把小任務合併成批。
+    """
+    workers = workers or default_workers()
+    if hasattr(tasks, '__len__'):
+        if not tasks:
+            return
+        workers = min(workers, len(tasks))
+        if chunksize is None:
+            # 每個進程至少分到幾個塊，以便負載均衡
+            chunksize = max(1, min(MAX_CHUNK_SIZE, len(tasks) // (workers * 4)))
+    elif chunksize is None:
+        chunksize = 1
+
+    if workers == 1:
+        for task in tasks:
+            yield func(task)
+        return
+
+    with multiprocessing.Pool(workers) as pool:
+        for result in pool.imap(func, tasks, chunksize):
+            yield result
+
+def iter_line_batches(file_path, batch_lines):
+    """逐批讀取 SHF 文件的題目行，每批為 [(行號, 行), ...]
+
+    空行和以 # 開頭的分區標題行會被跳過，行號從 1 開始。
+    """
+    batch = []
+    with open(file_path, 'r', encoding='utf-8') as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            batch.append((line_no, line))
+            if len(batch) >= batch_lines:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
@@ -0,0 +1,276 @@
+"""SHF 題目行解析核心
+
+所有工具共用的解析與格式化實現。每行題目格式為：
+
+    level:id:size:initial_positions#comment:answers
+
+解析使用預編譯的正則表達式一次掃描每個欄位，不逐字符拼接字符串。
+嚴格模式只接受規範格式；寬鬆模式兼容舊文件：接受沒有級別的四欄位格式、
+大寫座標、多餘空白和空答案。
+"""
+import re
+
+from shf_tools.core.zobrist import position_key
+
+# 棋盤大小代碼
+SIZE_CODES = {'1': 9, '2': 13, '3': 19}
+SIZE_TO_CODE = {size: code for code, size in SIZE_CODES.items()}
+
+# 答案類型：+ 正確、- 錯誤、/ 變化
+ANSWER_TYPES = ('+', '-', '/')
+
+_LEVEL_RE = re.compile(r'(?:00|[1-9]d|[1-9]k|[12][0-9]k|30k)\Z')
+_ID_RE = re.compile(r'\d{5}\Z')
+_POSITION_RE = re.compile(r'[a-s]{2}\Z')
+_STONES_RE = re.compile(r'[BW][a-s]{2}(?:,[BW][a-s]{2})*\Z')
+
+# 一個答案：類型符號、著手序列、可選的 # 注釋。
+# 下一個答案從 ",+"、",-" 或 ",/" 開始，行尾允許一個多餘的逗號。
+_ANSWER_RE = re.compile(r'([+\-/])([^#]*?)(?:#(.*?))?(?:,(?=[+\-/])|,?\Z)', re.S)
+
+def validate_position(position):
+    """驗證棋子位置是否有效"""
+    return bool(_POSITION_RE.match(position))
+
+class Answer:
+    """一個答案序列"""
+    __slots__ = ('type', 'moves', 'comment')
+
+    def __init__(self, type, moves, comment=''):
+        self.type = type
+        self.moves = moves  # ('Bcd', 'Wdd', ...)
+        self.comment = comment
+
+    def __eq__(self, other):
+        return (isinstance(other, Answer) and self.type == other.type
+                and self.moves == other.moves and self.comment == other.comment)
+
+    def __repr__(self):
+        return f"Answer({self.type!r}, {self.moves!r}, {self.comment!r})"
+
+class Problem:
+    """一道解析後的題目"""
+    __slots__ = ('level', 'id', 'size', 'initial_comment', 'stones', 'answers')
+
+    def __init__(self, level, id, size, stones=(), initial_comment='', answers=()):
+        self.level = level
+        self.id = id
+        self.size = size
+        self.stones = stones  # ('Bcc', 'Wdc', ...)
+        self.initial_comment = initial_comment
+        self.answers = answers  # (Answer, ...)
+
+    def __eq__(self, other):
+        return isinstance(other, Problem) and all(
+            getattr(self, name) == getattr(other, name) for name in self.__slots__
+        )
+
+    def __repr__(self):
+        return (f"Problem({self.level}:{self.id}, size={self.size}, "
+                f"stones={len(self.stones)}, answers={len(self.answers)})")
+
+    @property
+    def key(self):
+        """題目在題庫中的唯一標識"""
+        return f"{self.level}:{self.id}"
+
+    @property
+    def to_move(self):
+        """輪到哪一方，由第一個答案的第一手推斷，無法判斷時為黑方"""
+        if self.answers and self.answers[0].moves:
+            return self.answers[0].moves[0][0]
+        return 'B'
+
+    @property
+    def position_key(self):
+        """初始局面的 Zobrist 鍵，局面相同的題目鍵相同"""
+        return position_key(self.stones, self.size, self.to_move)
+
+    def answer_tree(self):
+        """以前綴樹返回答案，共同的前綴只保存一次"""
+        from shf_tools.core.answer_tree import AnswerTree
+        return AnswerTree.from_answers(self.answers)
+
+    def to_dict(self):
+        """轉換為 parse_shf_line / format_shf_line 使用的字典格式"""
+        return {
+            'level': self.level,
+            'id': self.id,
+            'size': self.size,
+            'initial_comment': self.initial_comment,
+            'initial_positions': [
+                {'color': stone[0], 'position': stone[1:]} for stone in self.stones
+            ],
+            'answers': [
+                {
+                    'type': answer.type,
+                    'moves': ','.join(answer.moves),
+                    'comment': answer.comment,
+                }
+                for answer in self.answers
+            ]
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """從字典格式創建題目"""
+        stones = tuple(
+            f"{pos['color']}{pos['position']}" for pos in data['initial_positions']
+        )
+        answers = tuple(
+            Answer(ans['type'], tuple(m for m in ans['moves'].split(',') if m),
+                   ans.get('comment') or '')
+            for ans in data['answers']
+        )
+        return cls(data['level'], data['id'], data['size'], stones,
+                   data.get('initial_comment') or '', answers)
+
+    def to_line(self):
+        """格式化為 SHF 行"""
+        return format_line(self)
+
+_LENIENT_LEVEL_RE = re.compile(r'(\d{1,2})([dk])\Z')
+
+def _parse_level(level, strict):
+    if _LEVEL_RE.match(level):
+        return level
+    if not strict:
+        # 兼容舊文件中的 05k、1D 等寫法，數值範圍與規範格式相同
+        level = level.strip().lower()
+        if level == '00':
+            return level
+        match = _LENIENT_LEVEL_RE.match(level)
+        if match:
+            number = int(match.group(1))
+            if 1 <= number <= (9 if match.group(2) == 'd' else 30):
+                return level
+    raise ValueError(f"無效的級別格式：{level}")
+
+def _parse_stones(stones_str, strict):
+    if not stones_str:
+        return ()
+    if not _STONES_RE.match(stones_str):
+        if strict:
+            raise ValueError(f"無效的初始局面：{stones_str}")
+        # 寬鬆模式：去除空白、統一座標大小寫並跳過空項
+        stones = []
+        for stone in stones_str.split(','):
+            stone = stone.strip()
+            if not stone:
+                continue
+            stone = stone[:1].upper() + stone[1:].lower()
+            if not _STONES_RE.match(stone):
+                raise ValueError(f"無效的棋子位置：{stone}")
+            stones.append(stone)
+        return tuple(stones)
+    return tuple(stones_str.split(','))
+
+def _parse_answers(answers_str, strict):
+    if answers_str == ',':
+        # sgf2shf 對沒有答案的題目寫出單個逗號
+        return ()
+    if not strict:
+        answers_str = answers_str.strip()
+        # 跳過開頭的多餘字符，直到第一個答案類型符號
+        start = 0
+        while start < len(answers_str) and answers_str[start] not in ANSWER_TYPES:
+            start += 1
+        if start and answers_str[:start].strip(', '):
+            raise ValueError(f"無效的答案類型：{answers_str[0]}")
+        answers_str = answers_str[start:]
+
+    answers = []
+    pos = 0
+    end = len(answers_str)
+    while pos < end:
+        match = _ANSWER_RE.match(answers_str, pos)
+        if match is None:
+            raise ValueError(f"無效的答案格式：{answers_str[pos:]}")
+        answer_type, moves_str, comment = match.groups()
+        pos = match.end()
+
+        moves_str = moves_str.rstrip(',')
+        if moves_str and not _STONES_RE.match(moves_str):
+            if strict:
+                raise ValueError(f"無效的著手序列：{moves_str}")
+            moves = _parse_stones(moves_str, strict)
+        else:
+            moves = tuple(moves_str.split(',')) if moves_str else ()
+
+        comment = comment or ''
+        if not strict:
+            comment = comment.strip().rstrip(',')
+        answers.append(Answer(answer_type, moves, comment))
+    return tuple(answers)
+
+def parse_line(line, strict=True):
+    """解析一行 SHF 題目，返回 Problem
+
+    strict 為 False 時使用寬鬆模式，兼容沒有級別的舊格式 id:size:initial:answers。
+    """
+    line = line.strip()
+    parts = line.split(':', 4)
+    if not strict and len(parts) >= 4 and _ID_RE.match(parts[0].strip()) \
+            and parts[1].strip() in SIZE_CODES:
+        # 舊格式沒有級別欄位，注釋中的冒號歸入答案部分
+        id_str, size_code, initial_part, answers_part = line.split(':', 3)
+        level = '00'
+    elif len(parts) == 5:
+        level_str, id_str, size_code, initial_part, answers_part = parts
+        level = _parse_level(level_str, strict)
+    else:
+        raise ValueError("無效的 SHF 格式：缺少必要部分")
+
+    if not strict:
+        id_str = id_str.strip()
+        size_code = size_code.strip()
+    if not _ID_RE.match(id_str):
+        raise ValueError(f"無效的 ID 格式：{id_str}")
+
+    size = SIZE_CODES.get(size_code)
+    if size is None:
+        raise ValueError(f"無效的棋盤大小代碼：{size_code}")
+
+    stones_str, _, initial_comment = initial_part.partition('#')
+    stones = _parse_stones(stones_str if strict else stones_str.strip(), strict)
+    answers = _parse_answers(answers_part, strict)
+
+    return Problem(level, id_str, size, stones, initial_comment, answers)
+
+def format_line(problem):
+    """將 Problem 格式化為 SHF 行，答案序列以逗號結尾"""
+    size_code = SIZE_TO_CODE.get(problem.size)
+    if size_code is None:
+        raise ValueError(f"不支持的棋盤大小：{problem.size}")
+
+    initial_part = ','.join(problem.stones)
+    if problem.stones and not _STONES_RE.match(initial_part):
+        raise ValueError(f"無效的初始局面：{initial_part}")
+    if problem.initial_comment:
+        initial_part += f"#{problem.initial_comment}"
+
+    answer_parts = []
+    for answer in problem.answers:
+        moves = ','.join(answer.moves)
+        if answer.comment:
+            answer_parts.append(f"{answer.type}{moves}#{answer.comment},")
+        else:
+            answer_parts.append(f"{answer.type}{moves},")
+
+    answers_part = ''.join(answer_parts)
+    return f"{problem.level}:{problem.id}:{size_code}:{initial_part}:{answers_part}"
+
+def iter_problems(file_path, strict=True):
+    """逐行讀取 SHF 文件，以 (行號, Problem, 錯誤) 的形式產出
+
+    解析失敗時 Problem 為 None。空行和以 # 開頭的分區標題行會被跳過。
+    """
+    with open(file_path, 'r', encoding='utf-8') as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            try:
+                yield line_no, parse_line(line, strict), None
+            except Exception as e:
+                yield line_no, None, e
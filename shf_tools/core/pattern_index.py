@@ -0,0 +1,556 @@
+"""局部棋形的倒排索引
+
+以每顆初始棋子為中心取 3×3 和 5×5 的窗口，另取包含該棋子的四個 2×2 方塊，
+窗口中每個點的狀態（空、黑、白、棋盤外）對應一個固定的隨機數，窗口的哈希為
+這些隨機數的異或，與題目的 game_id 一起寫入 pattern_keys 表。棋盤外的點也參與
+哈希，角上和邊上的棋形因此與中腹的相同棋形區分開來。
+
+查詢時把圖案按 8 種對稱變換（可選黑白互換）展開，對每個變換取圖案中完全確定的
+窗口計算哈希：每顆棋子使用能確定的最大窗口，再加上所有完全確定且包含棋子的
+2×2 方塊，因此 XO/OX 這類小棋形也能使用索引。各哈希的候選題目取交集，最後逐題
+核對整個圖案，排除哈希碰撞以及窗口以外的點不符的題目。圖案中沒有任何完全確定的
+窗口時無法使用索引，只能掃描所有題目。安裝了 numpy 時建立索引和核對圖案都按批向量化。
+
+圖案以文字表示，每行一排，列為座標的第一個字母、行為第二個字母：
+
+    X 黑棋  O 白棋  . 空點  # 棋盤外  ? 任意
+"""
+import random
+import logging
+import sqlite3
+
+from shf_tools.core.symmetry import transform_coords
+from shf_tools.core.zobrist import to_signed64
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+logger = logging.getLogger(__name__)
+
+PATTERN_SEED = 0x5348465F  # "SHF_"
+
+EMPTY = 0
+BLACK = 1
+WHITE = 2
+EDGE = 3
+
+PATTERN_CHARS = {'.': EMPTY, 'X': BLACK, 'O': WHITE, '#': EDGE}
+_COLOR_STATES = {'B': BLACK, 'W': WHITE}
+
+# 建立索引的窗口邊長，查詢時優先使用較大的窗口
+WINDOW_SIZES = (5, 3)
+_MAX_RADIUS = max(WINDOW_SIZES) // 2
+
+# 2×2 方塊中各點相對左上角的偏移，以及包含某顆棋子的四個方塊的左上角偏移
+BLOCK_OFFSETS = ((0, 0), (0, 1), (1, 0), (1, 1))
+_BLOCK_CORNERS = tuple((-dx, -dy) for dx, dy in BLOCK_OFFSETS)
+
+# 索引版本：2 起包含 2×2 方塊的哈希，舊索引需要重新生成才能以方塊查找
+PATTERN_INDEX_VERSION = 2
+
+# 每次從數據庫讀取並建立索引的題目數
+DEFAULT_CHUNK_SIZE = 20000
+
+# 核對候選題目時每次查詢的 game_id 數，不超過 SQLite 的參數個數限制
+_FETCH_BATCH = 500
+
+def _window_offsets(width):
+    radius = width // 2
+    return tuple(
+        (dx, dy)
+        for dx in range(-radius, radius + 1)
+        for dy in range(-radius, radius + 1)
+    )
+
+def _build_keys():
+    """返回 ({窗口邊長: (窗口鍵, 鍵表)}, 2×2 方塊的 (窗口鍵, 鍵表))
+
+    鍵表按 [偏移序號][狀態] 索引，空點的鍵為 0。方塊的鍵最後生成，
+    不改變窗口的鍵，舊索引中的窗口哈希仍然有效。
+    """
+    rng = random.Random(PATTERN_SEED)
+
+    def table(count):
+        window_key = rng.getrandbits(64)
+        return window_key, tuple(
+            (0, rng.getrandbits(64), rng.getrandbits(64), rng.getrandbits(64))
+            for _ in range(count)
+        )
+
+    tables = {}
+    for width in sorted(WINDOW_SIZES):
+        tables[width] = table(len(_window_offsets(width)))
+    return tables, table(len(BLOCK_OFFSETS))
+
+WINDOW_KEYS, BLOCK_KEYS = _build_keys()
+
+def create_pattern_table(cursor):
+    """創建 pattern_keys 表，查詢用的索引在寫入完成後由 create_pattern_key_index 創建"""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS pattern_keys (
+            pattern_key INTEGER NOT NULL,
+            game_id INTEGER NOT NULL
+        )
+    """)
+
+def create_pattern_key_index(cursor):
+    """創建按哈希查找題目的覆蓋索引"""
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_pattern_keys_key_game_id "
+        "ON pattern_keys (pattern_key, game_id)"
+    )
+
+def has_pattern_index(conn):
+    """數據庫中是否已經生成圖案索引"""
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'pattern_keys'"
+    ).fetchone() is not None
+
+def pattern_index_version(conn):
+    """返回圖案索引的版本，沒有記錄版本的舊索引為 1"""
+    try:
+        row = conn.execute(
+            "SELECT value FROM schema_meta WHERE key = 'pattern_index_version'"
+        ).fetchone()
+    except sqlite3.OperationalError:
+        return 1
+    return int(row[0]) if row else 1
+
+def _hash_cells(board, x, y, size, offsets, keys):
+    value, table = keys
+    for index, (dx, dy) in enumerate(offsets):
+        px = x + dx
+        py = y + dy
+        if 0 <= px < size and 0 <= py < size:
+            value ^= table[index][board.get((px, py), EMPTY)]
+        else:
+            value ^= table[index][EDGE]
+    return value
+
+def window_hash(board, x, y, size, width):
+    """計算以 (x, y) 為中心的窗口哈希（無符號 64 位），board 為 {(x, y): 狀態}"""
+    return _hash_cells(board, x, y, size, _window_offsets(width), WINDOW_KEYS[width])
+
+def block_hash(board, x, y, size):
+    """計算左上角為 (x, y) 的 2×2 方塊的哈希（無符號 64 位）"""
+    return _hash_cells(board, x, y, size, BLOCK_OFFSETS, BLOCK_KEYS)
+
+def _board_from_stones(stones, size):
+    """將 [(顏色, 'cd'), ...] 轉換為 {(x, y): 狀態}，忽略超出棋盤的棋子"""
+    board = {}
+    for color, position in stones:
+        x = ord(position[0]) - 97
+        y = ord(position[1]) - 97
+        if 0 <= x < size and 0 <= y < size:
+            board[(x, y)] = _COLOR_STATES[color]
+    return board
+
+def problem_pattern_keys(stones, size):
+    """返回題目所有窗口哈希（有符號 64 位）的集合"""
+    board = _board_from_stones(stones, size)
+    keys = set()
+    for (x, y) in board:
+        for width in WINDOW_SIZES:
+            keys.add(to_signed64(window_hash(board, x, y, size, width)))
+        for dx, dy in _BLOCK_CORNERS:
+            keys.add(to_signed64(block_hash(board, x + dx, y + dy, size)))
+    return keys
+
+def _id_ranges(conn, chunk_size):
+    """將 game_id 按 chunk_size 劃分為 [起點, 終點) 區間"""
+    low, high = conn.execute("SELECT MIN(game_id), MAX(game_id) FROM games").fetchone()
+    if low is None:
+        return
+    for start in range(low, high + 1, chunk_size):
+        yield start, start + chunk_size
+
+def _iter_problem_stones(conn, where, params=()):
+    """按 game_id 順序產出符合條件的 (game_id, 棋盤大小, [(顏色, 位置), ...])"""
+    rows = conn.execute(f"""
+        SELECT g.game_id, g.size, p.color, p.position
+        FROM games g JOIN initial_positions p ON p.game_id = g.game_id
+        WHERE {where}
+        ORDER BY g.game_id, p.rowid
+    """, params)
+    current = None
+    for game_id, size, color, position in rows:
+        if current is None or current[0] != game_id:
+            if current is not None:
+                yield current
+            current = (game_id, size, [])
+        current[2].append((color, position))
+    if current is not None:
+        yield current
+
+def _load_boards(conn, where, params, padding):
+    """以 numpy 讀取符合條件的題目
+
+    返回 (game_id 數組, 盤面數組, 棋子所屬盤面序號, 棋子 x, 棋子 y)。盤面數組形狀為
+    (題目數, 19 + 2 * padding, 19 + 2 * padding)，按 [x, y] 索引並向四周各擴展
+    padding 個點，棋盤以外都標記為 EDGE；棋子座標已加上 padding。
+    """
+    # 每道題目的棋子拼接為一個字符串，比每顆棋子一行快得多
+    rows = conn.execute(f"""
+        SELECT g.game_id, g.size,
+               (SELECT group_concat(p.color || p.position, '')
+                FROM initial_positions p WHERE p.game_id = g.game_id)
+        FROM games g
+        WHERE {where}
+        ORDER BY g.game_id
+    """, params).fetchall()
+    rows = [row for row in rows if row[2]]
+    if not rows:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, np.zeros((0, 0, 0), dtype=np.uint8), empty, empty, empty
+
+    total = len(rows)
+    game_ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=total)
+    sizes = np.fromiter((row[1] for row in rows), dtype=np.int64, count=total)
+    counts = np.fromiter(
+        (len(row[2]) // 3 for row in rows), dtype=np.int64, count=total)
+    text = ''.join(row[2] for row in rows)
+    stones = np.frombuffer(text.encode('ascii'), dtype=np.uint8)
+    stones = stones.reshape(-1, 3).astype(np.int64)
+    owners = np.repeat(np.arange(total), counts)
+    xs = stones[:, 1] - 97
+    ys = stones[:, 2] - 97
+    white = stones[:, 0] == ord('W')
+
+    width = 19 + 2 * padding
+    boards = np.full((len(game_ids), width, width), EDGE, dtype=np.uint8)
+    for size in np.unique(sizes):
+        size = int(size)
+        boards[sizes == size, padding:padding + size, padding:padding + size] = EMPTY
+
+    # 忽略超出棋盤的棋子；同一點上的重複棋子以後出現的為準
+    on_board = (xs >= 0) & (ys >= 0) & (xs < sizes[owners]) & (ys < sizes[owners])
+    owners = owners[on_board]
+    xs = xs[on_board] + padding
+    ys = ys[on_board] + padding
+    boards[owners, xs, ys] = np.where(white[on_board], WHITE, BLACK)
+    return game_ids, boards, owners, xs, ys
+
+def _chunk_keys_numpy(conn, where, params):
+    """以 numpy 批量計算題目的窗口哈希，返回去重後的 (鍵數組, game_id 數組)"""
+    game_ids, boards, owners, xs, ys = _load_boards(conn, where, params, _MAX_RADIUS)
+    if not len(owners):
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+    # 每種窗口為 (窗口左上角相對棋子的偏移, 各點相對左上角的偏移, 鍵)
+    windows = [
+        ((0, 0), _window_offsets(width), WINDOW_KEYS[width]) for width in WINDOW_SIZES
+    ]
+    windows.extend((corner, BLOCK_OFFSETS, BLOCK_KEYS) for corner in _BLOCK_CORNERS)
+
+    all_keys = []
+    all_ids = []
+    for (cx, cy), offsets, (window_key, table) in windows:
+        offsets = np.array(offsets, dtype=np.int64)
+        # (棋子數, 窗口點數) 的狀態矩陣
+        states = boards[owners[:, np.newaxis],
+                        xs[:, np.newaxis] + cx + offsets[:, 0],
+                        ys[:, np.newaxis] + cy + offsets[:, 1]]
+        keys = np.array(table, dtype=np.uint64)[np.arange(len(offsets)), states]
+        hashes = np.bitwise_xor.reduce(keys, axis=1) ^ np.uint64(window_key)
+        all_keys.append(hashes.view(np.int64))
+        all_ids.append(game_ids[owners])
+    keys = np.concatenate(all_keys)
+    ids = np.concatenate(all_ids)
+
+    # 去除同一題目中重複的鍵
+    order = np.lexsort((keys, ids))
+    keys = keys[order]
+    ids = ids[order]
+    unique = np.ones(len(keys), dtype=bool)
+    unique[1:] = (keys[1:] != keys[:-1]) | (ids[1:] != ids[:-1])
+    return keys[unique], ids[unique]
+
+def _insert_pattern_keys(cursor, where, params):
+    """計算並寫入符合條件的題目的窗口哈希，返回寫入的題目數"""
+    conn = cursor.connection
+    insert = "INSERT INTO pattern_keys (pattern_key, game_id) VALUES (?, ?)"
+    if np is not None:
+        keys, game_ids = _chunk_keys_numpy(conn, where, params)
+        cursor.executemany(insert, zip(keys.tolist(), game_ids.tolist()))
+        return len(np.unique(game_ids))
+    indexed = 0
+    for game_id, size, stones in _iter_problem_stones(conn, where, params):
+        keys = problem_pattern_keys(stones, size)
+        cursor.executemany(insert, ((key, game_id) for key in keys))
+        indexed += 1
+    return indexed
+
+def build_pattern_index(conn, chunk_size=DEFAULT_CHUNK_SIZE, log=None):
+    """掃描一遍數據庫，重新生成圖案索引，返回建立索引的題目數"""
+    if conn.in_transaction:
+        conn.commit()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("BEGIN")
+        cursor.execute("DROP TABLE IF EXISTS pattern_keys")
+        create_pattern_table(cursor)
+
+        indexed = 0
+        for start, stop in _id_ranges(conn, chunk_size):
+            indexed += _insert_pattern_keys(
+                cursor, "g.game_id >= ? AND g.game_id < ?", (start, stop))
+            message = f"已索引 {indexed} 道題目"
+            logger.info(message)
+            if log is not None:
+                log(message)
+
+        # 寫入完成後才創建索引，比逐行維護 B 樹快得多
+        create_pattern_key_index(cursor)
+        cursor.execute(
+            "INSERT OR REPLACE INTO schema_meta (key, value) "
+            "VALUES ('pattern_index_version', ?)",
+            (str(PATTERN_INDEX_VERSION),)
+        )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return indexed
+
+def update_pattern_keys(cursor, game_ids):
+    """重新計算指定題目的窗口哈希，已刪除的題目只刪除舊的哈希
+
+    供增量導入在已有圖案索引的數據庫上使用，在調用方的事務中執行。
+    """
+    # 按 game_id 刪除需要額外的索引，只在第一次增量更新時創建
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_pattern_keys_game_id "
+                   "ON pattern_keys (game_id)")
+    game_ids = sorted(set(game_ids))
+    for start in range(0, len(game_ids), _FETCH_BATCH):
+        batch = game_ids[start:start + _FETCH_BATCH]
+        placeholders = ', '.join('?' * len(batch))
+        cursor.execute(
+            f"DELETE FROM pattern_keys WHERE game_id IN ({placeholders})", batch)
+        _insert_pattern_keys(cursor, f"g.game_id IN ({placeholders})", batch)
+
+def parse_pattern(text):
+    """解析圖案文字，返回 {(x, y): 狀態}，任意點不出現在結果中
+
+    各排可以用換行或 / 分隔。
+    """
+    rows = [row.strip() for row in text.replace('/', '\n').splitlines() if row.strip()]
+    cells = {}
+    for y, row in enumerate(rows):
+        for x, char in enumerate(row):
+            if char == '?':
+                continue
+            state = PATTERN_CHARS.get(char.upper())
+            if state is None:
+                raise ValueError(f"無效的圖案字符：{char}")
+            cells[(x, y)] = state
+    if not any(state in (BLACK, WHITE) for state in cells.values()):
+        raise ValueError("圖案中至少要有一顆棋子")
+    return cells
+
+def pattern_variants(cells, symmetric=True, swap_colors=False):
+    """返回圖案經對稱變換（和黑白互換）後互不相同的形式列表"""
+    extent = max(max(x, y) for x, y in cells) + 1
+    swaps = (False, True) if swap_colors else (False,)
+    variants = []
+    seen = set()
+    for transform in range(8 if symmetric else 1):
+        for swap in swaps:
+            variant = {}
+            for (x, y), state in cells.items():
+                if swap and state in (BLACK, WHITE):
+                    state = BLACK + WHITE - state
+                variant[transform_coords(x, y, extent, transform)] = state
+            frozen = frozenset(variant.items())
+            if frozen not in seen:
+                seen.add(frozen)
+                variants.append(variant)
+    return variants
+
+def _pattern_hash(cells, x, y, offsets, keys):
+    """圖案中窗口的哈希，窗口中有任意點時返回 None"""
+    value, table = keys
+    for index, (dx, dy) in enumerate(offsets):
+        cell = cells.get((x + dx, y + dy))
+        if cell is None:
+            return None
+        value ^= table[index][cell]
+    return value
+
+def _anchor_keys(cells, use_blocks=True):
+    """返回圖案中完全確定的窗口的哈希，較有區分度的排在前面
+
+    每顆棋子使用能確定的最大窗口；use_blocks 為 True 時再加上所有完全確定
+    且包含棋子的 2×2 方塊，棋子多的方塊在前。
+    """
+    keys = []
+    blocks = {}
+    for (x, y), state in cells.items():
+        if state not in (BLACK, WHITE):
+            continue
+        for width in WINDOW_SIZES:
+            value = _pattern_hash(
+                cells, x, y, _window_offsets(width), WINDOW_KEYS[width])
+            if value is not None:
+                keys.append(to_signed64(value))
+                break
+        if not use_blocks:
+            continue
+        for dx, dy in _BLOCK_CORNERS:
+            corner = (x + dx, y + dy)
+            if corner in blocks:
+                continue
+            value = _pattern_hash(
+                cells, corner[0], corner[1], BLOCK_OFFSETS, BLOCK_KEYS)
+            if value is not None:
+                stones = sum(
+                    cells[(corner[0] + ox, corner[1] + oy)] in (BLACK, WHITE)
+                    for ox, oy in BLOCK_OFFSETS
+                )
+                blocks[corner] = (stones, to_signed64(value))
+    ordered = sorted(blocks.values(), key=lambda item: -item[0])
+    keys.extend(key for _, key in ordered)
+    # 去除重複的鍵並保持順序
+    return list(dict.fromkeys(keys))
+
+def _candidates(conn, keys):
+    """以索引找出包含所有窗口哈希的題目
+
+    候選題目較多時讀出每個哈希的全部題目取交集；候選題目不多時只在候選中查找，
+    不再讀取常見哈希的整個題目列表。
+    """
+    candidates = None
+    for key in keys:
+        if candidates is None or len(candidates) > _FETCH_BATCH:
+            game_ids = {row[0] for row in conn.execute(
+                "SELECT game_id FROM pattern_keys WHERE pattern_key = ?", (key,))}
+            candidates = game_ids if candidates is None else candidates & game_ids
+        else:
+            batch = sorted(candidates)
+            candidates = {row[0] for row in conn.execute(f"""
+                SELECT game_id FROM pattern_keys
+                WHERE pattern_key = ? AND game_id IN ({', '.join('?' * len(batch))})
+            """, [key] + batch)}
+        if not candidates:
+            return candidates
+    return candidates
+
+def _matches(variant, board, size):
+    """圖案是否出現在盤面上，以圖案中第一顆棋子對準盤面上同色的棋子"""
+    anchor, anchor_state = next(
+        (point, state) for point, state in sorted(variant.items())
+        if state in (BLACK, WHITE))
+    for (sx, sy), state in board.items():
+        if state != anchor_state:
+            continue
+        ox = sx - anchor[0]
+        oy = sy - anchor[1]
+        for (x, y), cell in variant.items():
+            px = x + ox
+            py = y + oy
+            if 0 <= px < size and 0 <= py < size:
+                if board.get((px, py), EMPTY) != cell:
+                    break
+            elif cell != EDGE:
+                break
+        else:
+            return True
+    return False
+
+def _match_boards(variant, boards, padding):
+    """以 numpy 找出出現圖案的盤面，返回其序號數組
+
+    以圖案中第一顆棋子為原點，對棋盤上每個點同時比較圖案的一個點。先比較
+    棋子再比較空點和棋盤外，並隨時剔除已經不可能匹配的盤面。
+    """
+    anchor = next(
+        point for point, state in sorted(variant.items()) if state in (BLACK, WHITE))
+    cells = sorted(variant.items(), key=lambda item: item[1] not in (BLACK, WHITE))
+    remaining = np.arange(len(boards))
+    matched = None
+    for (x, y), cell in cells:
+        dx = padding + x - anchor[0]
+        dy = padding + y - anchor[1]
+        window = boards[:, dx:dx + 19, dy:dy + 19] == cell
+        matched = window if matched is None else matched & window
+        alive = matched.any(axis=(1, 2))
+        if not alive.all():
+            boards = boards[alive]
+            matched = matched[alive]
+            remaining = remaining[alive]
+            if not len(remaining):
+                break
+    return remaining
+
+def _matching_ids(conn, variants, where, params):
+    """返回符合條件的題目中出現任一圖案形式的 game_id 集合"""
+    if np is not None:
+        padding = max(max(max(x, y) for x, y in variant) for variant in variants) + 1
+        game_ids, boards, _, _, _ = _load_boards(conn, where, params, padding)
+        if not len(game_ids):
+            return set()
+        matched = np.zeros(len(game_ids), dtype=bool)
+        for variant in variants:
+            matched[_match_boards(variant, boards, padding)] = True
+        return set(game_ids[matched].tolist())
+
+    return {
+        game_id
+        for game_id, size, stones in _iter_problem_stones(conn, where, params)
+        if any(_matches(variant, _board_from_stones(stones, size), size)
+               for variant in variants)
+    }
+
+def find_pattern(conn, pattern, symmetric=True, swap_colors=False, sizes=None,
+                 chunk_size=DEFAULT_CHUNK_SIZE):
+    """查找包含圖案的題目，返回按 game_id 排序的 [(級別, ID), ...]
+
+    pattern 為圖案文字或 parse_pattern 的結果。symmetric 為 True 時旋轉和鏡像
+    後的圖案也算匹配，swap_colors 為 True 時黑白互換的圖案也算匹配。
+    """
+    if not has_pattern_index(conn):
+        raise ValueError("數據庫中沒有圖案索引，請先生成索引")
+    cells = parse_pattern(pattern) if isinstance(pattern, str) else pattern
+
+    size_filter = ""
+    size_params = ()
+    if sizes:
+        size_filter = f" AND g.size IN ({', '.join('?' * len(sizes))})"
+        size_params = tuple(sizes)
+
+    use_blocks = pattern_index_version(conn) >= PATTERN_INDEX_VERSION
+    matched = set()
+    unindexed = []
+    for variant in pattern_variants(cells, symmetric, swap_colors):
+        keys = _anchor_keys(variant, use_blocks)
+        if not keys:
+            unindexed.append(variant)
+            continue
+        candidates = sorted(_candidates(conn, keys) - matched)
+        for start in range(0, len(candidates), _FETCH_BATCH):
+            batch = candidates[start:start + _FETCH_BATCH]
+            where = f"g.game_id IN ({', '.join('?' * len(batch))}){size_filter}"
+            matched |= _matching_ids(conn, [variant], where, tuple(batch) + size_params)
+
+    if unindexed:
+        # 無法使用索引的變換合併為一次掃描
+        if use_blocks:
+            logger.warning("圖案中沒有完全確定的窗口，將逐題核對所有題目")
+        else:
+            logger.warning("圖案索引版本較舊，沒有 2×2 方塊的哈希，將逐題核對所有題目；"
+                           "重新生成索引後可以加快查找")
+        for start, stop in _id_ranges(conn, chunk_size):
+            where = f"g.game_id >= ? AND g.game_id < ?{size_filter}"
+            matched |= _matching_ids(
+                conn, unindexed, where, (start, stop) + size_params)
+
+    results = []
+    ordered = sorted(matched)
+    for start in range(0, len(ordered), _FETCH_BATCH):
+        batch = ordered[start:start + _FETCH_BATCH]
+        results.extend(conn.execute(f"""
+            SELECT level, id FROM games WHERE game_id IN ({', '.join('?' * len(batch))})
+            ORDER BY game_id
+        """, batch).fetchall())
+    return results
@@ -0,0 +1,110 @@
+"""按條件查詢數據庫中的題目
+
+ProblemQuery 把級別範圍、棋盤大小、棋子數、答案數和注釋文字等條件組合為
+作用於 games 表的 WHERE 子句。條件只使用數據庫結構中預先計算的欄位和索引：
+級別範圍和棋盤大小走 (size, level_code) 索引，棋子數走 stone_count 索引，
+注釋文字走 comments_fts 全文索引。結果通過 iter_game_records 流式讀取，不需要在 Python 中逐題篩選。
+
+    query = ProblemQuery().levels('30k', '1k').sizes(19).stones(high=10)
+    for line in query.iter_lines(conn):
+        print(line)
+"""
+from shf_tools.core.comment_search import comment_condition
+from shf_tools.core.compact import level_to_code
+from shf_tools.core.exporter import format_shf_line, iter_game_records
+
+def parse_range(text, convert=int):
+    """解析 'a-b'、'a-'、'-b' 或 'a' 形式的範圍，返回 (下限, 上限)，缺省一端為 None"""
+    text = text.strip()
+    if '-' not in text:
+        value = convert(text)
+        return value, value
+    low, _, high = text.partition('-')
+    low = low.strip()
+    high = high.strip()
+    return (convert(low) if low else None), (convert(high) if high else None)
+
+class ProblemQuery:
+    """題目查詢條件，各方法返回自身以便鏈式調用"""
+
+    def __init__(self):
+        self.conditions = []
+        self.params = []
+        # 注釋條件取決於數據庫是否有全文索引，在查詢時才生成
+        self.comment_texts = []
+
+    def _between(self, column, low, high):
+        if low is not None:
+            self.conditions.append(f"g.{column} >= ?")
+            self.params.append(low)
+        if high is not None:
+            self.conditions.append(f"g.{column} <= ?")
+            self.params.append(high)
+        return self
+
+    def levels(self, low=None, high=None):
+        """限定級別範圍，兩端都包含，順序不限，例如 levels('30k', '1k')"""
+        low = level_to_code(low) if low is not None else None
+        high = level_to_code(high) if high is not None else None
+        if low is not None and high is not None and low > high:
+            low, high = high, low
+        return self._between('level_code', low, high)
+
+    def sizes(self, *sizes):
+        """限定棋盤大小"""
+        if sizes:
+            self.conditions.append(f"g.size IN ({', '.join('?' * len(sizes))})")
+            self.params.extend(int(size) for size in sizes)
+        return self
+
+    def stones(self, low=None, high=None):
+        """限定初始棋子數"""
+        return self._between('stone_count', low, high)
+
+    def answers(self, low=None, high=None):
+        """限定答案數"""
+        return self._between('answer_count', low, high)
+
+    def correct(self, low=None, high=None):
+        """限定正確答案（+）數"""
+        return self._between('correct_count', low, high)
+
+    def wrong(self, low=None, high=None):
+        """限定錯誤答案（-）數"""
+        return self._between('wrong_count', low, high)
+
+    def comment(self, text):
+        """初始注釋或任一答案的注釋包含 text，有全文索引時以空白分隔的各詞都要出現"""
+        self.comment_texts.append(text)
+        return self
+
+    def where(self, conn):
+        """返回 (WHERE 子句, 參數)，沒有條件時子句為 None"""
+        conditions = list(self.conditions)
+        params = list(self.params)
+        for text in self.comment_texts:
+            condition, condition_params = comment_condition(conn, text)
+            conditions.append(condition)
+            params.extend(condition_params)
+        if not conditions:
+            return None, ()
+        return ' AND '.join(conditions), tuple(params)
+
+    def count(self, conn):
+        """統計符合條件的題目數"""
+        where, params = self.where(conn)
+        sql = "SELECT COUNT(*) FROM games g"
+        if where:
+            sql += f" WHERE {where}"
+        return conn.execute(sql, params).fetchone()[0]
+
+    def iter_records(self, conn, limit=None, order_by="g.game_id"):
+        """流式產出符合條件的題目數據"""
+        where, params = self.where(conn)
+        return iter_game_records(conn, order_by=order_by, where=where, params=params,
+                                 limit=limit)
+
+    def iter_lines(self, conn, limit=None, order_by="g.game_id"):
+        """流式產出符合條件的 SHF 行"""
+        for game_data in self.iter_records(conn, limit, order_by):
+            yield format_shf_line(game_data)
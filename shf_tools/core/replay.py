@@ -0,0 +1,120 @@
+"""沿答案前綴樹前進後退的盤面緩存
+
+查看器每次翻動一手都從空棋盤重擺初始棋子並重走所有著手，長變化會明顯卡頓。
+ReplayCache 以 AnswerTree 的節點為鍵，記錄走到該節點後的盤面快照，以及這一手
+的增量：落子的座標、顏色和被提走的棋子。從一個節點移到另一個節點時，先沿父節點
+撤銷到兩者的共同祖先，再走到目標節點，只把淨變化交給界面，一次重繪即可。
+每個節點的盤面只計算一次，切換共享前綴的變化也不必重算。
+"""
+from shf_tools.core.board import BoardState, COLOR_CHARS, IllegalMove, opponent
+
+class ReplayStep:
+    """走到一個節點後的盤面和這一手的增量"""
+    __slots__ = ('state', 'point', 'color', 'captured', 'last_move')
+
+    def __init__(self, state, point=None, color=None, captured=(), last_move=None):
+        self.state = state          # 走完這一手後的 BoardState，不應修改
+        self.point = point          # 落子的 (x, y)，不合法的著手為 None
+        self.color = color          # BLACK 或 WHITE
+        self.captured = captured    # 被提走的 [(x, y), ...]，顏色與落子相反
+        self.last_move = last_move  # 最後一手成功落子的 (x, y)
+
+class ReplayCache:
+    """按前綴樹節點緩存的盤面
+
+    不合法的著手（重疊、自殺、立即提劫）不改變盤面，與逐手擺放時略過它們的結果相同。
+    """
+
+    def __init__(self, size, stones):
+        state = BoardState(size)
+        for stone in stones:
+            try:
+                state.play_move(stone)
+            except IllegalMove:
+                pass
+            state.ko = -1
+        self.initial = ReplayStep(state)
+        self._steps = {}
+
+    def step(self, node):
+        """返回走到節點後的 ReplayStep，根節點為初始局面"""
+        if node.parent is None:
+            return self.initial
+        step = self._steps.get(node)
+        if step is not None:
+            return step
+
+        # 從最近一個已緩存的祖先開始依次計算，不使用遞歸以支持很長的變化
+        pending = []
+        while node.parent is not None and node not in self._steps:
+            pending.append(node)
+            node = node.parent
+        previous = self.step(node)
+        for node in reversed(pending):
+            step = self._play(previous, node.move)
+            self._steps[node] = step
+            previous = step
+        return step
+
+    def _play(self, previous, move):
+        color = COLOR_CHARS.get(move[:1])
+        if color is not None and len(move) == 3:
+            point = (ord(move[1]) - 97, ord(move[2]) - 97)
+            if previous.state.is_legal(point[0], point[1], color):
+                state = previous.state.copy()
+                captured = state.play(point[0], point[1], color)
+                return ReplayStep(state, point, color, captured, point)
+        # 不合法的著手：盤面和最後一手都不變
+        return ReplayStep(previous.state, last_move=previous.last_move)
+
+    def _undo(self, node, changes):
+        step = self.step(node)
+        if step.point is not None:
+            changes[step.point] = 0
+            enemy = opponent(step.color)
+            for point in step.captured:
+                changes[point] = enemy
+
+    def _redo(self, node, changes):
+        step = self.step(node)
+        if step.point is not None:
+            changes[step.point] = step.color
+            for point in step.captured:
+                changes[point] = 0
+
+    def transition(self, source, target):
+        """從 source 節點移到 target 節點
+
+        返回 (變化, ReplayStep)，變化為 {(x, y): 顏色}，顏色為 EMPTY（0）表示該點的棋子被移除。
+        前進或後退一手只處理這一手的增量，其他情況經由兩者的共同祖先。
+        """
+        changes = {}
+        if target.parent is source:
+            self._redo(target, changes)
+            return changes, self.step(target)
+        if source.parent is target:
+            self._undo(source, changes)
+            return changes, self.step(target)
+
+        ancestors = set()
+        node = target
+        while node is not None:
+            ancestors.add(node)
+            node = node.parent
+
+        # 撤銷 source 到共同祖先之間的著手
+        node = source
+        while node not in ancestors:
+            self._undo(node, changes)
+            node = node.parent
+
+        # 從共同祖先走到 target
+        path = []
+        descendant = target
+        while descendant is not node:
+            path.append(descendant)
+            descendant = descendant.parent
+        for descendant in reversed(path):
+            self._redo(descendant, changes)
+        return changes, self.step(target)
+
@@ -0,0 +1,294 @@
+"""SHF 題庫 SQLite 數據庫結構
+
+shf2sqlite 和 sqlite2shf 共用此模組來創建、識別和就地升級數據庫結構。
+"""
+import logging
+
+from shf_tools.core.comment_search import (COMMENT_TABLE, comment_rowid,
+                                           create_comment_table, has_comment_index,
+                                           rebuild_comment_index)
+
+logger = logging.getLogger(__name__)
+
+# 數據庫結構版本
+# 1: 初始版本，games.id 為主鍵，沒有索引和 schema_meta 表
+# 2: games 使用整數主鍵 game_id 並以 (level, id) 唯一；增加二級索引和 schema_meta 表
+# 3: games 增加初始局面的 Zobrist 鍵 position_key 及其索引
+# 4: games 增加級別代碼和棋子、答案數量欄位，供按條件查詢題目
+# 5: 增加注釋全文索引 comments_fts（SQLite 支持 FTS5 時）
+# 6: 增加來源文件清單 sources 和 games.source_id，供增量導入；全文索引的行號由 game_id 決定
+# 7: games 增加按題目特徵估計的級別代碼 estimated_level_code
+SCHEMA_VERSION = 7
+
+# 二級索引，在批量導入完成後才創建，以免拖慢寫入
+INDEXES = {
+    'idx_initial_positions_game_id': "initial_positions (game_id)",
+    'idx_answers_game_id': "answers (game_id)",
+    'idx_games_level_size': "games (level, size)",
+    # 覆蓋索引：按答案類型查找題目時不需要回表
+    'idx_answers_type_game_id': "answers (answer_type, game_id)",
+    # 按局面查找重複題目
+    'idx_games_position_key': "games (position_key)",
+    # 按棋盤大小和級別範圍查詢；未限定大小時由跳躍掃描使用
+    'idx_games_size_level_code': "games (size, level_code)",
+    'idx_games_stone_count': "games (stone_count)",
+    # 增量導入時刪除來源文件已變化或已移除的題目
+    'idx_games_source_id': "games (source_id)",
+}
+
+# 第 4 版增加的欄位，由導入時根據題目內容計算
+COUNT_COLUMNS = ('level_code', 'stone_count', 'answer_count', 'correct_count',
+                 'wrong_count')
+
+def create_tables(cursor):
+    """創建當前版本的表結構（不含二級索引）"""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS games (
+            game_id INTEGER PRIMARY KEY,
+            id TEXT NOT NULL,
+            level TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            initial_comment TEXT,
+            position_key INTEGER,
+            level_code INTEGER,
+            stone_count INTEGER,
+            answer_count INTEGER,
+            correct_count INTEGER,
+            wrong_count INTEGER,
+            source_id INTEGER,
+            estimated_level_code INTEGER,
+            UNIQUE (level, id)
+        )
+    """)
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS initial_positions (
+            game_id INTEGER NOT NULL,
+            color TEXT NOT NULL CHECK (color IN ('B', 'W')),
+            position TEXT NOT NULL,
+            FOREIGN KEY (game_id) REFERENCES games(game_id)
+        )
+    """)
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS answers (
+            game_id INTEGER NOT NULL,
+            answer_type TEXT NOT NULL CHECK (answer_type IN ('+', '-', '/')),
+            moves TEXT NOT NULL,
+            comment TEXT,
+            FOREIGN KEY (game_id) REFERENCES games(game_id)
+        )
+    """)
+
+    create_comment_table(cursor)
+    create_sources_table(cursor)
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_meta (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        )
+    """)
+    set_schema_version(cursor, SCHEMA_VERSION)
+
+def create_sources_table(cursor):
+    """創建來源文件清單，記錄每個導入文件的修改時間、大小和內容哈希"""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS sources (
+            source_id INTEGER PRIMARY KEY,
+            path TEXT NOT NULL UNIQUE,
+            mtime_ns INTEGER NOT NULL,
+            file_size INTEGER NOT NULL,
+            content_hash TEXT NOT NULL
+        )
+    """)
+
+def create_indexes(cursor):
+    """創建缺失的二級索引，應在批量導入完成後調用"""
+    existing = {
+        row[0] for row in
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'index'").fetchall()
+    }
+    missing = [name for name in INDEXES if name not in existing]
+    for name in missing:
+        cursor.execute(f"CREATE INDEX {name} ON {INDEXES[name]}")
+    if missing:
+        # 更新查詢規劃器的統計信息
+        cursor.execute("ANALYZE")
+    return missing
+
+def set_schema_version(cursor, version):
+    """記錄數據庫結構版本"""
+    cursor.execute(
+        "INSERT OR REPLACE INTO schema_meta (key, value) VALUES ('schema_version', ?)",
+        (str(version),)
+    )
+
+def get_schema_version(conn):
+    """識別數據庫結構版本，空數據庫返回 0"""
+    tables = {
+        row[0] for row in
+        conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+    }
+    if 'schema_meta' in tables:
+        row = conn.execute(
+            "SELECT value FROM schema_meta WHERE key = 'schema_version'"
+        ).fetchone()
+        if row:
+            return int(row[0])
+    if 'games' in tables:
+        return 1
+    return 0
+
+def _upgrade_v1_to_v2(cursor):
+    """將 games.id 主鍵的舊結構遷移為整數 game_id 主鍵"""
+    cursor.execute("ALTER TABLE answers RENAME TO answers_v1")
+    cursor.execute("ALTER TABLE initial_positions RENAME TO initial_positions_v1")
+    cursor.execute("ALTER TABLE games RENAME TO games_v1")
+
+    create_tables(cursor)
+
+    cursor.execute("""
+        INSERT INTO games (id, level, size, initial_comment)
+        SELECT id, level, size, initial_comment FROM games_v1 ORDER BY rowid
+    """)
+    # 第 1 版的 games.id 是唯一的，可以直接按 id 對應新的 game_id
+    cursor.execute("""
+        INSERT INTO initial_positions (game_id, color, position)
+        SELECT g.game_id, p.color, p.position
+        FROM initial_positions_v1 p JOIN games g ON g.id = p.game_id
+        ORDER BY p.rowid
+    """)
+    cursor.execute("""
+        INSERT INTO answers (game_id, answer_type, moves, comment)
+        SELECT g.game_id, a.answer_type, a.moves, a.comment
+        FROM answers_v1 a JOIN games g ON g.id = a.game_id
+        ORDER BY a.rowid
+    """)
+
+    cursor.execute("DROP TABLE answers_v1")
+    cursor.execute("DROP TABLE initial_positions_v1")
+    cursor.execute("DROP TABLE games_v1")
+
+def _upgrade_v2_to_v3(cursor):
+    """增加 position_key 欄位，並為已有題目計算局面鍵"""
+    from shf_tools.core.zobrist import first_mover, position_key
+
+    columns = {row[1] for row in cursor.execute("PRAGMA table_info(games)")}
+    if 'position_key' not in columns:
+        cursor.execute("ALTER TABLE games ADD COLUMN position_key INTEGER")
+
+    games = cursor.connection.execute("""
+        SELECT g.game_id, g.size,
+               (SELECT group_concat(p.color || p.position)
+                FROM initial_positions p WHERE p.game_id = g.game_id),
+               (SELECT a.moves FROM answers a WHERE a.game_id = g.game_id
+                ORDER BY a.rowid LIMIT 1)
+        FROM games g
+        WHERE g.position_key IS NULL
+    """).fetchall()
+    cursor.executemany(
+        "UPDATE games SET position_key = ? WHERE game_id = ?",
+        (
+            (position_key(stones.split(',') if stones else (), size,
+                          first_mover(moves or '')), game_id)
+            for game_id, size, stones, moves in games
+        )
+    )
+
+def _upgrade_v3_to_v4(cursor):
+    """增加級別代碼和數量欄位，並為已有題目填寫"""
+    from shf_tools.core.compact import level_to_code
+
+    columns = {row[1] for row in cursor.execute("PRAGMA table_info(games)")}
+    for column in COUNT_COLUMNS:
+        if column not in columns:
+            cursor.execute(f"ALTER TABLE games ADD COLUMN {column} INTEGER")
+
+    # 不同的級別寫法只有幾十種，逐種更新即可
+    rows = cursor.connection.execute("SELECT DISTINCT level FROM games")
+    levels = [row[0] for row in rows]
+    for level in levels:
+        try:
+            code = level_to_code(level)
+        except ValueError:
+            code = None
+        cursor.execute("UPDATE games SET level_code = ? WHERE level = ?", (code, level))
+
+    cursor.execute("""
+        UPDATE games SET
+            stone_count = (SELECT COUNT(*) FROM initial_positions p
+                           WHERE p.game_id = games.game_id),
+            answer_count = (SELECT COUNT(*) FROM answers a
+                            WHERE a.game_id = games.game_id),
+            correct_count = (SELECT COUNT(*) FROM answers a
+                             WHERE a.game_id = games.game_id AND a.answer_type = '+'),
+            wrong_count = (SELECT COUNT(*) FROM answers a
+                           WHERE a.game_id = games.game_id AND a.answer_type = '-')
+    """)
+
+def _upgrade_v4_to_v5(cursor):
+    """創建注釋全文索引並寫入已有的注釋"""
+    if create_comment_table(cursor):
+        rebuild_comment_index(cursor)
+
+def _upgrade_v5_to_v6(cursor):
+    """增加來源文件清單和 games.source_id，並按新的行號規則重建全文索引
+
+    舊數據庫中的題目沒有來源，增量導入時會被同名題目覆蓋，但不會因來源移除而刪除。
+    """
+    columns = {row[1] for row in cursor.execute("PRAGMA table_info(games)")}
+    if 'source_id' not in columns:
+        cursor.execute("ALTER TABLE games ADD COLUMN source_id INTEGER")
+    create_sources_table(cursor)
+    if has_comment_index(cursor.connection):
+        # game_id 從 1 開始，按新規則生成的行號不會小於 comment_rowid(1, 0)
+        oldest = cursor.execute(f"SELECT MIN(rowid) FROM {COMMENT_TABLE}").fetchone()[0]
+        if oldest is not None and oldest < comment_rowid(1, 0):
+            rebuild_comment_index(cursor)
+
+def _upgrade_v6_to_v7(cursor):
+    """增加估計級別欄位，由 difficulty 命令填寫"""
+    columns = {row[1] for row in cursor.execute("PRAGMA table_info(games)")}
+    if 'estimated_level_code' not in columns:
+        cursor.execute("ALTER TABLE games ADD COLUMN estimated_level_code INTEGER")
+
+# 從鍵所示版本升級到下一版本的步驟
+_UPGRADES = {
+    1: _upgrade_v1_to_v2,
+    2: _upgrade_v2_to_v3,
+    3: _upgrade_v3_to_v4,
+    4: _upgrade_v4_to_v5,
+    5: _upgrade_v5_to_v6,
+    6: _upgrade_v6_to_v7,
+}
+
+def upgrade_schema(conn):
+    """將舊版本數據庫就地升級到當前版本，並補齊缺失的索引
+
+    返回升級前的版本號。
+    """
+    version = get_schema_version(conn)
+    if version == 0:
+        raise ValueError("數據庫中沒有題目表")
+    if version > SCHEMA_VERSION:
+        raise ValueError(f"數據庫結構版本 {version} 比程序支持的版本 {SCHEMA_VERSION} 新")
+
+    if conn.in_transaction:
+        conn.commit()
+
+    cursor = conn.cursor()
+    try:
+        cursor.execute("BEGIN")
+        for from_version in range(version, SCHEMA_VERSION):
+            logger.info(f"升級數據庫結構: 版本 {from_version} -> {from_version + 1}")
+            _UPGRADES[from_version](cursor)
+        if version < SCHEMA_VERSION:
+            set_schema_version(cursor, SCHEMA_VERSION)
+        create_indexes(cursor)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    return version
@@ -0,0 +1,263 @@
+"""SHFB 二進制題庫格式
+
+與 .shf 文本文件配套的只讀二進制容器，以 mmap 打開後可按序號或 (級別, ID)
+直接讀取任意一道題目，不需要解析整個文件。所有整數均為小端序，各區段按 8 字節對齊：
+
+    文件頭      HEADER
+    記錄表      每題一條定長 RECORD
+    著手區      uint16，編碼與 CompactProblem.points 相同
+    答案區      uint32，(答案結束位置 << 2) | 答案類型代碼，位置相對於題目的第一個點
+    鍵表        uint64，按 (級別代碼 << 32) | 題號 排序
+    鍵序號表    uint32，鍵表中每一項對應的記錄序號
+    字符串表    uint64 偏移表（字符串數 + 1 項）和 UTF-8 數據
+"""
+import mmap
+import sys
+import struct
+import logging
+from array import array
+from bisect import bisect_left
+
+from shf_tools.core.compact import CompactProblem, level_to_code
+from shf_tools.core.parser import iter_problems
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'SHFB'
+FORMAT_VERSION = 1
+
+# 魔數、版本、保留、題目數、字符串數，以及各區段的起始偏移
+HEADER = struct.Struct('<4sHHII6Q')
+
+# 級別代碼、棋盤大小、初始棋子數、題號、第一個點的位置、點數、
+# 第一個答案的位置、答案數、注釋字符串序號（NO_COMMENT 表示沒有注釋）
+RECORD = struct.Struct('<BBHIIIIH2xI')
+
+NO_COMMENT = 0xFFFFFFFF
+
+_LITTLE_ENDIAN = sys.byteorder == 'little'
+
+def _align(offset):
+    return (offset + 7) & ~7
+
+def _key(level_code, number):
+    return level_code << 32 | number
+
+def write_shfb(problems, file_path):
+    """將 CompactProblem 序列寫入 SHFB 文件，返回題目數"""
+    records = []
+    points = array('H')
+    answer_ends = array('I')
+    strings = []
+    keys = {}
+
+    for problem in problems:
+        key = _key(problem.level_code, problem.number)
+        if key in keys:
+            raise ValueError(f"重複的題目：{problem.key}")
+        keys[key] = len(records)
+
+        if problem._comments is None:
+            comment_index = NO_COMMENT
+        else:
+            comment_index = len(strings)
+            strings.append(problem._comments)
+
+        records.append(RECORD.pack(
+            problem.level_code, problem.size, problem.stone_count, problem.number,
+            len(points), len(problem.points),
+            len(answer_ends), len(problem.answer_ends), comment_index
+        ))
+        points.extend(problem.points)
+        answer_ends.extend(problem.answer_ends)
+
+    sorted_keys = array('Q', sorted(keys))
+    key_indexes = array('I', (keys[key] for key in sorted_keys))
+    string_offsets = array('Q', [0])
+    for data in strings:
+        string_offsets.append(string_offsets[-1] + len(data))
+
+    if not _LITTLE_ENDIAN:
+        for section in (points, answer_ends, sorted_keys, key_indexes, string_offsets):
+            section.byteswap()
+
+    records_offset = _align(HEADER.size)
+    points_offset = _align(records_offset + RECORD.size * len(records))
+    answers_offset = _align(points_offset + points.itemsize * len(points))
+    keys_offset = _align(answers_offset + answer_ends.itemsize * len(answer_ends))
+    key_indexes_offset = keys_offset + sorted_keys.itemsize * len(sorted_keys)
+    strings_offset = _align(
+        key_indexes_offset + key_indexes.itemsize * len(key_indexes))
+
+    with open(file_path, 'wb') as f:
+        def pad_to(offset):
+            f.write(b'\0' * (offset - f.tell()))
+
+        f.write(HEADER.pack(
+            MAGIC, FORMAT_VERSION, 0, len(records), len(strings),
+            records_offset, points_offset, answers_offset,
+            keys_offset, key_indexes_offset, strings_offset
+        ))
+        pad_to(records_offset)
+        f.write(b''.join(records))
+        pad_to(points_offset)
+        points.tofile(f)
+        pad_to(answers_offset)
+        answer_ends.tofile(f)
+        pad_to(keys_offset)
+        sorted_keys.tofile(f)
+        key_indexes.tofile(f)
+        pad_to(strings_offset)
+        string_offsets.tofile(f)
+        for data in strings:
+            f.write(data)
+
+    return len(records)
+
+class SHFBReader:
+    """以 mmap 打開 SHFB 文件，按序號或 (級別, ID) 隨機讀取題目"""
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        with open(file_path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self._open()
+        except Exception:
+            self._mmap.close()
+            raise
+
+    def _open(self):
+        if len(self._mmap) < HEADER.size:
+            raise ValueError(f"不是有效的 SHFB 文件：{self.file_path}")
+        (magic, version, _, self.count, string_count,
+         self._records_offset, points_offset, answers_offset,
+         keys_offset, key_indexes_offset, strings_offset) = HEADER.unpack_from(
+            self._mmap)
+        if magic != MAGIC:
+            raise ValueError(f"不是有效的 SHFB 文件：{self.file_path}")
+        if version > FORMAT_VERSION:
+            raise ValueError(f"SHFB 格式版本 {version} 比程序支持的版本 {FORMAT_VERSION} 新")
+
+        self._buffer = memoryview(self._mmap)
+        self._points = self._view(points_offset, answers_offset, 'H')
+        self._answer_ends = self._view(answers_offset, keys_offset, 'I')
+        self._keys = self._view(keys_offset, keys_offset + 8 * self.count, 'Q')
+        self._key_indexes = self._view(
+            key_indexes_offset, key_indexes_offset + 4 * self.count, 'I')
+        self._strings_data = strings_offset + 8 * (string_count + 1)
+        self._string_offsets = self._view(strings_offset, self._strings_data, 'Q')
+
+    def _view(self, start, end, typecode):
+        """返回區段的數組視圖；小端序平台上直接映射文件，不複製數據"""
+        itemsize = array(typecode).itemsize
+        end = start + (end - start) // itemsize * itemsize
+        if _LITTLE_ENDIAN:
+            return self._buffer[start:end].cast(typecode)
+        values = array(typecode, self._buffer[start:end].tobytes())
+        values.byteswap()
+        return values
+
+    def close(self):
+        """關閉文件映射"""
+        if self._mmap is None:
+            return
+        # 先釋放所有視圖，否則 mmap 無法關閉
+        for name in ('_points', '_answer_ends', '_keys', '_key_indexes',
+                     '_string_offsets'):
+            view = getattr(self, name, None)
+            if isinstance(view, memoryview):
+                view.release()
+        self._buffer.release()
+        self._mmap.close()
+        self._mmap = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError("題目序號超出範圍")
+
+        (level_code, size, stone_count, number, points_start, point_count,
+         answers_start, answer_count, comment_index) = RECORD.unpack_from(
+            self._buffer, self._records_offset + RECORD.size * index)
+
+        points = array('H', self._points[points_start:points_start + point_count])
+        answer_ends = array(
+            'I', self._answer_ends[answers_start:answers_start + answer_count])
+        if comment_index == NO_COMMENT:
+            comments = None
+        else:
+            start = self._strings_data + self._string_offsets[comment_index]
+            end = self._strings_data + self._string_offsets[comment_index + 1]
+            comments = self._buffer[start:end].tobytes()
+        return CompactProblem(level_code, number, size, stone_count, points,
+                              answer_ends, comments)
+
+    def __iter__(self):
+        for index in range(self.count):
+            yield self[index]
+
+    def index_of(self, level, problem_id):
+        """返回題目的序號，找不到時返回 -1"""
+        key = _key(level_to_code(level), int(problem_id))
+        position = bisect_left(self._keys, key)
+        if position < self.count and self._keys[position] == key:
+            return self._key_indexes[position]
+        return -1
+
+    def find(self, level, problem_id):
+        """按級別和 ID 查找題目，找不到時返回 None"""
+        index = self.index_of(level, problem_id)
+        return self[index] if index >= 0 else None
+
+    def line(self, index):
+        """返回題目的 SHF 行"""
+        return self[index].to_line()
+
+def shf_to_shfb(input_files, output_path, strict=False):
+    """將 SHF 文件轉換為 SHFB 文件，返回 (題目數, 錯誤數)"""
+    if isinstance(input_files, str):
+        input_files = [input_files]
+
+    problems = []
+    seen_keys = set()
+    error_count = 0
+    for file_path in input_files:
+        for line_no, problem, error in iter_problems(file_path, strict):
+            if error is None:
+                try:
+                    compact = CompactProblem.from_problem(problem)
+                    key = (compact.level_code, compact.number)
+                    if key in seen_keys:
+                        raise ValueError(f"重複的題目：{compact.key}")
+                    seen_keys.add(key)
+                    problems.append(compact)
+                    continue
+                except ValueError as e:
+                    error = e
+            error_count += 1
+            logger.error(f"{file_path} 第 {line_no} 行解析失敗: {str(error)}")
+
+    count = write_shfb(problems, output_path)
+    return count, error_count
+
+def shfb_to_shf(input_path, output_path):
+    """將 SHFB 文件轉換為 SHF 文件，返回題目數"""
+    count = 0
+    with SHFBReader(input_path) as reader, \
+            open(output_path, 'w', encoding='utf-8') as f:
+        for problem in reader:
+            f.write(problem.to_line())
+            f.write('\n')
+            count += 1
+    return count
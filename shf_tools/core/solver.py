@@ -0,0 +1,421 @@
+"""局部死活求解器
+
+在題目棋子周圍的有限區域內以帶置換表的 AND/OR 搜索（布爾值的 alpha-beta）
+求解死活，用來核對手工標記的答案：+ 答案走完後先走方是否仍然成功，
+- 答案是否確實失敗，以及缺少應手的錯誤答案應如何懲罰。
+
+求解的約定：
+
+- 先走方由第一個答案的第一手決定。棋子離棋盤邊緣較近的一方為守方，
+  守方最大的棋串為目標，攻方吃掉目標即為成功，守方使目標兩眼活（Benson
+  無條件活）即為成功；雙方都無法取勝時（例如雙活）算守方成功。
+- 只在守方棋子的外接矩形向外擴展 margin 路的區域內落子，區域外的攻方棋子
+  視為活棋；區域超過 max_region 個點的題目不是局部死活，不求解。攻方不能停一手，守方可以。
+- 劫爭不考慮劫材，只禁止立即提回。
+
+搜索按深度逐步加深，超出節點數上限時結果為 UNKNOWN。大型題庫以
+solve_files 按批交給進程池並行求解。
+"""
+from shf_tools.core.board import (EMPTY, COLOR_CHARS, COLOR_NAMES, BoardState,
+                                  IllegalMove, opponent)
+from shf_tools.core.parallel import imap_ordered, iter_line_batches
+from shf_tools.core.parser import Answer, parse_line
+
+# 求解結果，均從先走方的角度而言
+SUCCESS = 'success'
+FAILURE = 'failure'
+UNKNOWN = 'unknown'
+
+# 每個答案默認的搜索節點數上限和最大深度
+DEFAULT_MAX_NODES = 10000
+DEFAULT_MAX_DEPTH = 24
+
+# 區域向守方棋子外擴展的路數
+DEFAULT_MARGIN = 1
+
+# 區域的最大點數，更大的題目不是局部死活，不求解
+DEFAULT_MAX_REGION = 120
+
+# 每批交給子進程求解的行數
+DEFAULT_BATCH_LINES = 200
+
+# 守方停一手
+PASS = -1
+
+# 核對答案時發現的問題類型
+REFUTED = 'refuted'              # + 答案被推翻
+WRONG_IS_CORRECT = 'wrong-correct'  # - 答案實際成功
+MISSING_REFUTATION = 'missing-refutation'  # - 答案沒有給出懲罰的應手
+
+class _BudgetExceeded(Exception):
+    pass
+
+def _edge_distance(stone, size):
+    x = ord(stone[1]) - 97
+    y = ord(stone[2]) - 97
+    return min(x, y, size - 1 - x, size - 1 - y)
+
+def guess_defender(stones, size):
+    """猜測守方：棋子平均離棋盤邊緣較近的一方，返回 'B' 或 'W'"""
+    distances = {'B': [], 'W': []}
+    for stone in stones:
+        distances[stone[0]].append(_edge_distance(stone, size))
+    if not distances['W']:
+        return 'B'
+    if not distances['B']:
+        return 'W'
+    black = sum(distances['B']) / len(distances['B'])
+    white = sum(distances['W']) / len(distances['W'])
+    return 'W' if white < black else 'B'
+
+class Solver:
+    """一道題目的求解器，同一題的各答案共用置換表"""
+
+    def __init__(self, problem, defender=None, margin=DEFAULT_MARGIN,
+                 max_region=DEFAULT_MAX_REGION, max_nodes=DEFAULT_MAX_NODES,
+                 max_depth=DEFAULT_MAX_DEPTH):
+        self.problem = problem
+        self.player = COLOR_CHARS[problem.to_move]
+        defender = defender or guess_defender(problem.stones, problem.size)
+        self.defender = COLOR_CHARS[defender]
+        self.attacker = opponent(self.defender)
+        self.max_nodes = max_nodes
+        self.max_depth = max_depth
+        self.nodes = 0
+        # (哈希, 輪到的一方, 劫爭點) -> 攻方是否成功，或已搜索但未分勝負的深度
+        self.table = {}
+        # 同一鍵下曾經取勝的著手，加深搜索時優先嘗試
+        self.best = {}
+        # 盤面哈希 -> 目標是否無條件活
+        self.alive_cache = {}
+
+        # 無法擺放的初始棋子由 validate --replay 報告，這裡直接略過
+        board = BoardState(problem.size)
+        for stone in problem.stones:
+            try:
+                board.play_move(stone)
+            except IllegalMove:
+                pass
+        board.ko = -1
+        self.board = board
+        self.region = self._region(board, margin)
+        if len(self.region) > max_region:
+            self.region = []
+        self.region_set = frozenset(self.region)
+        self.target = self._target(board)
+
+    def _region(self, board, margin):
+        """守方棋子外接矩形向外擴展 margin 路的所有點"""
+        size = board.size
+        points = [p for p, color in enumerate(board.colors) if color == self.defender]
+        if not points:
+            return []
+        xs = [p // size for p in points]
+        ys = [p % size for p in points]
+        x0 = max(0, min(xs) - margin)
+        x1 = min(size - 1, max(xs) + margin)
+        y0 = max(0, min(ys) - margin)
+        y1 = min(size - 1, max(ys) + margin)
+        return [x * size + y for x in range(x0, x1 + 1) for y in range(y0, y1 + 1)]
+
+    def _target(self, board):
+        """守方最大的棋串中的一點，沒有守方棋子或區域過大時為 None"""
+        best = None
+        for point in self.region:
+            if board.colors[point] == self.defender:
+                root = board.find(point)
+                if best is None or board.group_sizes[root] > board.group_sizes[best]:
+                    best = root
+        return best
+
+    def _captured(self, board):
+        return board.colors[self.target] != self.defender
+
+    def _alive(self, board):
+        """目標是否已經 Benson 無條件活，只考慮區域內的眼位"""
+        alive = self.alive_cache.get(board.hash)
+        if alive is None:
+            # 每個要害塊中至少有一口氣，少於兩口氣不可能活
+            root = board.find(self.target)
+            if (board.pseudo_liberties[root] < 2
+                    or len(board.liberties(*board.coords(root))) < 2):
+                alive = False
+            else:
+                alive = self._benson(board)
+            self.alive_cache[board.hash] = alive
+        return alive
+
+    def _benson(self, board):
+        colors = board.colors
+        neighbors = board.neighbors
+        defender = self.defender
+        region_set = self.region_set
+
+        # 區域內非守方棋子的連通塊；碰到區域外非守方點的塊是開放的，不能成為眼
+        seen = set()
+        regions = []
+        for start in self.region:
+            if start in seen or colors[start] == defender:
+                continue
+            block = []
+            stack = [start]
+            seen.add(start)
+            closed = True
+            while stack:
+                point = stack.pop()
+                block.append(point)
+                for neighbor in neighbors[point]:
+                    if colors[neighbor] == defender or neighbor in seen:
+                        continue
+                    if neighbor not in region_set:
+                        closed = False
+                        continue
+                    seen.add(neighbor)
+                    stack.append(neighbor)
+            if closed:
+                regions.append(block)
+
+        # 每個塊相鄰的棋串，以及以塊中每個空點為氣的棋串（該塊對其是要害）
+        bordering = []
+        vital = []
+        for block in regions:
+            chains = set()
+            vital_chains = None
+            for point in block:
+                adjacent = {
+                    board.find(n) for n in neighbors[point] if colors[n] == defender
+                }
+                chains |= adjacent
+                if colors[point] == EMPTY:
+                    if vital_chains is None:
+                        vital_chains = adjacent
+                    else:
+                        vital_chains &= adjacent
+            bordering.append(chains)
+            vital.append(vital_chains or set())
+
+        chains = {board.find(p) for p in self.region if colors[p] == defender}
+        healthy = set(range(len(regions)))
+        while True:
+            removed = {
+                chain for chain in chains
+                if sum(1 for index in healthy if chain in vital[index]) < 2
+            }
+            if not removed:
+                break
+            chains -= removed
+            healthy = {index for index in healthy if bordering[index] <= chains}
+        return board.find(self.target) in chains
+
+    def _moves(self, board, color):
+        """區域內可以落子的點，按與目標的關係排序；守方最後可以停一手"""
+        colors = board.colors
+        neighbors = board.neighbors
+        target_liberties = set()
+        root = board.find(self.target)
+        for stone in board._group_points(root):
+            for neighbor in neighbors[stone]:
+                if colors[neighbor] == EMPTY:
+                    target_liberties.add(neighbor)
+
+        scored = []
+        for point in self.region:
+            if colors[point] != EMPTY or point == board.ko:
+                continue
+            score = 8 if point in target_liberties else 0
+            for neighbor in neighbors[point]:
+                neighbor_color = colors[neighbor]
+                if neighbor_color == EMPTY:
+                    score += 1
+                else:
+                    # 緊氣或長氣：對手棋串氣越少越優先
+                    liberties = board.pseudo_liberties[board.find(neighbor)]
+                    score += 4 if liberties <= 2 else 2
+            scored.append((-score, point))
+        scored.sort()
+        moves = [point for _, point in scored]
+        if color == self.defender:
+            moves.append(PASS)
+        return moves
+
+    def _search(self, board, color, depth):
+        """返回攻方能否吃掉目標；深度不足時返回 None"""
+        self.nodes += 1
+        if self.nodes > self.max_nodes:
+            raise _BudgetExceeded()
+
+        key = (board.hash, color, board.ko)
+        entry = self.table.get(key)
+        if entry is True or entry is False:
+            return entry
+        if entry is not None and entry >= depth:
+            return None
+        if depth <= 0:
+            return None
+
+        attacking = color == self.attacker
+        moves = self._moves(board, color)
+        best = self.best.get(key)
+        if best is not None and best in moves:
+            moves.remove(best)
+            moves.insert(0, best)
+
+        unknown = False
+        for point in moves:
+            if point == PASS:
+                # 停一手後劫已解除，對方可以提回；搜索完恢復原來的劫
+                ko = board.ko
+                board.ko = -1
+                try:
+                    result = self._search(board, opponent(color), depth - 1)
+                finally:
+                    board.ko = ko
+            else:
+                # 先檢查是否合法，不合法的著手不必複製盤面
+                try:
+                    board._check_point(point, color)
+                except IllegalMove:
+                    continue
+                child = board.copy()
+                child.play_point(point, color)
+                if attacking and self._captured(child):
+                    result = True
+                elif not attacking and self._alive(child):
+                    result = False
+                else:
+                    result = self._search(child, opponent(color), depth - 1)
+
+            if result is attacking:
+                self.table[key] = result
+                self.best[key] = point
+                return result
+            if result is None:
+                unknown = True
+
+        if unknown:
+            self.table[key] = depth
+            return None
+        # 所有著手都失敗；攻方無處可下時守方成功
+        self.table[key] = not attacking
+        return not attacking
+
+    def _outcome(self, attacker_wins):
+        if attacker_wins is None:
+            return UNKNOWN
+        return SUCCESS if attacker_wins == (self.player == self.attacker) else FAILURE
+
+    def solve(self, board=None, color=None):
+        """求解局面，返回 (先走方的結果, 輪到的一方的取勝著手)
+
+        默認求解初始局面。取勝著手為 'Bcd' 形式，停一手或沒有取勝著手時為 None。
+        """
+        if board is None:
+            board = self.board
+        if color is None:
+            color = self.player
+        if self.target is None:
+            return UNKNOWN, None
+        if self._captured(board):
+            return self._outcome(True), None
+        if self._alive(board):
+            return self._outcome(False), None
+
+        # 每次求解的節點數上限分別計算，置換表則繼續共用
+        self.nodes = 0
+        result = None
+        try:
+            for depth in range(2, self.max_depth + 1, 2):
+                result = self._search(board, color, depth)
+                if result is not None:
+                    break
+        except _BudgetExceeded:
+            result = None
+        if result is None:
+            return UNKNOWN, None
+
+        move = None
+        if result is (color == self.attacker):
+            point = self.best.get((board.hash, color, board.ko))
+            if point is not None and point != PASS:
+                x, y = board.coords(point)
+                move = f"{COLOR_NAMES[color]}{chr(x + 97)}{chr(y + 97)}"
+        return self._outcome(result), move
+
+    def check_answer(self, answer):
+        """重放答案後求解，返回 (先走方的結果, 輪到的一方的取勝著手)
+
+        答案中有不合法的著手時結果為 UNKNOWN。
+        """
+        board = self.board.copy()
+        color = self.player
+        for move in answer.moves:
+            try:
+                board.play_move(move)
+            except IllegalMove:
+                return UNKNOWN, None
+            color = opponent(COLOR_CHARS[move[0]])
+            if self.target is not None and self._captured(board):
+                return self._outcome(True), None
+        return self.solve(board, color)
+
+def check_problem(problem, **options):
+    """核對題目的所有答案
+
+    返回 [(答案序號, 問題類型, 說明, 建議的答案), ...]，建議的答案為修正類型
+    並補上懲罰應手後的 Answer。options 傳給 Solver。
+    """
+    solver = Solver(problem, **options)
+    issues = []
+    for index, answer in enumerate(problem.answers):
+        if answer.type not in ('+', '-'):
+            continue
+        outcome, move = solver.check_answer(answer)
+        if answer.type == '+' and outcome == FAILURE:
+            message = "正確答案被推翻"
+            moves = answer.moves
+            if move is not None:
+                message += f"，對方應以 {move}"
+                moves += (move,)
+            issues.append((index, REFUTED, message, Answer('-', moves, answer.comment)))
+        elif answer.type == '-' and outcome == SUCCESS:
+            issues.append((index, WRONG_IS_CORRECT, "錯誤答案實際上成功",
+                           Answer('+', answer.moves, answer.comment)))
+        elif answer.type == '-' and outcome == FAILURE and move is not None \
+                and COLOR_CHARS[move[0]] != solver.player:
+            issues.append((index, MISSING_REFUTATION, f"錯誤答案缺少應手 {move}",
+                           Answer('-', answer.moves + (move,), answer.comment)))
+    return issues
+
+def format_issue(problem_key, issue):
+    """將問題格式化為一行說明"""
+    index, _, message, _ = issue
+    return f"{problem_key} 答案 {index + 1} {message}"
+
+def _solve_batch(task):
+    """求解一批行，返回 (文件路徑, 題目數, [(行號, 題目, 問題列表), ...])"""
+    file_path, options, lines = task
+    checked = 0
+    results = []
+    for line_no, line in lines:
+        try:
+            problem = parse_line(line, strict=False)
+        except Exception:
+            continue
+        checked += 1
+        issues = check_problem(problem, **options)
+        if issues:
+            results.append((line_no, problem, issues))
+    return file_path, checked, results
+
+def solve_files(input_files, workers=None, batch_lines=DEFAULT_BATCH_LINES, **options):
+    """並行核對多個 SHF 文件中的答案
+
+    按文件和行號順序逐批產出 (文件路徑, 本批題目數, [(行號, 題目, 問題列表), ...])，
+    無法解析的行不計入題目數。options 傳給 Solver。
+    """
+    tasks = (
+        (file_path, options, batch)
+        for file_path in input_files
+        for batch in iter_line_batches(file_path, batch_lines)
+    )
+    return imap_ordered(_solve_batch, tasks, workers)
@@ -0,0 +1,222 @@
+"""局面的對稱規範化
+
+死活題集中常有同一道題目經過旋轉、鏡像或黑白互換後重複出現。本模組對局面
+的 8 種棋盤對稱變換和黑白互換共 16 種變換分別計算 Zobrist 哈希，取最小值作為
+規範鍵，並返回從原局面到規範形式所用的變換，用其逆變換即可還原原題。
+
+變換編號 0 到 15：低 3 位為棋盤對稱變換，第 4 位表示黑白互換。
+批量計算時若已安裝 numpy 則使用查表和向量化異或，否則逐題計算。
+"""
+from array import array
+
+from shf_tools.core.parser import Answer, Problem
+from shf_tools.core.zobrist import (BLACK_KEYS, WHITE_KEYS, WHITE_TO_MOVE_KEY,
+                                    size_key)
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+TRANSFORM_COUNT = 16
+COLOR_SWAP = 8
+
+# 棋盤對稱變換的逆變換：順時針 90 度與 270 度互逆，其餘變換的逆是自身
+_DIHEDRAL_INVERSE = (0, 3, 2, 1, 4, 5, 6, 7)
+
+_SWAP_COLOR = {'B': 'W', 'W': 'B'}
+
+def transform_coords(x, y, size, transform):
+    """對座標做棋盤對稱變換（黑白互換不影響座標）"""
+    last = size - 1
+    dihedral = transform & 7
+    if dihedral == 0:
+        return x, y
+    if dihedral == 1:
+        return y, last - x
+    if dihedral == 2:
+        return last - x, last - y
+    if dihedral == 3:
+        return last - y, x
+    if dihedral == 4:
+        return last - x, y
+    if dihedral == 5:
+        return x, last - y
+    if dihedral == 6:
+        return y, x
+    return last - y, last - x
+
+def inverse(transform):
+    """返回逆變換"""
+    return _DIHEDRAL_INVERSE[transform & 7] | (transform & COLOR_SWAP)
+
+def transform_stone(stone, size, transform):
+    """變換 'Bcd' 形式的棋子"""
+    x, y = transform_coords(ord(stone[1]) - 97, ord(stone[2]) - 97, size, transform)
+    color = _SWAP_COLOR[stone[0]] if transform & COLOR_SWAP else stone[0]
+    return f"{color}{chr(97 + x)}{chr(97 + y)}"
+
+def transform_problem(problem, transform):
+    """返回變換後的 Problem，答案中的著手同時變換"""
+    size = problem.size
+    return Problem(
+        problem.level, problem.id, size,
+        tuple(transform_stone(stone, size, transform) for stone in problem.stones),
+        problem.initial_comment,
+        tuple(
+            Answer(
+                answer.type,
+                tuple(transform_stone(move, size, transform) for move in answer.moves),
+                answer.comment,
+            )
+            for answer in problem.answers
+        )
+    )
+
+_KEY_TABLES = {}
+
+def _key_table(size):
+    """返回 [變換][打包的點] 對應的 Zobrist 鍵表
+
+    打包的點與 CompactProblem.points 的編碼相同：(x * 19 + y) << 1 | 顏色。
+    """
+    table = _KEY_TABLES.get(size)
+    if table is None:
+        table = []
+        for transform in range(TRANSFORM_COUNT):
+            keys = [0] * (19 * 19 * 2)
+            for x in range(size):
+                for y in range(size):
+                    tx, ty = transform_coords(x, y, size, transform)
+                    point = tx * 19 + ty
+                    black, white = BLACK_KEYS[point], WHITE_KEYS[point]
+                    if transform & COLOR_SWAP:
+                        black, white = white, black
+                    keys[(x * 19 + y) << 1] = black
+                    keys[(x * 19 + y) << 1 | 1] = white
+            table.append(keys)
+        _KEY_TABLES[size] = table
+    return table
+
+def _encode(stone):
+    return ((ord(stone[1]) - 97) * 19 + ord(stone[2]) - 97) << 1 | (stone[0] == 'W')
+
+def _canonical_from_points(points, size, white_to_move):
+    """對打包的點計算 (規範鍵, 變換)"""
+    base = size_key(size)
+    best_key = None
+    best_transform = 0
+    for transform, keys in enumerate(_key_table(size)):
+        value = base
+        for point in points:
+            value ^= keys[point]
+        if white_to_move != bool(transform & COLOR_SWAP):
+            value ^= WHITE_TO_MOVE_KEY
+        if best_key is None or value < best_key:
+            best_key = value
+            best_transform = transform
+    return best_key, best_transform
+
+def canonical_key(stones, size, to_move='B'):
+    """返回 'Bcd' 形式棋子列表的 (規範鍵, 變換)
+
+    規範鍵為無符號 64 位整數；對原局面做該變換即得到規範形式。
+    """
+    points = [_encode(stone) for stone in set(stones)]
+    return _canonical_from_points(points, size, to_move == 'W')
+
+def canonicalize(problem):
+    """返回 (規範形式的 Problem, 變換)，對結果做 inverse(變換) 即可還原原題"""
+    _, transform = canonical_key(problem.stones, problem.size, problem.to_move)
+    return transform_problem(problem, transform), transform
+
+def _stone_points(problem):
+    """CompactProblem 的初始棋子，重複的棋子只保留一個"""
+    points = problem.points[:problem.stone_count]
+    if len(set(points)) != len(points):
+        points = array('H', sorted(set(points)))
+    return points
+
+def _white_to_move(problem):
+    """CompactProblem 的第一個答案是否由白方先走"""
+    if problem.answer_ends and problem.answer_ends[0] >> 2 > problem.stone_count:
+        return bool(problem.points[problem.stone_count] & 1)
+    return False
+
+def canonical_keys(problems):
+    """批量計算 CompactProblem 序列的規範鍵和變換
+
+    安裝了 numpy 時返回 (uint64 數組, uint8 數組)，否則返回兩個列表。
+    """
+    if not isinstance(problems, (list, tuple)):
+        problems = list(problems)
+    if np is None:
+        keys = []
+        transforms = []
+        for problem in problems:
+            key, transform = _canonical_from_points(
+                _stone_points(problem), problem.size, _white_to_move(problem))
+            keys.append(key)
+            transforms.append(transform)
+        return keys, transforms
+    return _canonical_keys_numpy(problems)
+
+def _canonical_keys_numpy(problems):
+    count = len(problems)
+    keys = np.zeros(count, dtype=np.uint64)
+    transforms = np.zeros(count, dtype=np.uint8)
+    if not count:
+        return keys, transforms
+
+    sizes = np.fromiter(
+        (problem.size for problem in problems), dtype=np.int64, count=count)
+    white_to_move = np.fromiter(
+        (_white_to_move(problem) for problem in problems), dtype=bool, count=count)
+    # 將所有題目的初始棋子拼接為一個數組，按題目分段異或
+    stone_points = [_stone_points(problem) for problem in problems]
+    stone_counts = np.fromiter(map(len, stone_points), dtype=np.int64, count=count)
+    points = np.frombuffer(b''.join(p.tobytes() for p in stone_points), dtype=np.uint16)
+    starts = np.zeros(count, dtype=np.int64)
+    np.cumsum(stone_counts[:-1], out=starts[1:])
+    has_stones = stone_counts > 0
+
+    # 每種變換下黑白互換時輪到的一方也互換
+    swap = (np.arange(TRANSFORM_COUNT) & COLOR_SWAP).astype(bool)
+    turn_key = np.uint64(WHITE_TO_MOVE_KEY)
+
+    for size in np.unique(sizes):
+        size = int(size)
+        selected = np.nonzero(sizes == size)[0]
+        table = np.array(_key_table(size), dtype=np.uint64)
+
+        # (變換數, 題目數) 的哈希矩陣
+        hashes = np.full((TRANSFORM_COUNT, len(selected)), np.uint64(size_key(size)),
+                         dtype=np.uint64)
+        with_stones = selected[has_stones[selected]]
+        if len(with_stones):
+            # 只取這些題目的棋子，並計算它們在拼接數組中的分段起點
+            counts = stone_counts[with_stones]
+            local_starts = np.zeros(len(with_stones), dtype=np.int64)
+            np.cumsum(counts[:-1], out=local_starts[1:])
+            index = np.repeat(starts[with_stones] - local_starts, counts)
+            index += np.arange(counts.sum())
+            stone_keys = table[:, points[index]]
+            column = np.searchsorted(selected, with_stones)
+            hashes[:, column] ^= np.bitwise_xor.reduceat(
+                stone_keys, local_starts, axis=1)
+
+        turn = white_to_move[selected][np.newaxis, :] != swap[:, np.newaxis]
+        hashes ^= np.where(turn, turn_key, np.uint64(0))
+
+        best = np.argmin(hashes, axis=0)
+        keys[selected] = hashes[best, np.arange(len(selected))]
+        transforms[selected] = best
+    return keys, transforms
+
+def group_by_canonical_key(problems):
+    """按規範鍵分組，返回 {規範鍵: [題目序號, ...]}"""
+    keys, _ = canonical_keys(problems)
+    groups = {}
+    for index, key in enumerate(keys.tolist() if np is not None else keys):
+        groups.setdefault(key, []).append(index)
+    return groups
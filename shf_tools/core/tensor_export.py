@@ -0,0 +1,245 @@
+"""將題庫導出為 NumPy 張量，供機器學習訓練使用
+
+每道題目轉換為 PLANE_COUNT × 19 × 19 的 uint8 特徵平面：
+
+    0  黑棋
+    1  白棋
+    2  輪到黑棋時全為 1
+    3  棋盤範圍（小於 19 路的棋盤只有左上角為 1）
+
+以及一個 19 × 19 的標籤平面，正確答案（+）的第一手為 1。平面按 [y, x] 索引，
+即行為座標的第二個字母、列為第一個字母。
+
+題目按塊讀入 CompactProblem，再以打包的點一次性散佈到張量中，不逐顆擺放棋子。
+特徵和標籤直接寫入以 open_memmap 打開的 .npy 文件，內存佔用只與塊大小有關。
+"""
+import os
+import ast
+import logging
+import sqlite3
+
+from shf_tools.core.compact import CompactProblem
+from shf_tools.core.exporter import count_games, iter_game_records
+from shf_tools.core.parser import iter_problems
+from shf_tools.core.schema import upgrade_schema
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+logger = logging.getLogger(__name__)
+
+BOARD_SIZE = 19
+PLANE_COUNT = 4
+BLACK_PLANE, WHITE_PLANE, TO_MOVE_PLANE, MASK_PLANE = range(PLANE_COUNT)
+
+# 每次散佈到張量中的題目數
+DEFAULT_CHUNK_SIZE = 65536
+
+def _require_numpy():
+    if np is None:
+        raise ImportError("導出張量需要安裝 numpy：pip install numpy")
+
+def problems_to_arrays(problems):
+    """將 CompactProblem 列表轉換為 (特徵平面, 標籤平面, 元數據字典)"""
+    _require_numpy()
+    count = len(problems)
+    planes = np.zeros((count, PLANE_COUNT, BOARD_SIZE, BOARD_SIZE), dtype=np.uint8)
+    labels = np.zeros((count, BOARD_SIZE, BOARD_SIZE), dtype=np.uint8)
+    meta = {
+        'size': np.fromiter(
+            (p.size for p in problems), dtype=np.uint8, count=count),
+        'level_code': np.fromiter(
+            (p.level_code for p in problems), dtype=np.uint8, count=count),
+        'number': np.fromiter(
+            (p.number for p in problems), dtype=np.uint32, count=count),
+    }
+    if not count:
+        return planes, labels, meta
+
+    # 初始棋子：拼接所有題目的打包點，按題目序號散佈
+    stone_counts = np.fromiter(
+        (p.stone_count for p in problems), dtype=np.int64, count=count)
+    points = np.frombuffer(b''.join(
+        p.points[:p.stone_count].tobytes() for p in problems
+    ), dtype=np.uint16).astype(np.int64)
+    owners = np.repeat(np.arange(count), stone_counts)
+    x, y = np.divmod(points >> 1, BOARD_SIZE)
+    planes[owners, points & 1, y, x] = 1
+
+    # 正確答案的第一手和輪到的一方
+    label_owners = []
+    label_points = []
+    white_to_move = np.zeros(count, dtype=bool)
+    for index, problem in enumerate(problems):
+        start = problem.stone_count
+        for position, packed in enumerate(problem.answer_ends):
+            end = packed >> 2
+            if end > start:
+                if position == 0:
+                    white_to_move[index] = bool(problem.points[start] & 1)
+                if packed & 3 == 0:
+                    label_owners.append(index)
+                    label_points.append(problem.points[start])
+            start = end
+    if label_owners:
+        label_points = np.array(label_points, dtype=np.int64)
+        x, y = np.divmod(label_points >> 1, BOARD_SIZE)
+        labels[np.array(label_owners), y, x] = 1
+
+    planes[~white_to_move, TO_MOVE_PLANE] = 1
+    for size in np.unique(meta['size']):
+        size = int(size)
+        planes[meta['size'] == size, MASK_PLANE, :size, :size] = 1
+    return planes, labels, meta
+
+def _is_database(path):
+    return path.lower().endswith('.db')
+
+def _count_problems(path):
+    """題目數上限：數據庫按題目數計，SHF 文件按非空、非註釋行計"""
+    if _is_database(path):
+        conn = sqlite3.connect(path)
+        try:
+            upgrade_schema(conn)
+            return count_games(conn)
+        finally:
+            conn.close()
+
+    total = 0
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                total += 1
+    return total
+
+def _iter_database_problems(path):
+    conn = sqlite3.connect(path)
+    try:
+        for game_data in iter_game_records(conn):
+            yield CompactProblem.from_dict(game_data)
+    finally:
+        conn.close()
+
+def _iter_file_problems(path):
+    for line_no, problem, error in iter_problems(path, strict=False):
+        if error is None:
+            try:
+                yield CompactProblem.from_problem(problem)
+                continue
+            except ValueError as e:
+                error = e
+        logger.warning(f"{path} 第 {line_no} 行無法導出: {str(error)}")
+
+def _shrink_npy(path, rows):
+    """把 .npy 文件的第一維縮小為 rows，並截去多餘的數據"""
+    with open(path, 'r+b') as f:
+        version = np.lib.format.read_magic(f)
+        header_start = f.tell()
+        if version == (1, 0):
+            shape, _, dtype = np.lib.format.read_array_header_1_0(f)
+        else:
+            shape, _, dtype = np.lib.format.read_array_header_2_0(f)
+        data_start = f.tell()
+
+        # 以相同長度重寫文件頭，數據的起始位置不變
+        length_size = 2 if version == (1, 0) else 4
+        header_length = data_start - header_start - length_size
+        new_shape = (rows,) + tuple(shape[1:])
+        f.seek(header_start + length_size)
+        header = ast.literal_eval(f.read(header_length).decode('latin1').strip())
+        header['shape'] = new_shape
+        header = repr(header).encode('latin1')
+        header = header + b' ' * (header_length - len(header) - 1) + b'\n'
+        f.seek(header_start + length_size)
+        f.write(header)
+
+        row_bytes = dtype.itemsize
+        for dimension in shape[1:]:
+            row_bytes *= dimension
+        f.truncate(data_start + rows * row_bytes)
+
+def export_tensors(inputs, output_prefix, chunk_size=DEFAULT_CHUNK_SIZE, npz=False,
+                   log=None):
+    """將 SHF 文件或數據庫導出為張量文件，返回導出的題目數
+
+    寫出 <前綴>_planes.npy、<前綴>_labels.npy 和 <前綴>_meta.npz；
+    npz 為 True 時再把所有數組打包為壓縮的 <前綴>.npz。
+    """
+    _require_numpy()
+    if isinstance(inputs, str):
+        inputs = [inputs]
+
+    for path in inputs:
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"找不到輸入文件：{path}")
+    capacity = sum(_count_problems(path) for path in inputs)
+
+    output_dir = os.path.dirname(output_prefix)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    planes_path = f"{output_prefix}_planes.npy"
+    labels_path = f"{output_prefix}_labels.npy"
+    planes = np.lib.format.open_memmap(
+        planes_path, mode='w+', dtype=np.uint8,
+        shape=(capacity, PLANE_COUNT, BOARD_SIZE, BOARD_SIZE))
+    labels = np.lib.format.open_memmap(
+        labels_path, mode='w+', dtype=np.uint8,
+        shape=(capacity, BOARD_SIZE, BOARD_SIZE))
+    meta = {'size': [], 'level_code': [], 'number': []}
+
+    written = 0
+
+    def flush(chunk):
+        nonlocal written
+        chunk_planes, chunk_labels, chunk_meta = problems_to_arrays(chunk)
+        planes[written:written + len(chunk)] = chunk_planes
+        labels[written:written + len(chunk)] = chunk_labels
+        for name, values in chunk_meta.items():
+            meta[name].append(values)
+        written += len(chunk)
+        message = f"已導出 {written} 道題目"
+        logger.info(message)
+        if log is not None:
+            log(message)
+
+    for path in inputs:
+        if _is_database(path):
+            problems = _iter_database_problems(path)
+        else:
+            problems = _iter_file_problems(path)
+        chunk = []
+        for problem in problems:
+            if written + len(chunk) >= capacity:
+                break
+            chunk.append(problem)
+            if len(chunk) >= chunk_size:
+                flush(chunk)
+                chunk = []
+        if chunk:
+            flush(chunk)
+
+    planes.flush()
+    labels.flush()
+    del planes, labels
+    if written < capacity:
+        # 無法解析的行不佔位置
+        _shrink_npy(planes_path, written)
+        _shrink_npy(labels_path, written)
+
+    meta = {
+        name: np.concatenate(values) if values else np.zeros(0, dtype=np.uint32)
+        for name, values in meta.items()
+    }
+    np.savez(f"{output_prefix}_meta.npz", **meta)
+
+    if npz:
+        np.savez_compressed(
+            f"{output_prefix}.npz",
+            planes=np.load(planes_path, mmap_mode='r'),
+            labels=np.load(labels_path, mmap_mode='r'),
+            **meta
+        )
+    return written
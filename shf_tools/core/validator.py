@@ -0,0 +1,91 @@
+"""基於複盤的題目語義檢查
+
+parse_line 只檢查語法。本模組在 BoardState 上擺出每道題目的初始局面，
+再逐個重放所有答案序列，報告落在已有棋子上的著手、自殺、違反劫爭的提回、
+黑白沒有交替的著手，以及超出棋盤範圍的座標。
+
+大型題庫按行分批交給進程池並行檢查，結果按文件中的順序產出。
+"""
+from shf_tools.core.board import BoardState, IllegalMove, COLOR_CHARS
+from shf_tools.core.parallel import imap_ordered, iter_line_batches
+from shf_tools.core.parser import parse_line
+
+# 每批交給子進程檢查的行數
+DEFAULT_BATCH_LINES = 2000
+
+# 問題類型，除 board 模組中的落子原因外還有以下幾種
+SETUP = 'setup'
+COLOR = 'color'
+SYNTAX = 'syntax'
+
+def _setup_board(problem, issues):
+    """擺出初始局面，出錯的棋子記錄為 SETUP 問題"""
+    board = BoardState(problem.size)
+    for stone in problem.stones:
+        try:
+            board.play_move(stone)
+        except IllegalMove as e:
+            issues.append((None, None, SETUP, f"初始棋子 {stone} 無法擺放：{e}"))
+    board.ko = -1
+    return board
+
+def validate_problem(problem):
+    """重放題目的所有答案，返回問題列表
+
+    每個問題為 (答案序號, 手數序號, 類型, 說明)，序號從 0 開始，
+    初始局面的問題序號為 None。每個答案遇到第一手不合法的著手後即停止重放。
+    """
+    issues = []
+    initial = _setup_board(problem, issues)
+
+    for answer_index, answer in enumerate(problem.answers):
+        board = initial.copy()
+        previous_color = None
+        for move_index, move in enumerate(answer.moves):
+            color = COLOR_CHARS[move[0]]
+            if color == previous_color:
+                issues.append((answer_index, move_index, COLOR, f"{move} 與上一手顏色相同"))
+            previous_color = color
+
+            try:
+                board.play_move(move)
+            except IllegalMove as e:
+                issues.append((answer_index, move_index, e.reason, f"{move} 不合法：{e}"))
+                break
+    return issues
+
+def format_issue(problem_key, issue):
+    """將問題格式化為一行說明"""
+    answer_index, move_index, _, message = issue
+    if answer_index is None:
+        return f"{problem_key} {message}"
+    return f"{problem_key} 答案 {answer_index + 1} 第 {move_index + 1} 手 {message}"
+
+def _validate_batch(task):
+    """檢查一批行，返回 (文件路徑, 題目數, [(行號, 類型, 說明), ...])"""
+    file_path, strict, lines = task
+    checked = 0
+    results = []
+    for line_no, line in lines:
+        try:
+            problem = parse_line(line, strict)
+        except Exception as e:
+            results.append((line_no, SYNTAX, str(e)))
+            continue
+        checked += 1
+        for issue in validate_problem(problem):
+            results.append((line_no, issue[2], format_issue(problem.key, issue)))
+    return file_path, checked, results
+
+def validate_files(input_files, strict=False, workers=None,
+                   batch_lines=DEFAULT_BATCH_LINES):
+    """並行檢查多個 SHF 文件
+
+    按文件和行號順序逐批產出 (文件路徑, 本批題目數, [(行號, 類型, 說明), ...])。
+    """
+    tasks = (
+        (file_path, strict, batch)
+        for file_path in input_files
+        for batch in iter_line_batches(file_path, batch_lines)
+    )
+    return imap_ordered(_validate_batch, tasks, workers)
@@ -0,0 +1,97 @@
+"""局面的 Zobrist 哈希
+
+每個 (顏色, 點) 對應一個固定的 64 位隨機數，局面的哈希是所有棋子對應隨機數的異或，
+再異或上棋盤大小和輪到白棋時的鍵。隨機數由固定種子生成，不同進程和不同時間
+算出的哈希一致，可以寫入數據庫並用於查找重複題目。
+
+隨機數表按 19 路盤的 x * 19 + y 編號，小棋盤使用其左上角部分，
+同一座標在不同大小的棋盤上對應同一個隨機數，棋盤大小由單獨的鍵區分。
+"""
+import random
+
+ZOBRIST_SEED = 0x5348465A  # "SHFZ"
+
+_MAX_SIZE = 19
+
+def _build_tables():
+    rng = random.Random(ZOBRIST_SEED)
+    black = tuple(rng.getrandbits(64) for _ in range(_MAX_SIZE * _MAX_SIZE))
+    white = tuple(rng.getrandbits(64) for _ in range(_MAX_SIZE * _MAX_SIZE))
+    size_keys = {size: rng.getrandbits(64) for size in (9, 13, 19)}
+    white_to_move = rng.getrandbits(64)
+    return black, white, size_keys, white_to_move
+
+BLACK_KEYS, WHITE_KEYS, SIZE_KEYS, WHITE_TO_MOVE_KEY = _build_tables()
+
+# 以 'Bcd' 形式的棋子為鍵的查找表，避免在熱路徑上計算座標
+STONE_KEYS = {}
+for _x in range(_MAX_SIZE):
+    for _y in range(_MAX_SIZE):
+        _coord = chr(97 + _x) + chr(97 + _y)
+        STONE_KEYS['B' + _coord] = BLACK_KEYS[_x * _MAX_SIZE + _y]
+        STONE_KEYS['W' + _coord] = WHITE_KEYS[_x * _MAX_SIZE + _y]
+del _x, _y, _coord
+
+_POINT_KEYS = {}
+
+def point_keys(size):
+    """返回按 x * size + y 編號的 (黑棋鍵, 白棋鍵) 表，供 BoardState 增量更新使用"""
+    keys = _POINT_KEYS.get(size)
+    if keys is None:
+        indexes = [x * _MAX_SIZE + y for x in range(size) for y in range(size)]
+        black = tuple(BLACK_KEYS[index] for index in indexes)
+        white = tuple(WHITE_KEYS[index] for index in indexes)
+        keys = _POINT_KEYS[size] = (black, white)
+    return keys
+
+def size_key(size):
+    """返回棋盤大小對應的鍵"""
+    try:
+        return SIZE_KEYS[size]
+    except KeyError:
+        raise ValueError(f"不支持的棋盤大小：{size}")
+
+def position_hash(stones, size, to_move='B'):
+    """計算 'Bcd' 形式棋子列表的局面哈希（無符號 64 位）"""
+    value = size_key(size)
+    for stone in set(stones):
+        value ^= STONE_KEYS[stone]
+    if to_move == 'W':
+        value ^= WHITE_TO_MOVE_KEY
+    return value
+
+def to_signed64(value):
+    """將無符號 64 位整數轉換為 SQLite INTEGER 可以保存的有符號整數"""
+    return value - (1 << 64) if value >= (1 << 63) else value
+
+def to_unsigned64(value):
+    """將有符號 64 位整數還原為無符號整數"""
+    return value & 0xFFFFFFFFFFFFFFFF
+
+def position_key(stones, size, to_move='B'):
+    """返回寫入數據庫的局面鍵（有符號 64 位）"""
+    return to_signed64(position_hash(stones, size, to_move))
+
+def first_mover(answer_moves):
+    """由第一個答案的著手字符串推斷輪到哪一方，無法判斷時為黑方"""
+    return 'W' if answer_moves[:1] == 'W' else 'B'
+
+def find_duplicate_positions(conn, min_count=2):
+    """查找數據庫中局面相同的題目
+
+    以 (局面鍵, [(級別, ID), ...]) 的形式按出現次數從多到少產出。
+    """
+    groups = conn.execute("""
+        SELECT position_key, COUNT(*) AS n
+        FROM games
+        WHERE position_key IS NOT NULL
+        GROUP BY position_key
+        HAVING n >= ?
+        ORDER BY n DESC, position_key
+    """, (min_count,)).fetchall()
+    for key, _ in groups:
+        members = conn.execute(
+            "SELECT level, id FROM games WHERE position_key = ? ORDER BY game_id",
+            (key,)
+        ).fetchall()
+        yield key, members
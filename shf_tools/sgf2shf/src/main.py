@@ -6,8 +6,12 @@ from pathlib import Path
 from PyQt6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
                             QHBoxLayout, QFileDialog, QPushButton, QTextEdit,
                             QLabel, QMessageBox, QRadioButton, QButtonGroup)
-from PyQt6.QtCore import Qt
-from sgf2shf import convert_sgf_to_shf
+from PyQt6.QtCore import Qt, QThread, pyqtSignal
+import multiprocessing
+
+# 以腳本方式運行時，將倉庫根目錄加入搜索路徑以導入共用的 shf_tools 套件
+sys.path.insert(0, str(Path(__file__).resolve().parents[3]))
+from sgf2shf import convert_sgf_to_shf, find_sgf_files, convert_files_parallel
 
 def setup_logging():
     try:
@@ -44,6 +48,45 @@ def setup_logging():
 
 logger = setup_logging()
 
+class ConversionWorker(QThread):
+    """在後台使用進程池批量轉換文件夾的工作線程"""
+    log_message = pyqtSignal(str)
+    conversion_finished = pyqtSignal(int, int)  # 成功數、失敗數
+    error_occurred = pyqtSignal(str, str)
+
+    def __init__(self, sgf_files, input_folder, output_folder, workers=None):
+        super().__init__()
+        self.sgf_files = sgf_files
+        self.input_folder = input_folder
+        self.output_folder = output_folder
+        self.workers = workers
+
+    def run(self):
+        try:
+            success_count = 0
+            error_count = 0
+            
+            results = convert_files_parallel(
+                self.sgf_files, self.input_folder, self.output_folder, self.workers
+            )
+            for rel_path, output_file, error in results:
+                if error is None:
+                    success_count += 1
+                    self.log_message.emit(f"成功轉換: {rel_path}")
+                    logger.info(f"成功轉換: {rel_path} -> {output_file}")
+                else:
+                    error_count += 1
+                    error_msg = f"轉換失敗 {rel_path}: {error}"
+                    self.log_message.emit(error_msg)
+                    logger.error(error_msg)
+                    
+            self.conversion_finished.emit(success_count, error_count)
+            
+        except Exception as e:
+            error_msg = f"批量轉換失敗: {str(e)}\n{traceback.format_exc()}"
+            logger.error(error_msg)
+            self.error_occurred.emit("轉換失敗", error_msg)
+
 class SGF2SHFConverter(QMainWindow):
     def __init__(self):
         try:
@@ -253,55 +296,46 @@ class SGF2SHFConverter(QMainWindow):
             os.makedirs(output_folder, exist_ok=True)
             
             # 獲取所有 SGF 文件
-            sgf_files = []
-            for root, _, files in os.walk(input_folder):
-                for file in files:
-                    if file.lower().endswith('.sgf'):
-                        sgf_files.append(os.path.join(root, file))
+            sgf_files = find_sgf_files(input_folder)
             
             if not sgf_files:
                 self.show_error("錯誤", "未找到任何 SGF 文件")
                 return
                 
-            # 轉換每個文件
-            success_count = 0
-            error_count = 0
+            self.log_display.append(f"找到 {len(sgf_files)} 個 SGF 文件，開始並行轉換...")
             
-            for sgf_file in sgf_files:
-                try:
-                    # 計算相對路徑以保持目錄結構
-                    rel_path = os.path.relpath(sgf_file, input_folder)
-                    output_file = os.path.join(output_folder, os.path.splitext(rel_path)[0] + '.shf')
-                    
-                    # 確保輸出文件的目錄存在
-                    os.makedirs(os.path.dirname(output_file), exist_ok=True)
-                    
-                    # 轉換文件
-                    with open(sgf_file, 'r', encoding='utf-8') as f:
-                        sgf_content = f.read()
-                        
-                    result = convert_sgf_to_shf(sgf_content, os.path.basename(sgf_file))
-                    
-                    with open(output_file, 'w', encoding='utf-8') as f:
-                        f.write(result['shf_format'])
-                        
-                    success_count += 1
-                    self.log_display.append(f"成功轉換: {rel_path}")
-                    logger.info(f"成功轉換: {sgf_file} -> {output_file}")
-                    
-                except Exception as e:
-                    error_count += 1
-                    error_msg = f"轉換失敗 {rel_path}: {str(e)}"
-                    self.log_display.append(error_msg)
-                    logger.error(error_msg)
-                    
-            # 顯示結果
-            result_msg = f"轉換完成！\n成功: {success_count} 個文件\n失敗: {error_count} 個文件"
-            QMessageBox.information(self, "完成", result_msg)
+            # 轉換期間禁用按鈕
+            self.convert_button.setEnabled(False)
+            self.browse_button.setEnabled(False)
+            self.save_button.setEnabled(False)
+            
+            # 在後台線程中使用進程池轉換，避免阻塞界面
+            self.worker = ConversionWorker(sgf_files, input_folder, output_folder)
+            self.worker.log_message.connect(self.log_display.append)
+            self.worker.conversion_finished.connect(self.folder_conversion_finished)
+            self.worker.error_occurred.connect(self.folder_conversion_failed)
+            self.worker.start()
             
         except Exception as e:
             raise Exception(f"批量轉換失敗: {str(e)}")
             
+    def folder_conversion_finished(self, success_count, error_count):
+        """批量轉換完成的處理"""
+        self.convert_button.setEnabled(True)
+        self.browse_button.setEnabled(True)
+        self.save_button.setEnabled(True)
+        
+        # 顯示結果
+        result_msg = f"轉換完成！\n成功: {success_count} 個文件\n失敗: {error_count} 個文件"
+        QMessageBox.information(self, "完成", result_msg)
+        
+    def folder_conversion_failed(self, title, message):
+        """批量轉換出錯的處理"""
+        self.convert_button.setEnabled(True)
+        self.browse_button.setEnabled(True)
+        self.save_button.setEnabled(True)
+        self.show_error(title, message)
+            
     def show_error(self, title, message):
         """顯示錯誤對話框"""
         QMessageBox.critical(self, title, message)
@@ -335,4 +369,6 @@ def main():
         sys.exit(1)
 
 if __name__ == "__main__":
+    # 打包為可執行文件時，子進程需要此調用才能正確啟動
+    multiprocessing.freeze_support()
     main() 
\ No newline at end of file
@@ -3,10 +3,16 @@ import sgf
 import random
 import logging
 import os
+import multiprocessing
 import opencc
 
+from shf_tools.core.answer_tree import AnswerTree
+
 logger = logging.getLogger(__name__)
 
+# 批量轉換時每個任務塊的最大文件數
+MAX_CHUNK_SIZE = 64
+
 # 創建簡體到繁體轉換器
 converter = opencc.OpenCC('s2t')
 
@@ -155,42 +161,46 @@ def convert_sgf_to_shf(sgf_content, filename=None):
                 stone_color = 'B' if color == 'AB' else 'W'
                 initial_state.append(f"{stone_color}{pos.lower()}")
                 
-        # 處理變化和答案
-        answers = []
+        # 處理變化和答案：以前綴樹保存完整的變化樹，每條到葉節點的路徑是一個答案
+        tree = AnswerTree()
         
-        def collect_moves(variation, is_main=True):
-            moves = []
-            last_comment = ""
-            last_color = None  # 不預設顏色
-            
-            # 處理每個節點
-            for node in variation.nodes:
-                current_move = None
-                
-                # 獲取移動
-                if 'B' in node.properties:
-                    pos = node.properties['B'][0]
-                    if pos and re.match(r'^[a-s]{2}$', pos.lower()):
-                        current_move = f"B{pos.lower()}"
-                        last_color = 'B'
-                elif 'W' in node.properties:
-                    pos = node.properties['W'][0]
-                    if pos and re.match(r'^[a-s]{2}$', pos.lower()):
-                        current_move = f"W{pos.lower()}"
-                        last_color = 'W'
-                        
+        def node_move(node):
+            if 'B' in node.properties:
+                pos = node.properties['B'][0]
+                if pos and re.match(r'^[a-s]{2}$', pos.lower()):
+                    return f"B{pos.lower()}"
+            elif 'W' in node.properties:
+                pos = node.properties['W'][0]
+                if pos and re.match(r'^[a-s]{2}$', pos.lower()):
+                    return f"W{pos.lower()}"
+            return None
+        
+        def collect_moves(nodes, children, moves, last_comment, is_main=None):
+            """收集一段變化的著手，並遞歸處理其下的所有子變化
+
+            is_main 為 None 表示主線，其下第一個變化默認為正確答案，
+            其餘變化默認為錯誤答案；子變化沿用所屬頂層變化的默認類型。
+            """
+            moves = list(moves)
+            for node in nodes:
+                current_move = node_move(node)
                 if current_move:
                     moves.append(current_move)
                     
-                # 更新注釋並轉換為繁體
+                # 更新注釋並轉換為繁體，子變化沿用路徑上最後一條注釋
                 if 'C' in node.properties:
                     comment = node.properties['C'][0]
                     last_comment = convert_to_traditional(clean_comment(comment))
                     
+            if children:
+                for i, child in enumerate(children):
+                    collect_moves(child.nodes, child.children, moves, last_comment,
+                                  i == 0 if is_main is None else is_main)
+                return
+                
             if moves:
-                move_str = ','.join(moves)
                 # 根據注釋內容判斷答案類型
-                answer_type = '+' if is_main else '-'  # 默認
+                answer_type = '+' if is_main is not False else '-'  # 默認
                 if last_comment:
                     if '正确' in last_comment or '正確' in last_comment:
                         answer_type = '+'
@@ -198,13 +208,16 @@ def convert_sgf_to_shf(sgf_content, filename=None):
                         answer_type = '-'
                     elif '变化' in last_comment or '變化' in last_comment:
                         answer_type = '/'
-                    answers.append(f"{answer_type}{move_str}#{last_comment}")
-                else:
-                    answers.append(f"{answer_type}{move_str}")
+                tree.add(answer_type, moves, last_comment)
                     
-        # 處理所有變化
-        for i, variation in enumerate(game.children):
-            collect_moves(variation, i == 0)
+        # 根節點之後的主線著手是所有變化的共同前綴
+        collect_moves(game.nodes[1:], game.children, [], "")
+        
+        answers = [
+            f"{answer.type}{','.join(answer.moves)}#{answer.comment}" if answer.comment
+            else f"{answer.type}{','.join(answer.moves)}"
+            for answer in tree.to_answers()
+        ]
             
         # 構建 SHF 格式
         parts = [
@@ -224,7 +237,8 @@ def convert_sgf_to_shf(sgf_content, filename=None):
             'size': board_size,
             'initial_state': initial_state,
             'initial_comment': initial_comment,
-            'answers': answers
+            'answers': answers,
+            'answer_tree': tree
         }
         
     except Exception as e:
@@ -232,6 +246,71 @@ def convert_sgf_to_shf(sgf_content, filename=None):
         logger.error(f"SGF內容: {sgf_content}")
         raise ValueError(f"SGF轉換失敗: {str(e)}")
 
+def find_sgf_files(input_folder):
+    """遞歸查找文件夾中的所有 SGF 文件"""
+    sgf_files = []
+    for root, _, files in os.walk(input_folder):
+        for file in files:
+            if file.lower().endswith('.sgf'):
+                sgf_files.append(os.path.join(root, file))
+    sgf_files.sort()
+    return sgf_files
+
+def convert_sgf_file(sgf_file, input_folder, output_folder):
+    """轉換文件夾中的一個 SGF 文件，輸出時保持相對目錄結構
+
+    返回 (相對路徑, 輸出文件, 錯誤信息)，成功時錯誤信息為 None。
+    """
+    rel_path = os.path.relpath(sgf_file, input_folder)
+    try:
+        output_name = os.path.splitext(rel_path)[0] + '.shf'
+        output_file = os.path.join(output_folder, output_name)
+        
+        # 確保輸出文件的目錄存在
+        os.makedirs(os.path.dirname(output_file), exist_ok=True)
+        
+        with open(sgf_file, 'r', encoding='utf-8') as f:
+            sgf_content = f.read()
+            
+        result = convert_sgf_to_shf(sgf_content, os.path.basename(sgf_file))
+        
+        with open(output_file, 'w', encoding='utf-8') as f:
+            f.write(result['shf_format'])
+            
+        return rel_path, output_file, None
+    except Exception as e:
+        return rel_path, None, str(e)
+
+def _convert_sgf_task(args):
+    """進程池任務入口，必須位於模組頂層才能被序列化"""
+    return convert_sgf_file(*args)
+
+def convert_files_parallel(sgf_files, input_folder, output_folder, workers=None,
+                           chunksize=None):
+    """使用進程池並行轉換 SGF 文件，按輸入順序逐個產出結果
+
+    每個結果與 convert_sgf_file 的返回值相同。文件按塊分發給子進程，
+    workers 默認為 CPU 核心數，為 1 時在當前進程中順序轉換。
+    """
+    tasks = [(sgf_file, input_folder, output_folder) for sgf_file in sgf_files]
+    if not tasks:
+        return
+        
+    workers = workers or os.cpu_count() or 1
+    workers = min(workers, len(tasks))
+    if workers == 1:
+        for task in tasks:
+            yield _convert_sgf_task(task)
+        return
+        
+    if chunksize is None:
+        # 每個進程至少分到幾個塊，以便負載均衡
+        chunksize = max(1, min(MAX_CHUNK_SIZE, len(tasks) // (workers * 4)))
+        
+    with multiprocessing.Pool(workers) as pool:
+        for result in pool.imap(_convert_sgf_task, tasks, chunksize):
+            yield result
+
 if __name__ == "__main__":
     # 測試用例
     test_sgf = """(;GM[1]FF[4]CA[UTF-8]AP[GoGui:1.4.9]SZ[19]
@@ -5,10 +5,12 @@ import traceback
 from pathlib import Path
 from PyQt6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
                             QHBoxLayout, QFileDialog, QPushButton, QTextEdit,
-                            QLabel, QMessageBox, QProgressBar)
+                            QLabel, QMessageBox, QProgressBar, QCheckBox)
 from PyQt6.QtCore import Qt, QThread, pyqtSignal
-import sqlite3
-import re
+
+# 以腳本方式運行時，將倉庫根目錄加入搜索路徑以導入共用的 shf_tools 套件
+sys.path.insert(0, str(Path(__file__).resolve().parents[3]))
+from shf_tools.core.importer import DEFAULT_BATCH_SIZE, import_shf_files
 
 def setup_logging():
     try:
@@ -45,190 +47,6 @@ def setup_logging():
 
 logger = setup_logging()
 
-def setup_database(db_path):
-    """設置數據庫結構"""
-    try:
-        # 如果數據庫文件已存在，先刪除它
-        if os.path.exists(db_path):
-            os.remove(db_path)
-            
-        # 創建新的數據庫連接
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        
-        # 創建表
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS games (
-                id TEXT PRIMARY KEY,
-                level TEXT NOT NULL,
-                size INTEGER NOT NULL,
-                initial_comment TEXT
-            )
-        """)
-        
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS initial_positions (
-                game_id TEXT,
-                color TEXT NOT NULL CHECK (color IN ('B', 'W')),
-                position TEXT NOT NULL,
-                FOREIGN KEY (game_id) REFERENCES games(id)
-            )
-        """)
-        
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS answers (
-                game_id TEXT,
-                answer_type TEXT NOT NULL CHECK (answer_type IN ('+', '-', '/')),
-                moves TEXT NOT NULL,
-                comment TEXT,
-                FOREIGN KEY (game_id) REFERENCES games(id)
-            )
-        """)
-        
-        conn.commit()
-        return conn, cursor
-    except Exception as e:
-        logger.error(f"設置數據庫時出錯: {str(e)}")
-        raise
-
-def validate_position(position):
-    """驗證棋子位置是否有效"""
-    return bool(re.match(r'^[a-s]{2}$', position))
-
-def _parse_answer(answer_str):
-    """解析答案字符串"""
-    if not answer_str or answer_str.isspace():
-        return None
-        
-    # 清理字符串
-    answer_str = answer_str.strip()
-    if not answer_str:
-        return None
-        
-    # 第一個字符是答案類型
-    answer_type = answer_str[0]
-    if answer_type not in ['+', '-', '/']:
-        # 嘗試從字符串中找到有效的答案類型
-        for char in answer_str:
-            if char in ['+', '-', '/']:
-                answer_type = char
-                answer_str = char + answer_str[answer_str.index(char) + 1:]
-                break
-        else:
-            raise ValueError(f"無效的答案類型：{answer_type}")
-        
-    # 檢查是否有注釋
-    remaining = answer_str[1:]
-    if '#' in remaining:
-        moves, comment = remaining.split('#', 1)
-        # 移除注釋末尾的逗號和空白
-        comment = comment.strip().rstrip(',')
-    else:
-        moves = remaining
-        comment = ""
-        
-    # 清理和驗證移動序列
-    moves = moves.strip().rstrip(',')
-    if moves:
-        valid_moves = []
-        for move in moves.split(','):
-            move = move.strip()
-            if move:
-                # 檢查移動格式
-                if len(move) >= 3 and move[0] in 'BW':
-                    pos = move[1:].lower()
-                    if validate_position(pos):
-                        valid_moves.append(f"{move[0]}{pos}")
-                    else:
-                        raise ValueError(f"無效的棋子位置：{pos}")
-                else:
-                    raise ValueError(f"無效的移動格式：{move}")
-        moves = ','.join(valid_moves)
-    
-    return {
-        'type': answer_type,
-        'moves': moves,
-        'comment': comment
-    }
-
-def parse_shf_line(line):
-    """解析 SHF 格式行"""
-    parts = line.strip().split(':')
-    if len(parts) < 5:
-        raise ValueError("無效的 SHF 格式：缺少必要部分")
-    
-    # 解析級別
-    level = parts[0]
-    if level == "00":
-        pass  # 未標示級別
-    elif level.endswith('d'):
-        if not (1 <= int(level[:-1]) <= 9):
-            raise ValueError(f"無效的段位格式：{level}")
-    elif level.endswith('k'):
-        if not (1 <= int(level[:-1]) <= 30):
-            raise ValueError(f"無效的級位格式：{level}")
-    else:
-        raise ValueError(f"無效的級別格式：{level}")
-    
-    # 解析 ID
-    id_str = parts[1]
-    if not re.match(r'^\d{5}$', id_str):
-        raise ValueError(f"無效的 ID 格式：{id_str}")
-    
-    # 解析棋盤大小
-    size_code = parts[2]
-    if size_code == '1':
-        board_size = 9
-    elif size_code == '2':
-        board_size = 13
-    elif size_code == '3':
-        board_size = 19
-    else:
-        raise ValueError(f"無效的棋盤大小代碼：{size_code}")
-    
-    # 解析初始狀態和注釋
-    initial_part = parts[3]
-    if '#' in initial_part:
-        initial_state, initial_comment = initial_part.split('#', 1)
-    else:
-        initial_state = initial_part
-        initial_comment = ""
-    
-    initial_positions = []
-    for pos in initial_state.split(','):
-        if pos:
-            if len(pos) < 3 or pos[0] not in 'BW' or not re.match(r'^[a-s]{2}$', pos[1:]):
-                raise ValueError(f"無效的棋子位置：{pos}")
-            initial_positions.append({
-                'color': pos[0],
-                'position': pos[1:]
-            })
-    
-    # 解析答案序列
-    answers_part = parts[4]
-    answers = []
-    current_answer = ""
-    
-    for char in answers_part:
-        if char in ['+', '-', '/'] and current_answer:
-            if current_answer:
-                answers.append(_parse_answer(current_answer))
-            current_answer = char
-        else:
-            current_answer += char
-    
-    if current_answer:
-        answers.append(_parse_answer(current_answer))
-    
-    return {
-        'level': level,
-        'id': id_str,
-        'size': board_size,
-        'initial_comment': initial_comment,
-        'initial_positions': initial_positions,
-        'answers': answers
-    }
-
 class ConversionWorker(QThread):
     """處理數據庫轉換的工作線程"""
     progress_updated = pyqtSignal(int)
@@ -236,65 +54,27 @@ class ConversionWorker(QThread):
     conversion_finished = pyqtSignal()
     error_occurred = pyqtSignal(str, str)  # 修改為發送標題和消息
 
-    def __init__(self, input_files, db_path):
+    def __init__(self, input_files, db_path, batch_size=DEFAULT_BATCH_SIZE,
+                 incremental=False):
         super().__init__()
         self.input_files = input_files
         self.db_path = db_path
+        self.batch_size = batch_size
+        self.incremental = incremental
         self.logger = logging.getLogger(__name__)
 
     def run(self):
         try:
-            # 初始化數據庫
-            conn, cursor = setup_database(self.db_path)
-            
-            total_files = len(self.input_files)
-            processed_files = 0
-            
-            for file_path in self.input_files:
-                try:
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        content = f.read().strip()
-                        
-                    # 解析 SHF 文件
-                    game_data = parse_shf_line(content)
-                    
-                    # 驗證所有位置
-                    for pos in game_data['initial_positions']:
-                        if not validate_position(pos['position']):
-                            raise ValueError(f"無效的棋子位置：{pos['position']}")
-                    
-                    # 插入遊戲數據
-                    cursor.execute("""
-                        INSERT INTO games (id, level, size, initial_comment)
-                        VALUES (?, ?, ?, ?)
-                    """, (game_data['id'], game_data['level'], game_data['size'], game_data['initial_comment']))
-                    
-                    # 插入初始位置
-                    for pos in game_data['initial_positions']:
-                        cursor.execute("""
-                            INSERT INTO initial_positions (game_id, color, position)
-                            VALUES (?, ?, ?)
-                        """, (game_data['id'], pos['color'], pos['position']))
-                    
-                    # 插入答案
-                    for answer in game_data['answers']:
-                        cursor.execute("""
-                            INSERT INTO answers (game_id, answer_type, moves, comment)
-                            VALUES (?, ?, ?, ?)
-                        """, (game_data['id'], answer['type'], answer['moves'], answer.get('comment', '')))
-                    
-                    processed_files += 1
-                    progress = int((processed_files / total_files) * 100)
-                    self.progress_updated.emit(progress)
-                    self.log_message.emit(f"已處理: {file_path}")
-                    
-                except Exception as e:
-                    self.log_message.emit(f"處理文件 {file_path} 時出錯: {str(e)}")
-                    logger.error(f"處理文件 {file_path} 時出錯: {str(e)}")
-                    continue
-            
-            conn.commit()
-            conn.close()
+            import_shf_files(
+                self.input_files,
+                self.db_path,
+                self.batch_size,
+                log=self.log_message.emit,
+                progress=self.progress_updated.emit,
+                # 界面中只選擇了部分文件時，不應刪除其他文件導入的題目
+                incremental=self.incremental,
+                prune=False
+            )
             self.conversion_finished.emit()
             
         except Exception as e:
@@ -344,6 +124,10 @@ class SHF2SQLiteConverter(QMainWindow):
             output_layout.addWidget(self.save_button)
             layout.addLayout(output_layout)
             
+            # 增量導入：保留已有數據庫，只導入有變化的文件
+            self.incremental_checkbox = QCheckBox("增量更新已有數據庫（跳過未變化的文件）")
+            layout.addWidget(self.incremental_checkbox)
+            
             # 進度條
             self.progress_bar = QProgressBar()
             layout.addWidget(self.progress_bar)
@@ -428,7 +212,10 @@ class SHF2SQLiteConverter(QMainWindow):
             self.save_button.setEnabled(False)
             
             # 創建並啟動轉換線程
-            self.worker = ConversionWorker(self.selected_files, output_file)
+            self.worker = ConversionWorker(
+                self.selected_files, output_file,
+                incremental=self.incremental_checkbox.isChecked()
+            )
             self.worker.progress_updated.connect(self.update_progress)
             self.worker.log_message.connect(self.append_log)
             self.worker.conversion_finished.connect(self.conversion_finished)
@@ -1,8 +1,12 @@
 from PyQt6.QtWidgets import QWidget
-from PyQt6.QtGui import QPainter, QColor, QRadialGradient, QPen, QPainterPath
+from PyQt6.QtGui import (QPainter, QColor, QRadialGradient, QPen, QPainterPath,
+                         QPixmap, QRegion)
 from PyQt6.QtCore import Qt, QRect, QPointF
+import math
 import logging
 
+from shf_tools.core.board import BoardState, BLACK, WHITE
+
 logger = logging.getLogger(__name__)
 
 class GoBoard(QWidget):
@@ -10,94 +14,29 @@ class GoBoard(QWidget):
         super().__init__(parent)
         self.board_size = 19  # 默認19路棋盤
         self.stones = {}  # 存儲棋子位置和顏色
+        self.state = BoardState(self.board_size)  # 盤面引擎，負責提子和規則判斷
         self.last_move = None  # 最後一手的位置
         self.is_initial_setup = True  # 是否正在設置初始棋盤
         self.setMinimumSize(600, 600)
         self.margin = 40  # 邊距
         self.setFocusPolicy(Qt.FocusPolicy.StrongFocus)
+        # 渲染緩存：棋盤底圖和棋子圖像
+        self._board_pixmap = None
+        self._board_pixmap_key = None
+        self._stone_sprites = {}
+        self._stone_sprites_key = None
         
     def clear(self):
         """清空棋盤"""
         self.stones.clear()
+        self.state = BoardState(self.board_size)
         self.last_move = None
         self.is_initial_setup = True
         self.update()
         
-    def get_neighbors(self, x, y):
-        """獲取指定位置的相鄰點"""
-        neighbors = []
-        for dx, dy in [(0, 1), (0, -1), (1, 0), (-1, 0)]:
-            nx, ny = x + dx, y + dy
-            if 0 <= nx < self.board_size and 0 <= ny < self.board_size:
-                neighbors.append((nx, ny))
-        return neighbors
-        
-    def get_group_liberties(self, x, y, visited=None):
+    def get_group_liberties(self, x, y):
         """獲取一個棋子群的氣"""
-        if visited is None:
-            visited = set()
-            
-        if (x, y) not in self.stones:
-            return set()
-            
-        color = self.stones[(x, y)]
-        liberties = set()
-        group = set()
-        
-        def find_liberties(x, y):
-            if (x, y) in visited:
-                return
-            visited.add((x, y))
-            
-            if (x, y) not in self.stones:
-                liberties.add((x, y))
-                return
-                
-            if self.stones[(x, y)] != color:
-                return
-                
-            group.add((x, y))
-            for nx, ny in self.get_neighbors(x, y):
-                find_liberties(nx, ny)
-                
-        find_liberties(x, y)
-        return liberties
-        
-    def remove_dead_stones(self, x, y):
-        """移除死棋"""
-        if (x, y) not in self.stones:
-            return set()
-            
-        color = self.stones[(x, y)]
-        opponent_color = "white" if color == "black" else "black"
-        removed_stones = set()
-        
-        # 檢查四周的對方棋子群
-        for nx, ny in self.get_neighbors(x, y):
-            if (nx, ny) in self.stones and self.stones[(nx, ny)] == opponent_color:
-                # 如果對方棋子群沒有氣，則移除
-                if not self.get_group_liberties(nx, ny):
-                    # 找出整個無氣的棋子群
-                    dead_group = set()
-                    visited = set()
-                    
-                    def find_group(x, y):
-                        if (x, y) in visited or (x, y) not in self.stones:
-                            return
-                        visited.add((x, y))
-                        if self.stones[(x, y)] == opponent_color:
-                            dead_group.add((x, y))
-                            for nx, ny in self.get_neighbors(x, y):
-                                find_group(nx, ny)
-                                
-                    find_group(nx, ny)
-                    
-                    # 移除死棋
-                    for dx, dy in dead_group:
-                        del self.stones[(dx, dy)]
-                        removed_stones.add((dx, dy))
-                        
-        return removed_stones
+        return self.state.liberties(x, y)
         
     def place_stone(self, pos, color):
         """在指定位置放置棋子"""
@@ -106,43 +45,178 @@ class GoBoard(QWidget):
             if not self._is_valid_pos(x, y):
                 return False
             
-            # 如果位置已經有棋子，則返回
-            if (x, y) in self.stones:
-                return False
-                
-            # 先放置棋子
-            self.stones[(x, y)] = color
-            
-            # 檢查是否提子
-            removed_stones = self.remove_dead_stones(x, y)
+            # 由盤面引擎處理提子，並拒絕重疊、自殺和立即提劫的著手
+            captured = self.state.play(x, y, BLACK if color == "black" else WHITE)
+            if self.is_initial_setup:
+                self.state.ko = -1
             
-            # 如果沒有提子，且這手棋沒有氣（自殺手），則撤銷此手
-            if not removed_stones and not self.get_group_liberties(x, y):
-                del self.stones[(x, y)]
-                self.last_move = None
-                return False
+            self.stones[(x, y)] = color
+            for point in captured:
+                del self.stones[point]
                 
             # 只有在不是初始設置時才標記最後落子
+            previous_move = self.last_move
             if not self.is_initial_setup:
                 self.last_move = (x, y)
-            self.update()
+            self._update_points([(x, y), previous_move] + captured)
             return True
         except ValueError:
             return False
         
+    def set_position(self, stones, state, last_move=None):
+        """以整個盤面替換棋子，只重繪一次
+
+        stones 為 {(x, y): BLACK 或 WHITE}，state 為對應的 BoardState。
+        """
+        self.stones = {
+            point: "black" if color == BLACK else "white"
+            for point, color in stones.items()
+        }
+        # 保存副本，之後 place_stone 修改盤面時不影響調用方緩存的盤面
+        self.state = state.copy()
+        self.last_move = last_move
+        self.is_initial_setup = False
+        self.update()
+        
+    def apply_changes(self, changes, state, last_move=None):
+        """按增量更新棋子，只重繪變化的點所在的區域
+
+        changes 為 {(x, y): 顏色}，顏色為 BLACK、WHITE 或 0（移除棋子）。
+        """
+        for point, color in changes.items():
+            if color == BLACK:
+                self.stones[point] = "black"
+            elif color == WHITE:
+                self.stones[point] = "white"
+            else:
+                self.stones.pop(point, None)
+        self.state = state.copy()
+        self._update_points(list(changes) + [self.last_move, last_move])
+        self.last_move = last_move
+        self.is_initial_setup = False
+        
     def set_initial_stones_complete(self):
         """標記初始棋盤設置完成"""
         self.is_initial_setup = False
-        self.update()
+        self._update_points([self.last_move])
+        
+    def _grid_size(self):
+        """計算棋盤格子大小"""
+        board_width = min(self.width(), self.height()) - 2 * self.margin
+        return board_width / (self.board_size - 1)
+        
+    def _center(self, x, y, grid_size):
+        return int(self.margin + x * grid_size), int(self.margin + y * grid_size)
+        
+    def _sprite_radius(self, grid_size):
+        """棋子圖像的半寬，包括陰影的偏移和邊緣的筆寬"""
+        return math.ceil(grid_size * 0.45) + 4
+        
+    def _point_rect(self, x, y, grid_size):
+        """一個點上的棋子及其陰影和標記所佔的區域"""
+        center_x, center_y = self._center(x, y, grid_size)
+        radius = self._sprite_radius(grid_size)
+        return QRect(center_x - radius, center_y - radius, 2 * radius, 2 * radius)
+        
+    def _update_points(self, points):
+        """只重繪指定點所在的區域，Qt 會把多次請求合併為一次重繪"""
+        grid_size = self._grid_size()
+        region = QRegion()
+        for point in points:
+            if point is not None:
+                region = region.united(self._point_rect(point[0], point[1], grid_size))
+        if not region.isEmpty():
+            self.update(region)
+            
+    def _board_layer(self, grid_size, ratio):
+        """返回畫好背景、網格和星位的底圖，窗口大小、棋盤大小或像素比例變化時重畫"""
+        key = (self.width(), self.height(), self.board_size, ratio)
+        if self._board_pixmap_key != key:
+            pixmap = QPixmap(math.ceil(self.width() * ratio),
+                             math.ceil(self.height() * ratio))
+            pixmap.setDevicePixelRatio(ratio)
+            pixmap.fill(Qt.GlobalColor.transparent)
+            painter = QPainter(pixmap)
+            painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+            self._draw_board(painter, grid_size)
+            painter.end()
+            self._board_pixmap = pixmap
+            self._board_pixmap_key = key
+        return self._board_pixmap
+        
+    def _stone_sprite(self, color, grid_size, ratio):
+        """返回預先畫好的棋子圖像，按格子大小和像素比例緩存"""
+        key = (grid_size, ratio)
+        if self._stone_sprites_key != key:
+            self._stone_sprites = {}
+            self._stone_sprites_key = key
+        sprite = self._stone_sprites.get(color)
+        if sprite is None:
+            radius = self._sprite_radius(grid_size)
+            side = math.ceil(2 * radius * ratio)
+            sprite = QPixmap(side, side)
+            sprite.setDevicePixelRatio(ratio)
+            sprite.fill(Qt.GlobalColor.transparent)
+            painter = QPainter(sprite)
+            painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+            self._draw_stone(painter, radius, radius, grid_size * 0.45, color)
+            painter.end()
+            self._stone_sprites[color] = sprite
+        return sprite
         
     def paintEvent(self, event):
         painter = QPainter(self)
         painter.setRenderHint(QPainter.RenderHint.Antialiasing)
         
-        # 計算棋盤格子大小
-        board_width = min(self.width(), self.height()) - 2 * self.margin
-        grid_size = board_width / (self.board_size - 1)
+        ratio = self.devicePixelRatioF()
+        grid_size = self._grid_size()
+        
+        # 底圖只在需要時重畫，重繪區域由 Qt 裁剪
+        painter.drawPixmap(0, 0, self._board_layer(grid_size, ratio))
         
+        # 只繪製與重繪區域相交的棋子
+        dirty = event.rect()
+        radius = self._sprite_radius(grid_size)
+        stone_size = grid_size * 0.45
+        for (x, y), color in self.stones.items():
+            center_x, center_y = self._center(x, y, grid_size)
+            rect = QRect(center_x - radius, center_y - radius, 2 * radius, 2 * radius)
+            if not dirty.intersects(rect):
+                continue
+            painter.drawPixmap(center_x - radius, center_y - radius,
+                               self._stone_sprite(color, grid_size, ratio))
+            
+            # 如果是最後落子且不是在初始設置階段，添加三角形標記
+            if (self.last_move and (x, y) == self.last_move
+                    and not self.is_initial_setup):
+                # 計算三角形的三個頂點
+                triangle_size = stone_size * 0.95  # 調整三角形尺寸為棋子大小的95%
+                
+                # 計算三角形的三個頂點（西北為直角）
+                points = [
+                    QPointF(center_x, center_y),  # 直角點（中心點）
+                    QPointF(center_x + triangle_size, center_y),  # 右點（貼著棋子右側）
+                    QPointF(center_x, center_y + triangle_size)   # 下點（貼著棋子下方）
+                ]
+                
+                # 設置三角形顏色（與棋子顏色相反）
+                if color == "black":
+                    triangle_color = Qt.GlobalColor.white
+                else:
+                    triangle_color = Qt.GlobalColor.black
+                painter.setBrush(triangle_color)
+                painter.setPen(QPen(triangle_color, 2))
+                
+                # 繪製三角形
+                path = QPainterPath()
+                path.moveTo(points[0])
+                path.lineTo(points[1])
+                path.lineTo(points[2])
+                path.lineTo(points[0])
+                painter.drawPath(path)
+                
+    def _draw_board(self, painter, grid_size):
+        """繪製棋盤背景、外框、網格線和星位"""
         # 計算棋盤實際區域
         board_rect = QRect(
             self.margin,
@@ -196,106 +270,77 @@ class GoBoard(QWidget):
                     3, 3
                 )
                 
-        # 繪製棋子
-        stone_size = grid_size * 0.45  # 棋子大小
-        for (x, y), color in self.stones.items():
-            center_x = int(self.margin + x * grid_size)
-            center_y = int(self.margin + y * grid_size)
+    def _draw_stone(self, painter, center_x, center_y, stone_size, color):
+        """繪製一顆帶陰影和高光的棋子"""
+        # 設置陰影
+        shadow = QRadialGradient(
+            center_x, center_y,
+            stone_size * 1.2
+        )
+        shadow.setColorAt(0, QColor(0, 0, 0, 30))
+        shadow.setColorAt(1, QColor(0, 0, 0, 0))
+        painter.setBrush(shadow)
+        painter.setPen(Qt.PenStyle.NoPen)
+        painter.drawEllipse(
+            QPointF(center_x + 2, center_y + 2),  # 稍微偏移陰影
+            stone_size,
+            stone_size
+        )
+        
+        # 創建主體漸變效果
+        gradient = QRadialGradient(
+            center_x, center_y,
+            stone_size
+        )
+        if color == "black":
+            # 黑棋使用更深的黑色和微弱的藍色調
+            gradient.setColorAt(0, QColor(50, 50, 55))
+            gradient.setColorAt(0.4, QColor(30, 30, 35))
+            gradient.setColorAt(1, QColor(10, 10, 15))
             
-            # 設置陰影
-            shadow = QRadialGradient(
-                center_x, center_y,
-                stone_size * 1.2
-            )
-            shadow.setColorAt(0, QColor(0, 0, 0, 30))
-            shadow.setColorAt(1, QColor(0, 0, 0, 0))
-            painter.setBrush(shadow)
-            painter.setPen(Qt.PenStyle.NoPen)
-            painter.drawEllipse(
-                QPointF(center_x + 2, center_y + 2),  # 稍微偏移陰影
-                stone_size,
-                stone_size
-            )
+            # 添加邊緣
+            painter.setPen(QPen(QColor(0, 0, 0, 100), 1))
+        else:
+            # 白棋使用暖色調
+            gradient.setColorAt(0, QColor(255, 255, 253))
+            gradient.setColorAt(0.4, QColor(250, 250, 246))
+            gradient.setColorAt(1, QColor(230, 230, 225))
             
-            # 創建主體漸變效果
-            gradient = QRadialGradient(
-                center_x, center_y,
-                stone_size
-            )
-            if color == "black":
-                # 黑棋使用更深的黑色和微弱的藍色調
-                gradient.setColorAt(0, QColor(50, 50, 55))
-                gradient.setColorAt(0.4, QColor(30, 30, 35))
-                gradient.setColorAt(1, QColor(10, 10, 15))
-                
-                # 添加邊緣
-                painter.setPen(QPen(QColor(0, 0, 0, 100), 1))
-            else:
-                # 白棋使用暖色調
-                gradient.setColorAt(0, QColor(255, 255, 253))
-                gradient.setColorAt(0.4, QColor(250, 250, 246))
-                gradient.setColorAt(1, QColor(230, 230, 225))
-                
-                # 添加邊緣
-                painter.setPen(QPen(QColor(180, 180, 180, 100), 1))
-                
-            painter.setBrush(gradient)
-            painter.drawEllipse(
-                QPointF(center_x, center_y),
-                stone_size,
-                stone_size
-            )
+            # 添加邊緣
+            painter.setPen(QPen(QColor(180, 180, 180, 100), 1))
             
-            # 添加高光效果（更微妙）
-            highlight = QRadialGradient(
-                center_x - stone_size * 0.2,  # 調整高光位置
-                center_y - stone_size * 0.2,
-                stone_size * 0.7  # 縮小高光範圍
-            )
-            if color == "black":
-                # 黑棋的高光更微弱
-                highlight.setColorAt(0, QColor(255, 255, 255, 40))
-                highlight.setColorAt(0.5, QColor(255, 255, 255, 10))
-                highlight.setColorAt(1, QColor(255, 255, 255, 0))
-            else:
-                # 白棋的高光更明顯
-                highlight.setColorAt(0, QColor(255, 255, 255, 60))
-                highlight.setColorAt(0.5, QColor(255, 255, 255, 30))
-                highlight.setColorAt(1, QColor(255, 255, 255, 0))
-                
-            painter.setBrush(highlight)
-            painter.setPen(Qt.PenStyle.NoPen)
-            painter.drawEllipse(
-                QPointF(center_x - stone_size * 0.2,
-                       center_y - stone_size * 0.2),
-                stone_size * 0.5,
-                stone_size * 0.5
-            )
+        painter.setBrush(gradient)
+        painter.drawEllipse(
+            QPointF(center_x, center_y),
+            stone_size,
+            stone_size
+        )
+        
+        # 添加高光效果（更微妙）
+        highlight = QRadialGradient(
+            center_x - stone_size * 0.2,  # 調整高光位置
+            center_y - stone_size * 0.2,
+            stone_size * 0.7  # 縮小高光範圍
+        )
+        if color == "black":
+            # 黑棋的高光更微弱
+            highlight.setColorAt(0, QColor(255, 255, 255, 40))
+            highlight.setColorAt(0.5, QColor(255, 255, 255, 10))
+            highlight.setColorAt(1, QColor(255, 255, 255, 0))
+        else:
+            # 白棋的高光更明顯
+            highlight.setColorAt(0, QColor(255, 255, 255, 60))
+            highlight.setColorAt(0.5, QColor(255, 255, 255, 30))
+            highlight.setColorAt(1, QColor(255, 255, 255, 0))
             
-            # 如果是最後落子且不是在初始設置階段，添加三角形標記
-            if self.last_move and (x, y) == self.last_move and not self.is_initial_setup:
-                # 計算三角形的三個頂點
-                triangle_size = stone_size * 0.95  # 調整三角形尺寸為棋子大小的95%
-                
-                # 計算三角形的三個頂點（西北為直角）
-                points = [
-                    QPointF(center_x, center_y),  # 直角點（中心點）
-                    QPointF(center_x + triangle_size, center_y),  # 右點（貼著棋子右側）
-                    QPointF(center_x, center_y + triangle_size)   # 下點（貼著棋子下方）
-                ]
-                
-                # 設置三角形顏色（與棋子顏色相反）
-                triangle_color = Qt.GlobalColor.white if color == "black" else Qt.GlobalColor.black
-                painter.setBrush(triangle_color)
-                painter.setPen(QPen(triangle_color, 2))
-                
-                # 繪製三角形
-                path = QPainterPath()
-                path.moveTo(points[0])
-                path.lineTo(points[1])
-                path.lineTo(points[2])
-                path.lineTo(points[0])
-                painter.drawPath(path)
+        painter.setBrush(highlight)
+        painter.setPen(Qt.PenStyle.NoPen)
+        painter.drawEllipse(
+            QPointF(center_x - stone_size * 0.2,
+                   center_y - stone_size * 0.2),
+            stone_size * 0.5,
+            stone_size * 0.5
+        )
 
     def _convert_pos(self, pos):
         """將字符串座標轉換為數字座標"""
@@ -308,16 +353,3 @@ class GoBoard(QWidget):
     def _is_valid_pos(self, x, y):
         """檢查座標是否有效"""
         return 0 <= x < self.board_size and 0 <= y < self.board_size
-
-    def _is_suicide(self, x, y, color):
-        """檢查是否是自殺手"""
-        # 先假設放置棋子
-        self.stones[(x, y)] = color
-        
-        # 檢查是否有氣
-        has_liberties = bool(self.get_group_liberties(x, y))
-        
-        # 移除假設的棋子
-        del self.stones[(x, y)]
-        
-        return not has_liberties 
\ No newline at end of file
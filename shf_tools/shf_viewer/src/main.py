@@ -8,9 +8,14 @@ from pathlib import Path
 from PyQt6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
                             QHBoxLayout, QFileDialog, QPushButton, QTextEdit,
                             QMessageBox)
+from PyQt6.QtGui import QKeySequence, QShortcut
 from PyQt6.QtCore import Qt
+
+# 以腳本方式運行時，將倉庫根目錄加入搜索路徑以導入共用的 shf_tools 套件
+sys.path.insert(0, str(Path(__file__).resolve().parents[3]))
 from board_widget import GoBoard
 from shf_parser import SHFParser
+from shf_tools.core.replay import ReplayCache
 
 def setup_logging():
     try:
@@ -120,10 +125,26 @@ class SHFViewer(QMainWindow):
             control_layout.addWidget(self.clear_button)
             right_layout.addLayout(control_layout)
             
+            # 快捷鍵
+            for key, handler in (
+                (Qt.Key.Key_Space, self.next_move),
+                (Qt.Key.Key_Right, self.next_move),
+                (Qt.Key.Key_Backspace, self.prev_move),
+                (Qt.Key.Key_Left, self.prev_move),
+                (Qt.Key.Key_Down, self.next_variation),
+                (Qt.Key.Key_Up, self.prev_variation),
+                (Qt.Key.Key_R, self.reset_problem),
+                (Qt.Key.Key_Q, self.close),
+            ):
+                QShortcut(QKeySequence(key), self, handler)
+            
             # 初始化解析器
             self.parser = None
             self.current_path = None
             self.current_move_index = -1
+            # 盤面緩存和棋盤當前顯示的前綴樹節點，None 表示棋盤需要整體重畫
+            self.replay = None
+            self.board_node = None
             
             logger.info("SHF Viewer 初始化完成")
             
@@ -143,6 +164,9 @@ class SHFViewer(QMainWindow):
             if file_name:
                 logger.info(f"載入文件: {file_name}")
                 self.parser = SHFParser(file_name)
+                self.replay = ReplayCache(
+                    self.board.board_size, self.parser.initial_state)
+                self.board_node = None
                 self.current_move_index = -1
                 self.update_board()
                 self.initial_comment.setText(self.parser.initial_comment)
@@ -158,29 +182,19 @@ class SHFViewer(QMainWindow):
                 return
                 
             logger.debug("更新棋盤...")
-            # 清空棋盤
-            self.board.clear()
-            
-            # 設置初始狀態
-            for stone in self.parser.initial_state:
-                color = "black" if stone.startswith("B") else "white"
-                pos = stone[1:]
-                self.board.place_stone(pos, color)
-                logger.debug(f"放置棋子: {color} at {pos}")
-
-            # 標記初始棋盤設置完成
-            self.board.set_initial_stones_complete()
+            # 從棋盤當前顯示的節點沿前綴樹移到目標節點，只應用變化的棋子並重繪一次
+            node = self.parser.get_current_node(self.current_move_index)
+            if self.board_node is None:
+                step = self.replay.step(node)
+                self.board.set_position(step.state.stones(), step.state, step.last_move)
+            else:
+                changes, step = self.replay.transition(self.board_node, node)
+                self.board.apply_changes(changes, step.state, step.last_move)
+            self.board_node = node
                 
-            # 顯示到當前移動的所有步驟
+            # 如果是最後一步，顯示注釋
             if self.current_move_index >= 0:
                 current_path = self.parser.get_current_path()
-                for i, move in enumerate(current_path[:self.current_move_index + 1]):
-                    color = "black" if move.startswith("B") else "white"
-                    pos = move[1:]
-                    self.board.place_stone(pos, color)
-                    logger.debug(f"放置移動: {color} at {pos}")
-                    
-                # 如果是最後一步，顯示注釋
                 if self.current_move_index == len(current_path) - 1:
                     self.answer_comment.setText(self.parser.get_current_comment())
                 else:
@@ -227,11 +241,26 @@ class SHFViewer(QMainWindow):
             logger.error(f"上一步失敗: {str(e)}")
             logger.error(traceback.format_exc())
 
+    def reset_problem(self):
+        """回到當前變化的初始局面"""
+        try:
+            if not self.parser:
+                return
+                
+            self.current_move_index = -1
+            self.answer_comment.clear()
+            self.update_board()
+            
+        except Exception as e:
+            logger.error(f"重置題目失敗: {str(e)}")
+            logger.error(traceback.format_exc())
+            
     def clear_board(self):
         """清除棋盤並重置狀態"""
         try:
             logger.info("清除棋盤...")
             self.board.clear()
+            self.board_node = None
             self.current_move_index = -1
             self.initial_comment.clear()
             self.answer_comment.clear()
@@ -250,10 +279,10 @@ class SHFViewer(QMainWindow):
                 QMessageBox.information(self, "提示", "這是最後面的變化了！")
                 return
                 
+            shared = self.parser.shared_moves(self.parser.current_answer_index + 1)
             if self.parser.next_variation():
-                # 清除當前狀態
-                self.board.clear()
-                self.current_move_index = -1
+                # 停在兩個變化共同前綴的最後一手，不必從第一手重新走起
+                self.current_move_index = min(self.current_move_index, shared - 1)
                 self.answer_comment.clear()
                 
                 # 重新設置初始狀態
@@ -274,10 +303,10 @@ class SHFViewer(QMainWindow):
                 QMessageBox.information(self, "提示", "這是最前面的變化了！")
                 return
                 
+            shared = self.parser.shared_moves(self.parser.current_answer_index - 1)
             if self.parser.prev_variation():
-                # 清除當前狀態
-                self.board.clear()
-                self.current_move_index = -1
+                # 停在兩個變化共同前綴的最後一手，不必從第一手重新走起
+                self.current_move_index = min(self.current_move_index, shared - 1)
                 self.answer_comment.clear()
                 
                 # 重新設置初始狀態
@@ -1,6 +1,9 @@
+from shf_tools.core.parser import parse_line
+
 class SHFParser:
     def __init__(self, file_path):
         self.file_path = file_path
+        self.level = "00"
         self.id = ""
         self.board_size = 19
         self.initial_state = []
@@ -11,70 +14,39 @@ class SHFParser:
         self._parse_file()
         
     def _parse_file(self):
+        # 讀取第一道題目，跳過空行和分區標題；兼容沒有級別的舊格式
         with open(self.file_path, 'r', encoding='utf-8') as f:
-            content = f.read().strip()
-            
-        # 分割主要部分
-        parts = content.split(':')
-        if len(parts) < 4:
-            raise ValueError("Invalid SHF format")
-            
-        # 解析ID和棋盤大小
-        self.id = parts[0]
-        self.board_size = int(parts[1])
-        if self.board_size == 1:
-            self.board_size = 9
-        elif self.board_size == 2:
-            self.board_size = 13
-        elif self.board_size == 3:
-            self.board_size = 19
-            
-        # 解析初始狀態和注釋
-        initial_part = parts[2]
-        if '#' in initial_part:
-            state, comment = initial_part.split('#', 1)
-            self.initial_state = [s for s in state.split(',') if s]
-            self.initial_comment = comment
-        else:
-            self.initial_state = [s for s in initial_part.split(',') if s]
-            
-        # 解析答案序列
-        answers_part = parts[3]
-        current_answer = ""
-        
-        # 遍歷每個字符來正確分割答案序列
-        for char in answers_part:
-            if char in ['+', '-', '/'] and current_answer:  # 新答案開始
-                self._add_answer(current_answer)
-                current_answer = char
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith('#'):
+                    break
             else:
-                current_answer += char
-                
-        # 添加最後一個答案
-        if current_answer:
-            self._add_answer(current_answer)
+                raise ValueError("Invalid SHF format")
             
-    def _add_answer(self, answer_str):
-        """解析並添加一個答案序列"""
-        if not answer_str or answer_str[0] not in ['+', '-', '/']:
-            return
-            
-        answer_type = answer_str[0]
-        content = answer_str[1:]
+        problem = parse_line(line, strict=False)
+        self.level = problem.level
+        self.id = problem.id
+        self.board_size = problem.size
+        self.initial_state = list(problem.stones)
+        self.initial_comment = problem.initial_comment
         
-        if '#' in content:
-            moves_str, comment = content.split('#', 1)
-            # 移除最後的逗號（如果有）
-            moves_str = moves_str.rstrip(',')
-            moves = [m for m in moves_str.split(',') if m]
-        else:
-            # 移除最後的逗號（如果有）
-            content = content.rstrip(',')
-            moves = [m for m in content.split(',') if m]
-            comment = ""
-            
-        if moves:  # 只有在有移動時才添加答案
-            self.answers.append((answer_type, moves, comment))
+        # 答案前綴樹，切換變化時可以找到共同的前綴
+        self.answer_tree = problem.answer_tree()
+        
+        # 只有在有移動時才添加答案
+        self.answers = [
+            (answer.type, list(answer.moves), answer.comment)
+            for answer in problem.answers if answer.moves
+        ]
+        # 每個答案從第一手到最後一手經過的節點
+        self.answer_nodes = []
+        for _, moves, _ in self.answers:
+            node = self.answer_tree.root
+            path = []
+            for move in moves:
+                node = node.child(move)
+                path.append(node)
+            self.answer_nodes.append(path)
                 
     def get_current_path(self):
         """獲取當前答案路徑的所有移動"""
@@ -88,6 +60,26 @@ class SHFParser:
             return ""
         return self.answers[self.current_answer_index][2]
         
+    def shared_moves(self, answer_index):
+        """當前答案與另一個答案共同前綴的手數"""
+        if not self.answers:
+            return 0
+        ancestors = set()
+        node = self.answer_nodes[self.current_answer_index][-1]
+        while node is not None:
+            ancestors.add(node)
+            node = node.parent
+        node = self.answer_nodes[answer_index][-1]
+        while node not in ancestors:
+            node = node.parent
+        return node.depth
+        
+    def get_current_node(self, move_index):
+        """當前答案走到第 move_index 手（從 0 開始）的前綴樹節點，-1 為根節點"""
+        if move_index < 0 or not self.answers:
+            return self.answer_tree.root
+        return self.answer_nodes[self.current_answer_index][move_index]
+        
     def next_variation(self):
         """切換到下一個變化"""
         if self.current_answer_index < len(self.answers) - 1:
@@ -5,10 +5,13 @@ import traceback
 from pathlib import Path
 from PyQt6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
                             QHBoxLayout, QFileDialog, QPushButton, QTextEdit,
-                            QLabel, QMessageBox, QProgressBar)
+                            QLabel, QMessageBox, QProgressBar, QCheckBox,
+                            QSpinBox)
 from PyQt6.QtCore import Qt, QThread, pyqtSignal
-import sqlite3
-import re
+
+# 以腳本方式運行時，將倉庫根目錄加入搜索路徑以導入共用的 shf_tools 套件
+sys.path.insert(0, str(Path(__file__).resolve().parents[3]))
+from shf_tools.core.exporter import export_database
 
 def setup_logging():
     try:
@@ -45,68 +48,6 @@ def setup_logging():
 
 logger = setup_logging()
 
-def validate_position(position):
-    """驗證棋子位置是否有效"""
-    return bool(re.match(r'^[a-s]{2}$', position))
-
-def format_shf_line(game_data):
-    """將遊戲數據格式化為 SHF 格式行"""
-    try:
-        # 驗證必要字段
-        required_fields = ['id', 'level', 'size', 'initial_positions', 'answers']
-        for field in required_fields:
-            if field not in game_data:
-                raise ValueError(f"缺少必要字段：{field}")
-        
-        # 轉換棋盤大小為代碼
-        if game_data['size'] == 19:
-            size_code = '3'
-        elif game_data['size'] == 13:
-            size_code = '2'
-        elif game_data['size'] == 9:
-            size_code = '1'
-        else:
-            raise ValueError(f"不支持的棋盤大小：{game_data['size']}")
-        
-        # 格式化初始位置
-        initial_positions = []
-        for pos in game_data['initial_positions']:
-            if not validate_position(pos['position']):
-                raise ValueError(f"無效的棋子位置：{pos['position']}")
-            initial_positions.append(f"{pos['color']}{pos['position']}")
-        
-        initial_part = ','.join(initial_positions)
-        if game_data.get('initial_comment'):
-            initial_part += f"#{game_data['initial_comment']}"
-        
-        # 格式化答案序列
-        answer_str = ''
-        for ans in game_data['answers']:
-            if answer_str:
-                answer_str += ','
-            answer_str += ans['type'] + ans['moves']
-            if ans.get('comment'):
-                answer_str += f"#{ans['comment']}"
-        
-        # 在答案序列最後添加一個逗號
-        if answer_str:
-            answer_str += ','
-        
-        # 組合所有部分
-        parts = [
-            game_data['level'],
-            game_data['id'],
-            size_code,
-            initial_part,
-            answer_str
-        ]
-        
-        return ':'.join(parts)
-        
-    except Exception as e:
-        logger.error(f"格式化 SHF 行時出錯: {str(e)}")
-        raise
-
 class ConversionWorker(QThread):
     """處理數據庫轉換的工作線程"""
     progress_updated = pyqtSignal(int)
@@ -114,90 +55,24 @@ class ConversionWorker(QThread):
     conversion_finished = pyqtSignal()
     error_occurred = pyqtSignal(str, str)
 
-    def __init__(self, db_path, output_dir):
+    def __init__(self, db_path, output_dir, collection=False, shard_size=0):
         super().__init__()
         self.db_path = db_path
         self.output_dir = output_dir
+        self.collection = collection
+        self.shard_size = shard_size
         self.logger = logging.getLogger(__name__)
 
     def run(self):
         try:
-            # 連接數據庫
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            # 獲取所有遊戲
-            cursor.execute("""
-                SELECT id, level, size, initial_comment 
-                FROM games 
-                ORDER BY id
-            """)
-            games = cursor.fetchall()
-            
-            total_games = len(games)
-            processed_games = 0
-            
-            for game in games:
-                try:
-                    game_id, level, size, initial_comment = game
-                    
-                    # 獲取初始位置
-                    cursor.execute("""
-                        SELECT color, position 
-                        FROM initial_positions 
-                        WHERE game_id = ?
-                        ORDER BY rowid
-                    """, (game_id,))
-                    initial_positions = [
-                        {'color': color, 'position': position}
-                        for color, position in cursor.fetchall()
-                    ]
-                    
-                    # 獲取答案
-                    cursor.execute("""
-                        SELECT answer_type, moves, comment 
-                        FROM answers 
-                        WHERE game_id = ?
-                        ORDER BY rowid
-                    """, (game_id,))
-                    answers = []
-                    for type, moves, comment in cursor.fetchall():
-                        answer = {
-                            'type': type,
-                            'moves': moves.strip(','),  # 移除可能的尾隨逗號
-                            'comment': comment.strip(',') if comment else ''  # 移除注釋中的尾隨逗號
-                        }
-                        answers.append(answer)
-                    
-                    # 組合遊戲數據
-                    game_data = {
-                        'id': game_id,
-                        'level': level,
-                        'size': size,
-                        'initial_comment': initial_comment.strip(',') if initial_comment else '',  # 移除初始注釋中的尾隨逗號
-                        'initial_positions': initial_positions,
-                        'answers': answers
-                    }
-                    
-                    # 格式化為 SHF 格式
-                    shf_content = format_shf_line(game_data)
-                    
-                    # 寫入文件（使用不帶冒號的文件名）
-                    output_file = os.path.join(self.output_dir, f"{level.lower()}{game_id}.shf")
-                    with open(output_file, 'w', encoding='utf-8') as f:
-                        f.write(shf_content)
-                    
-                    processed_games += 1
-                    progress = int((processed_games / total_games) * 100)
-                    self.progress_updated.emit(progress)
-                    self.log_message.emit(f"已處理: {output_file}")
-                    
-                except Exception as e:
-                    self.log_message.emit(f"處理遊戲 {game_id} 時出錯: {str(e)}")
-                    logger.error(f"處理遊戲 {game_id} 時出錯: {str(e)}")
-                    continue
-            
-            conn.close()
+            export_database(
+                self.db_path,
+                self.output_dir,
+                collection=self.collection,
+                shard_size=self.shard_size,
+                log=self.log_message.emit,
+                progress=self.progress_updated.emit
+            )
             self.conversion_finished.emit()
             
         except Exception as e:
@@ -247,6 +122,22 @@ class SQLite2SHFConverter(QMainWindow):
             output_layout.addWidget(self.save_button)
             layout.addLayout(output_layout)
             
+            # 合集模式：寫入一個或多個合集文件，而不是每題一個文件
+            collection_layout = QHBoxLayout()
+            self.collection_mode = QCheckBox("合集模式（按棋盤大小分區寫入合集文件）")
+            self.shard_label = QLabel("每個文件題數（0 為不分片）:")
+            self.shard_size = QSpinBox()
+            self.shard_size.setRange(0, 10000000)
+            self.shard_size.setSingleStep(10000)
+            self.shard_size.setEnabled(False)
+            self.collection_mode.toggled.connect(self.shard_size.setEnabled)
+            
+            collection_layout.addWidget(self.collection_mode)
+            collection_layout.addStretch()
+            collection_layout.addWidget(self.shard_label)
+            collection_layout.addWidget(self.shard_size)
+            layout.addLayout(collection_layout)
+            
             # 進度條
             self.progress_bar = QProgressBar()
             layout.addWidget(self.progress_bar)
@@ -329,7 +220,12 @@ class SQLite2SHFConverter(QMainWindow):
             self.save_button.setEnabled(False)
             
             # 創建並啟動轉換線程
-            self.worker = ConversionWorker(db_file, output_dir)
+            self.worker = ConversionWorker(
+                db_file,
+                output_dir,
+                collection=self.collection_mode.isChecked(),
+                shard_size=self.shard_size.value()
+            )
             self.worker.progress_updated.connect(self.update_progress)
             self.worker.log_message.connect(self.append_log)
             self.worker.conversion_finished.connect(self.conversion_finished)
@@ -0,0 +1,41 @@
+import sys
+from pathlib import Path
+
+# 直接運行 pytest 時，將倉庫根目錄加入搜索路徑以導入 shf_tools 套件
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import random
+
+import pytest
+
+from shf_tools.core.parser import Answer, Problem
+
+LEVELS = ('00', '30k', '15k', '10k', '1k', '1d', '5d', '9d')
+COMMENTS = ('', '黑先活', '正解', '這樣不行', 'ko fight', '白的變化：打劫')
+
+def _random_stone(rng, size, colors='BW'):
+    x = rng.randrange(size)
+    y = rng.randrange(size)
+    return f"{rng.choice(colors)}{chr(97 + x)}{chr(97 + y)}"
+
+@pytest.fixture(scope='session')
+def sample_problems():
+    """各種級別、棋盤大小、答案類型和注釋的題目，級別和 ID 互不重複"""
+    rng = random.Random(11)
+    problems = []
+    for number in range(1, 201):
+        size = rng.choice((9, 13, 19))
+        stones = tuple(_random_stone(rng, size) for _ in range(rng.randint(0, 12)))
+        answers = tuple(
+            Answer(
+                rng.choice('+-/'),
+                tuple(_random_stone(rng, size) for _ in range(rng.randint(0, 6))),
+                rng.choice(COMMENTS),
+            )
+            for _ in range(rng.randint(0, 4))
+        )
+        initial_comment = rng.choice(COMMENTS).replace('：', '')
+        level = LEVELS[number % len(LEVELS)]
+        problems.append(
+            Problem(level, f"{number:05d}", size, stones, initial_comment, answers))
+    return problems
@@ -0,0 +1,28 @@
+from shf_tools.core.answer_tree import AnswerTree
+from shf_tools.core.parser import Answer
+
+def test_answers_round_trip(sample_problems):
+    for problem in sample_problems:
+        tree = problem.answer_tree()
+        assert len(tree) == len(problem.answers)
+        assert tree.to_answers() == problem.answers
+
+def test_shared_prefixes():
+    answers = (
+        Answer('+', ('Bba', 'Wbb', 'Bcb'), '正解'),
+        Answer('-', ('Bba', 'Wbb', 'Bcc')),
+        Answer('/', ('Bba', 'Wbb')),
+        Answer('+', ('Bba', 'Wbb', 'Bcb'), '重複'),
+        Answer('-', ()),
+    )
+    tree = AnswerTree.from_answers(answers)
+    assert tree.to_answers() == answers
+    assert tree.node_count() == 4
+
+    node = tree.find(('Bba', 'Wbb'))
+    assert node.depth == 2
+    assert node.path() == ('Bba', 'Wbb')
+    assert [child.move for child in node.iter_children()] == ['Bcb', 'Bcc']
+    assert node.answer_types() == {'+', '-', '/'}
+    assert tree.find(('Bba', 'Wcc')) is None
+    assert tree.root.ends == [(4, '-', '')]
@@ -0,0 +1,49 @@
+import pytest
+
+from shf_tools.core.compact import (CODE_TO_LEVEL, CompactProblem, code_to_level,
+                                    decode_point, encode_point, level_to_code,
+                                    load_compact)
+from shf_tools.core.parser import Answer, Problem, format_line
+
+def test_problem_round_trip(sample_problems):
+    for problem in sample_problems:
+        compact = CompactProblem.from_problem(problem)
+        assert compact.to_problem() == problem
+        assert compact.to_line() == format_line(problem)
+        assert CompactProblem.from_line(compact.to_line()) == compact
+        assert CompactProblem.from_dict(problem.to_dict()) == compact
+
+def test_answer_accessors(sample_problems):
+    for problem in sample_problems:
+        compact = CompactProblem.from_problem(problem)
+        assert compact.answer_count() == len(problem.answers)
+        for index, answer in enumerate(problem.answers):
+            assert compact.answer_type(index) == answer.type
+            moves = tuple(map(decode_point, compact.answer_points(index)))
+            assert moves == answer.moves
+            assert compact.answer_comment(index) == answer.comment
+
+def test_point_and_level_codes():
+    for x in range(19):
+        for y in range(19):
+            for color in 'BW':
+                stone = f"{color}{chr(97 + x)}{chr(97 + y)}"
+                assert decode_point(encode_point(stone)) == stone
+    for code, level in CODE_TO_LEVEL.items():
+        assert level_to_code(level) == code
+        assert code_to_level(code) == level
+    assert level_to_code('05K') == level_to_code('5k')
+    assert level_to_code('10k') < level_to_code('1k') < level_to_code('1d')
+
+def test_comment_with_null_character():
+    problem = Problem('1k', '00001', 9, ('Bcc',), '', (Answer('+', ('Bdd',), 'a\0b'),))
+    with pytest.raises(ValueError):
+        CompactProblem.from_problem(problem)
+
+def test_load_compact(tmp_path, sample_problems):
+    path = tmp_path / 'problems.shf'
+    lines = [format_line(problem) for problem in sample_problems] + ['1k:bad']
+    path.write_text('\n'.join(lines) + '\n', encoding='utf-8')
+    problems, errors = load_compact(path)
+    assert [problem.to_problem() for problem in problems] == sample_problems
+    assert [line_no for line_no, _ in errors] == [len(lines)]
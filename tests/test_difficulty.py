@@ -0,0 +1,46 @@
+import sqlite3
+
+import pytest
+
+from shf_tools.core.difficulty import estimate_database, estimate_files
+from shf_tools.core.importer import import_shf_files
+from shf_tools.core.parser import iter_problems
+
+LINES = [
+    "5k:00001:1:Bcc,Wdc:+Bdd",
+    "00:00002:1:Bcc,Wdc,Bec:+Bdd,Wed#變化,-Bcd",
+    "10k:00003:2:Bcc:+Bdd",
+    "00:00004:3:Bcc,Wdc,Bec,Wfc:+Bdd,Wed,Bfd",
+    "2d:00005:3:Baa,Wbb,Bcc,Wdd,Bee:+Bad,Wbe,Bcf,-Bce",
+    "1k:00006:2:Bcc,Wdc,Bdd:+Bcd,Wce",
+]
+
+@pytest.fixture
+def shf_path(tmp_path):
+    path = tmp_path / 'problems.shf'
+    path.write_text('\n'.join(LINES) + '\n', encoding='utf-8')
+    return str(path)
+
+@pytest.mark.parametrize('use_solver', [False, True])
+def test_estimate_files(tmp_path, shf_path, use_solver):
+    output = str(tmp_path / 'estimated.shf')
+    estimated, error = estimate_files([shf_path], output, use_solver, workers=2)
+    assert estimated == 2
+    assert error >= 0
+    problems = [problem for _, problem, _ in iter_problems(output)]
+    ids = [line.split(':')[1] for line in LINES]
+    assert [problem.id for problem in problems] == ids
+    assert all(problem.level != '00' for problem in problems)
+
+def test_estimate_database_with_solver(tmp_path, shf_path):
+    db_path = str(tmp_path / 'problems.db')
+    import_shf_files([shf_path], db_path)
+    conn = sqlite3.connect(db_path)
+    try:
+        estimates, _ = estimate_database(conn, use_solver=True, workers=2)
+        rows = conn.execute(
+            "SELECT id FROM games WHERE estimated_level_code IS NOT NULL ORDER BY id")
+        assert [row[0] for row in rows] == ['00002', '00004']
+    finally:
+        conn.close()
+    assert len(estimates) == 2
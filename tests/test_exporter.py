@@ -0,0 +1,62 @@
+from shf_tools.core.compact import level_to_code
+from shf_tools.core.exporter import export_database
+from shf_tools.core.importer import import_shf_files
+from shf_tools.core.parser import Answer, Problem, format_line, iter_problems
+
+LEVELS = ['10k', '1d', '2k', '30k', '1k', '9k', '00', '5d']
+
+def _problems():
+    problems = []
+    for number, level in enumerate(LEVELS * 3, 1):
+        size = (9, 13, 19)[number % 3]
+        stones = ('Bcc', 'Wdc', f"B{chr(96 + number % size + 1)}a")
+        answers = (
+            Answer('+', ('Bdd', 'Wcd'), '正解'),
+            Answer('-', ('Bcd',)),
+            Answer('/', ('Bdd', 'Wed', 'Bce'), '變化'),
+        )
+        comment = f"第{number}題"
+        problems.append(Problem(level, f"{number:05d}", size, stones, comment, answers))
+    return problems
+
+def test_collection_round_trip(tmp_path):
+    problems = _problems()
+    shf_path = tmp_path / 'problems.shf'
+    shf_path.write_text(
+        '\n'.join(format_line(problem) for problem in problems) + '\n',
+        encoding='utf-8',
+    )
+    db_path = tmp_path / 'problems.db'
+    import_shf_files([str(shf_path)], str(db_path))
+
+    output_dir = tmp_path / 'export'
+    count = export_database(str(db_path), str(output_dir), collection=True)
+    assert count == len(problems)
+    exported = [
+        problem for _, problem, error in iter_problems(output_dir / 'collection.shf')
+        if error is None
+    ]
+    assert sorted(exported, key=lambda problem: problem.key) == sorted(
+        problems, key=lambda problem: problem.key)
+
+    # 按棋盤大小分區，分區內級別從易到難
+    order = [(problem.size, level_to_code(problem.level)) for problem in exported]
+    assert order == sorted(order)
+
+def test_file_export_round_trip(tmp_path):
+    problems = _problems()[:4]
+    shf_path = tmp_path / 'problems.shf'
+    shf_path.write_text(
+        '\n'.join(format_line(problem) for problem in problems) + '\n',
+        encoding='utf-8',
+    )
+    db_path = tmp_path / 'problems.db'
+    import_shf_files([str(shf_path)], str(db_path))
+
+    output_dir = tmp_path / 'export'
+    assert export_database(str(db_path), str(output_dir)) == len(problems)
+    for problem in problems:
+        path = output_dir / f"{problem.level}{problem.id}.shf"
+        [(_, exported, error)] = list(iter_problems(path))
+        assert error is None
+        assert exported == problem
@@ -0,0 +1,136 @@
+import os
+import sqlite3
+
+import pytest
+
+from shf_tools.core.comment_search import search_comments
+from shf_tools.core.importer import import_shf_files
+from shf_tools.core.parser import iter_problems
+
+EXAMPLES = os.path.join(os.path.dirname(__file__), os.pardir, 'examples')
+
+@pytest.mark.parametrize('name', ['collection.shf', 'simple.shf', 'complex.shf'])
+def test_examples_import(tmp_path, name):
+    path = os.path.join(EXAMPLES, name)
+    problems = [problem for _, problem, error in iter_problems(path) if error is None]
+    assert problems
+
+    db_path = tmp_path / 'examples.db'
+    assert import_shf_files([path], str(db_path)) == (len(problems), 0)
+    conn = sqlite3.connect(db_path)
+    try:
+        assert conn.execute("SELECT COUNT(*) FROM games").fetchone()[0] == len(problems)
+    finally:
+        conn.close()
+
+def _write_examples(tmp_path):
+    path = tmp_path / 'problems.shf'
+    with open(os.path.join(EXAMPLES, 'collection.shf'), encoding='utf-8') as f:
+        path.write_text(f.read(), encoding='utf-8')
+    return str(path)
+
+def _journal_mode(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute("PRAGMA journal_mode").fetchone()[0]
+    finally:
+        conn.close()
+
+def test_import_restores_journal_mode(tmp_path):
+    shf_path = _write_examples(tmp_path)
+    db_path = str(tmp_path / 'problems.db')
+    import_shf_files([shf_path], db_path)
+    assert _journal_mode(db_path) == 'delete'
+    assert not os.path.exists(db_path + '-wal')
+    assert not os.path.exists(db_path + '-shm')
+
+def test_import_keeps_wal_database(tmp_path):
+    shf_path = _write_examples(tmp_path)
+    db_path = str(tmp_path / 'problems.db')
+    import_shf_files([shf_path], db_path)
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.close()
+
+    with open(shf_path, 'a', encoding='utf-8') as f:
+        f.write("5k:00001:1:Bcc,Wdc:+Bdd\n")
+    import_shf_files([shf_path], db_path, incremental=True)
+    assert _journal_mode(db_path) == 'wal'
+
+def _games(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        games = conn.execute(
+            "SELECT level, id, initial_comment FROM games ORDER BY level, id"
+        ).fetchall()
+        found = search_comments(conn, '劫')
+    finally:
+        conn.close()
+    return games, found
+
+def test_incremental_import(tmp_path):
+    first = tmp_path / 'first.shf'
+    second = tmp_path / 'second.shf'
+    first.write_text("1k:00001:1:Bcc:+Bdd#打劫\n1k:00002:1:Bcc:+Bdd\n", encoding='utf-8')
+    second.write_text("2k:00001:1:Bcc:+Bdd\n", encoding='utf-8')
+    db_path = str(tmp_path / 'problems.db')
+    assert import_shf_files([str(first), str(second)], db_path) == (3, 0)
+
+    # 修改第一個文件：更新一題、刪除一題、增加一題；第二個文件不變
+    first.write_text("1k:00001:1:Bcc#改過:+Bdd\n1k:00003:1:Bcc:+Bdd#劫爭\n",
+                     encoding='utf-8')
+    inputs = [str(first), str(second)]
+    assert import_shf_files(inputs, db_path, incremental=True) == (2, 0)
+    games, found = _games(db_path)
+    assert games == [('1k', '00001', '改過'), ('1k', '00003', ''), ('2k', '00001', '')]
+    assert found == [('1k', '00003')]
+
+    # 不在輸入中的文件的題目默認刪除
+    assert import_shf_files([str(first)], db_path, incremental=True) == (0, 0)
+    games, _ = _games(db_path)
+    assert [game[:2] for game in games] == [('1k', '00001'), ('1k', '00003')]
+
+def test_incremental_import_keeps_other_files_problems(tmp_path):
+    first = tmp_path / 'a.shf'
+    second = tmp_path / 'b.shf'
+    first.write_text("1k:00001:1:Bcc:+Bdd\n", encoding='utf-8')
+    second.write_text("1k:00002:1:Bcc:+Bdd\n", encoding='utf-8')
+    db_path = str(tmp_path / 'problems.db')
+    inputs = [str(first), str(second)]
+    assert import_shf_files(inputs, db_path) == (2, 0)
+
+    # 變化的文件加入未變化文件中已有的題目，與重建數據庫時一樣報告重複
+    second.write_text("1k:00002:1:Bcc:+Bdd\n1k:00001:1:Bee:+Bdd\n", encoding='utf-8')
+    assert import_shf_files(inputs, db_path, incremental=True) == (1, 1)
+    assert import_shf_files(inputs, str(tmp_path / 'full.db')) == (2, 1)
+    conn = sqlite3.connect(db_path)
+    try:
+        stones = conn.execute(
+            "SELECT p.color || p.position FROM initial_positions p "
+            "JOIN games g ON g.game_id = p.game_id WHERE g.id = '00001'"
+        ).fetchall()
+    finally:
+        conn.close()
+    assert stones == [('Bcc',)]
+
+    # 刪除 b.shf 後 a.shf 的題目仍在
+    assert import_shf_files([str(first)], db_path, incremental=True) == (0, 0)
+    games, _ = _games(db_path)
+    assert games == [('1k', '00001', '')]
+
+def test_incremental_import_moves_problem_between_files(tmp_path):
+    first = tmp_path / 'a.shf'
+    second = tmp_path / 'b.shf'
+    first.write_text("1k:00001:1:Bcc:+Bdd\n1k:00003:1:Bcc:+Bdd\n", encoding='utf-8')
+    second.write_text("1k:00002:1:Bcc:+Bdd\n", encoding='utf-8')
+    db_path = str(tmp_path / 'problems.db')
+    inputs = [str(second), str(first)]
+    assert import_shf_files(inputs, db_path) == (3, 0)
+
+    # 兩個文件都有變化時題目可以從一個文件移到另一個文件
+    first.write_text("1k:00003:1:Bcc:+Bdd\n", encoding='utf-8')
+    second.write_text("1k:00002:1:Bcc:+Bdd\n1k:00001:1:Bee:+Bdd\n", encoding='utf-8')
+    assert import_shf_files(inputs, db_path, incremental=True) == (3, 0)
+    assert import_shf_files([str(second)], db_path, incremental=True) == (0, 0)
+    games, _ = _games(db_path)
+    assert [game[:2] for game in games] == [('1k', '00001'), ('1k', '00002')]
@@ -0,0 +1,72 @@
+import os
+
+from shf_tools.core.line_index import LineIndex, build_index, index_path_for
+
+LINES = [
+    "1k:00001:1:Bcc:+Bba,",
+    "2k:00002:3:Wdd,Bcc#注釋:+Bdc,Wcb,-Bcd,",
+    "1d:00003:2::+Bab,",
+]
+
+def test_find_every_line(tmp_path):
+    path = tmp_path / "collection.shf"
+    path.write_text("# 標題\n" + "\n".join(LINES) + "\n", encoding="utf-8")
+    with LineIndex(str(path)) as index:
+        assert len(index) == 3
+        for line in LINES:
+            level, number = line.split(":")[:2]
+            assert index.find_line(level, number) == line
+        assert index.find_line("1k", "00099") is None
+
+def test_last_line_without_newline(tmp_path):
+    path = tmp_path / "game.shf"
+    path.write_text("\n".join(LINES), encoding="utf-8")
+    with LineIndex(str(path)) as index:
+        assert index.find_line("1d", "00003") == LINES[2]
+    assert build_index(str(path)) == (3, 0)
+
+    # 在沒有換行符的最後一行後追加內容，該行應重新掃描
+    with open(path, "a", encoding="utf-8") as f:
+        f.write("Wbc,\n5k:00004:1:Baa:+Bbb,")
+    with LineIndex(str(path)) as index:
+        assert len(index) == 4
+        assert index.find_line("1d", "00003") == LINES[2] + "Wbc,"
+        assert index.find_line("5k", "00004") == "5k:00004:1:Baa:+Bbb,"
+
+def test_rewritten_file_rebuilds_index(tmp_path):
+    path = tmp_path / "collection.shf"
+    path.write_text("\n".join(LINES) + "\n", encoding="utf-8")
+    build_index(str(path))
+    path.write_text(LINES[0] + "\n", encoding="utf-8")
+    with LineIndex(str(path)) as index:
+        assert len(index) == 1
+        assert index.find_line("2k", "00002") is None
+    assert index_path_for(str(path)).endswith(".shfx")
+
+def _same_size_edit(path):
+    lines = ["1k:%05d:1:Bcc:+Bba," % number for number in range(1, 500)]
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    build_index(str(path))
+    stat = os.stat(path)
+    lines[1] = "1k:00900:1:Bcc:+Bba,"
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    return stat
+
+def test_same_size_edit_rebuilds_index(tmp_path):
+    path = tmp_path / "collection.shf"
+    stat = _same_size_edit(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000))
+    with LineIndex(str(path)) as index:
+        assert index.offset_of("1k", "00900") == 21
+        assert index.find("1k", "00002") is None
+        assert index.find("1k", "00900").id == "00900"
+
+def test_find_line_checks_problem_key(tmp_path):
+    # 修改時間也沒有變化時，查找時核對讀到的行並重新生成索引
+    path = tmp_path / "collection.shf"
+    stat = _same_size_edit(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    with LineIndex(str(path)) as index:
+        assert index.find_line("1k", "00002") is None
+        assert index.find_line("1k", "00900") == "1k:00900:1:Bcc:+Bba,"
+        assert index.find_line("1k", "00003") == "1k:00003:1:Bcc:+Bba,"
@@ -0,0 +1,46 @@
+import pytest
+
+from shf_tools.core.parser import (Answer, Problem, format_line, iter_problems,
+                                   parse_line)
+
+def test_line_round_trip(sample_problems):
+    for problem in sample_problems:
+        line = format_line(problem)
+        assert parse_line(line) == problem
+        assert parse_line(line, strict=False) == problem
+        assert format_line(parse_line(line)) == line
+
+def test_dict_round_trip(sample_problems):
+    for problem in sample_problems:
+        assert Problem.from_dict(problem.to_dict()) == problem
+
+def test_file_round_trip(tmp_path, sample_problems):
+    path = tmp_path / 'problems.shf'
+    lines = ['# 題目集合'] + [format_line(problem) for problem in sample_problems]
+    # 最後一行沒有換行符
+    path.write_text('\n'.join(lines), encoding='utf-8')
+    results = list(iter_problems(path))
+    assert [error for _, _, error in results] == [None] * len(sample_problems)
+    assert [problem for _, problem, _ in results] == sample_problems
+    assert results[0][0] == 2
+
+def test_lenient_formats():
+    expected = Problem('00', '00001', 9, ('Bcc', 'Wdc'), '', (Answer('+', ('Bdd',)),))
+    assert parse_line('00001:1:Bcc,Wdc:+Bdd,', strict=False) == expected
+    assert parse_line(' 00:00001:1: BCC, Wdc ,:+Bdd', strict=False) == expected
+    with pytest.raises(ValueError):
+        parse_line('00001:1:Bcc,Wdc:+Bdd,')
+    with pytest.raises(ValueError):
+        parse_line('00:00001:1:BCC,Wdc:+Bdd,')
+
+@pytest.mark.parametrize('line', [
+    '1k:00001:4:Bcc:+Bdd,',
+    '1k:0001:1:Bcc:+Bdd,',
+    '31k:00001:1:Bcc:+Bdd,',
+    '1k:00001:1:Bcz:+Bdd,',
+    '1k:00001:1:Bcc:*Bdd,',
+    '1k:00001:1:Bcc',
+])
+def test_invalid_lines(line):
+    with pytest.raises(ValueError):
+        parse_line(line, strict=False)
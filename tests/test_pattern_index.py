@@ -0,0 +1,111 @@
+import random
+import sqlite3
+
+import pytest
+
+from shf_tools.core import pattern_index
+from shf_tools.core.importer import import_shf_files
+from shf_tools.core.parser import format_line, Problem, Answer
+from shf_tools.core.symmetry import transform_coords
+
+PATTERNS = [
+    '##/#.X/#XO',
+    'XO/OX',
+    '.X./X.X/.X.',
+    '##/#X',
+    '.X/X.',
+    'X?O/.X.',
+    'X',
+]
+
+def _random_problems(count, seed=7):
+    rng = random.Random(seed)
+    problems = []
+    for number in range(1, count + 1):
+        size = rng.choice((9, 13, 19))
+        # 棋子集中在角上，使小棋形經常出現
+        span = rng.randint(3, 6)
+        points = {
+            (rng.randrange(span), rng.randrange(span))
+            for _ in range(rng.randint(1, 10))
+        }
+        stones = tuple(
+            f"{rng.choice('BW')}{chr(97 + x)}{chr(97 + y)}" for x, y in sorted(points)
+        )
+        answer = Answer('+', (f"B{chr(97 + size - 1)}{chr(97 + size - 1)}",))
+        problems.append(Problem('1k', f"{number:05d}", size, stones, '', (answer,)))
+    # 保證每個圖案都至少出現一次：中腹的十字形、角上的小棋形
+    fixed = (('Bjk', 'Bkj', 'Blk', 'Bkl'), ('Bab', 'Bba', 'Wbb'))
+    for number, stones in enumerate(fixed, count + 1):
+        answer = Answer('+', ('Wss',))
+        problems.append(Problem('2k', f"{number:05d}", 19, stones, '', (answer,)))
+    return problems
+
+def _brute_force(problems, pattern):
+    """不使用索引，逐題在每個位置比較圖案的所有對稱形式"""
+    cells = pattern_index.parse_pattern(pattern)
+    extent = max(max(x, y) for x, y in cells) + 1
+    variants = [
+        {transform_coords(x, y, extent, t): state for (x, y), state in cells.items()}
+        for t in range(8)
+    ]
+    states = {'B': pattern_index.BLACK, 'W': pattern_index.WHITE}
+    found = []
+    for problem in problems:
+        board = {
+            (ord(stone[1]) - 97, ord(stone[2]) - 97): states[stone[0]]
+            for stone in problem.stones
+        }
+        size = problem.size
+
+        def state_at(x, y):
+            if 0 <= x < size and 0 <= y < size:
+                return board.get((x, y), pattern_index.EMPTY)
+            return pattern_index.EDGE
+
+        if any(
+            all(state_at(x + ox, y + oy) == state for (x, y), state in variant.items())
+            for variant in variants
+            for ox in range(-extent, size + 1)
+            for oy in range(-extent, size + 1)
+        ):
+            found.append((problem.level, problem.id))
+    return found
+
+@pytest.fixture(scope='module')
+def database(tmp_path_factory):
+    directory = tmp_path_factory.mktemp('patterns')
+    problems = _random_problems(300)
+    shf_path = directory / 'problems.shf'
+    shf_path.write_text(
+        '\n'.join(format_line(problem) for problem in problems) + '\n',
+        encoding='utf-8',
+    )
+    db_path = directory / 'problems.db'
+    import_shf_files([str(shf_path)], str(db_path))
+    conn = sqlite3.connect(db_path)
+    pattern_index.build_pattern_index(conn)
+    yield conn, problems
+    conn.close()
+
+@pytest.mark.parametrize('pattern', PATTERNS)
+def test_find_pattern_matches_brute_force(database, pattern):
+    conn, problems = database
+    assert pattern_index.find_pattern(conn, pattern) == _brute_force(problems, pattern)
+
+@pytest.mark.parametrize('pattern', ['##/#.X/#XO', 'XO/OX', '.X./X.X/.X.', '##/#X'])
+def test_small_patterns_use_index(pattern):
+    for variant in pattern_index.pattern_variants(pattern_index.parse_pattern(pattern)):
+        assert pattern_index._anchor_keys(variant)
+
+def test_python_keys_match_numpy(database):
+    if pattern_index.np is None:
+        pytest.skip('需要 numpy')
+    conn, _ = database
+    keys, game_ids = pattern_index._chunk_keys_numpy(conn, 'g.game_id > ?', (0,))
+    expected = set()
+    rows = pattern_index._iter_problem_stones(conn, 'g.game_id > ?', (0,))
+    for game_id, size, stones in rows:
+        expected.update(
+            (key, game_id) for key in pattern_index.problem_pattern_keys(stones, size))
+    assert set(zip(keys.tolist(), game_ids.tolist())) == expected
@@ -0,0 +1,55 @@
+import random
+
+from shf_tools.core.board import BoardState, IllegalMove
+from shf_tools.core.replay import ReplayCache
+
+def _stones(state):
+    size = state.size
+    return {
+        (point // size, point % size): color
+        for point, color in enumerate(state.colors) if color
+    }
+
+def _replay(problem, moves):
+    """從初始局面逐手擺放，略過不合法的著手"""
+    state = BoardState(problem.size)
+    for stone in problem.stones:
+        try:
+            state.play_move(stone)
+        except IllegalMove:
+            pass
+        state.ko = -1
+    for move in moves:
+        try:
+            state.play_move(move)
+        except IllegalMove:
+            pass
+    return state
+
+def test_steps_match_replay(sample_problems):
+    for problem in sample_problems:
+        tree = problem.answer_tree()
+        cache = ReplayCache(problem.size, problem.stones)
+        assert _stones(cache.step(tree.root).state) == _stones(_replay(problem, ()))
+        for node in tree.iter_nodes():
+            expected = _replay(problem, node.path())
+            assert _stones(cache.step(node).state) == _stones(expected)
+
+def test_transitions_match_replay(sample_problems):
+    rng = random.Random(5)
+    for problem in sample_problems:
+        tree = problem.answer_tree()
+        nodes = [tree.root] + list(tree.iter_nodes())
+        cache = ReplayCache(problem.size, problem.stones)
+        current = tree.root
+        board = _stones(cache.step(current).state)
+        for _ in range(10):
+            target = rng.choice(nodes)
+            changes, step = cache.transition(current, target)
+            for point, color in changes.items():
+                if color:
+                    board[point] = color
+                else:
+                    board.pop(point, None)
+            assert board == _stones(step.state)
+            current = target
@@ -0,0 +1,57 @@
+import pytest
+
+from shf_tools.core.compact import CompactProblem
+from shf_tools.core.parser import format_line, iter_problems
+from shf_tools.core.shfb import SHFBReader, shf_to_shfb, shfb_to_shf, write_shfb
+
+def test_reader_round_trip(tmp_path, sample_problems):
+    compact = [CompactProblem.from_problem(problem) for problem in sample_problems]
+    path = tmp_path / 'problems.shfb'
+    assert write_shfb(compact, path) == len(compact)
+
+    with SHFBReader(path) as reader:
+        assert len(reader) == len(compact)
+        assert list(reader) == compact
+        assert reader[-1] == compact[-1]
+        for index, problem in enumerate(sample_problems):
+            assert reader.index_of(problem.level, problem.id) == index
+            assert reader.find(problem.level, problem.id) == compact[index]
+            assert reader.line(index) == format_line(problem)
+        assert reader.find('1k', '99999') is None
+        with pytest.raises(IndexError):
+            reader[len(compact)]
+
+def test_empty_file(tmp_path):
+    path = tmp_path / 'empty.shfb'
+    assert write_shfb([], path) == 0
+    with SHFBReader(path) as reader:
+        assert len(reader) == 0
+        assert reader.find('1k', '00001') is None
+
+def test_file_conversion_round_trip(tmp_path, sample_problems):
+    shf_path = tmp_path / 'problems.shf'
+    lines = [format_line(problem) for problem in sample_problems]
+    shf_path.write_text('\n'.join(lines) + '\n', encoding='utf-8')
+
+    shfb_path = tmp_path / 'problems.shfb'
+    assert shf_to_shfb(str(shf_path), shfb_path) == (len(lines), 0)
+    output = tmp_path / 'output.shf'
+    assert shfb_to_shf(shfb_path, output) == len(lines)
+    assert output.read_text(encoding='utf-8').splitlines() == lines
+    assert [problem for _, problem, _ in iter_problems(output)] == sample_problems
+
+def test_duplicate_problems(tmp_path, sample_problems):
+    shf_path = tmp_path / 'problems.shf'
+    lines = [format_line(problem) for problem in sample_problems[:3]]
+    shf_path.write_text('\n'.join(lines + lines[:1]) + '\n', encoding='utf-8')
+    assert shf_to_shfb(str(shf_path), tmp_path / 'problems.shfb') == (3, 1)
+
+    compact = CompactProblem.from_problem(sample_problems[0])
+    with pytest.raises(ValueError):
+        write_shfb([compact, compact], tmp_path / 'duplicate.shfb')
+
+def test_invalid_file(tmp_path):
+    path = tmp_path / 'invalid.shfb'
+    path.write_bytes(b'SHF\0' + bytes(64))
+    with pytest.raises(ValueError):
+        SHFBReader(path)
@@ -0,0 +1,33 @@
+from shf_tools.core import solver
+from shf_tools.core.parser import Answer, Problem
+
+# 9 路左上角：白棋 a1 一隻眼，另有 c3 一口外氣。黑 Bca 提掉 d1 的白子成劫，
+# 下圖為提劫後的局面，白不能立即在 d1 提回。白停一手時黑粘劫，白只剩一隻眼。
+#
+#     a b c d e
+#   1 . W B . B
+#   2 W W W B B
+#   3 W W . B B
+#   4 B B B B B
+WHITE = ('Wba', 'Wab', 'Wbb', 'Wcb', 'Wac', 'Wbc', 'Wda')
+BLACK = ('Bea', 'Bdb', 'Beb', 'Bdc', 'Bec', 'Bad', 'Bbd', 'Bcd', 'Bdd', 'Bed')
+
+def _ko_problem():
+    answer = Answer('+', ('Bca',))
+    return Problem('5k', '00001', 9, WHITE + BLACK, '', (answer,)), answer
+
+def test_ko_can_be_filled_after_pass():
+    problem, answer = _ko_problem()
+    assert solver.Solver(problem, defender='W').check_answer(answer) == (
+        solver.SUCCESS, None)
+    assert solver.check_problem(problem, defender='W') == []
+
+def test_search_restores_ko():
+    problem, answer = _ko_problem()
+    instance = solver.Solver(problem, defender='W')
+    board = instance.board.copy()
+    board.play_move('Bca')
+    ko = board.ko
+    assert ko >= 0
+    instance.solve(board, instance.defender)
+    assert board.ko == ko